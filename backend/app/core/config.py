@@ -16,6 +16,13 @@ class Settings(BaseSettings):
     vllm_url: str = "http://localhost:8000/v1/completions"
     vllm_timeout: float = 30.0
     model_name: str = "Qwen/Qwen3-0.6B"
+    vllm_stream: bool = False  # Stream tokens and close the stream at the first stop sequence
+
+    # Logging configuration
+    log_level: str = "INFO"
+    log_json: bool = True
+    log_queue_size: int = 10000  # Records buffered for the logging thread before dropping
+    log_payload_sample_rate: float = 0.01  # Fraction of requests logging full prompt/completion
 
     # CORS configuration
     allowed_origins: list[str] = [
@@ -24,10 +31,58 @@ class Settings(BaseSettings):
     ]
 
     # Completion defaults
-    default_max_tokens: int = 20
+    default_max_tokens: int = 20  # A lyric line is around 8-12 tokens, stop sequences end it earlier
+    default_min_tokens: int = 2  # Stop sequences are ignored until this many tokens are generated
+    default_stop: str = "line"  # "line", "stanza" or "none"
     default_temperature: float = 0.7
     max_allowed_tokens: int = 100
 
+    # Query/chunk embedder, "sentence-transformers" or "onnx" (int8 model from export_onnx_embedder.py)
+    embedder_backend: str = "sentence-transformers"
+    embedder_threads: int | None = None  # Intra-op threads, set to cores / workers when running several workers
+    onnx_model_dir: str = "./onnx_embedder"
+
+    # Batch completion (/complete/batch)
+    batch_max_items: int = 1000
+    batch_concurrency: int = 16  # vLLM requests in flight per batch
+
+    # RAG configuration
+    chroma_path: str = "./chroma"
+    embedding_quantization: str | None = None  # "int8" or "float16", None searches ChromaDB
+    embedding_store_path: str = "./embeddings"
+    rescore_multiplier: int = 4
+    embedding_cache_path: str | None = None  # Embedding cache shared with build_index.py, used for warmup
+
+    # Versioned indexes, hot-swapped without restarting (None serves chroma_path as is)
+    index_root: str | None = None
+    index_watch_interval: float = 0.0  # Seconds between checks of index_root/CURRENT, 0 disables
+    index_drain_timeout: float = 30.0
+    index_warmup_queries: list[str] = [
+        "I've been walking down this lonely road",
+        "my mind is the sky",
+        "and the night is young",
+    ]
+
+    # Admin endpoints, open in debug mode when no token is set
+    admin_token: str | None = None
+
+    # Profiling, per request profiles are allowed in debug mode or for these client hosts
+    profiling_allow_list: list[str] = []
+    profile_dir: str = "./profiles"
+    profile_max_seconds: float = 60.0
+
+    # Request tracing for offline replay (scripts/replay_trace.py)
+    trace_enabled: bool = False
+    trace_path: str = "./traces/complete.jsonl"
+    trace_max_bytes: int = 50_000_000  # Trace file is rotated at this size
+    trace_backup_count: int = 5
+
+    # Semantic completion cache, off by default: a hit returns the same completion for
+    # the same text, even when the request samples with a temperature
+    semantic_cache_enabled: bool = False
+    semantic_cache_size: int = 2048
+    semantic_cache_threshold: float = 0.95
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -0,0 +1,108 @@
+"""Non-blocking, structured logging for the API hot path."""
+import copy
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+# Id of the request being handled, set by the request middleware
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has, anything else was passed with extra=
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName", "request_id"}
+
+_payload_sample_rate = 1.0
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the current request id in the logging thread."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including extra= fields."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves message formatting to the listener thread and drops
+    records instead of blocking when the queue is full.
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock QueueHandler formats here, on the caller's thread
+        return copy.copy(record)
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def configure_logging(level: str = "INFO", json_format: bool = True, queue_size: int = 10000,
+                      payload_sample_rate: float = 1.0) -> logging.handlers.QueueListener:
+    """
+    Routes all logging through a bounded queue to a stream handler on a listener thread.
+
+    :param level: Root log level
+    :type level: str
+    :param json_format: Emit JSON records instead of plain text
+    :type json_format: bool
+    :param queue_size: Records buffered before new ones are dropped
+    :type queue_size: int
+    :param payload_sample_rate: Fraction of requests that log full prompts and completions
+    :type payload_sample_rate: float
+    :return: Started listener, stopped automatically at exit
+    :rtype: logging.handlers.QueueListener
+    """
+    global _payload_sample_rate
+    _payload_sample_rate = payload_sample_rate
+
+    stream_handler = logging.StreamHandler()
+    if json_format:
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
+        ))
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+def payload_sampled() -> bool:
+    """
+    :return: Whether this request should log its full prompt and completion
+    :rtype: bool
+    """
+    return random.random() < _payload_sample_rate
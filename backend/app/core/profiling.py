@@ -0,0 +1,141 @@
+"""Per-stage timings and on-demand profiling of the API."""
+import re
+import sys
+import time
+import uuid
+import cProfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+# cProfile can't run two profilers at once, only one request is profiled at a time
+_profile_lock = threading.Lock()
+
+class StageTimer:
+    """Measures the wall time of the named stages of a request."""
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Times the enclosed block, in milliseconds, under name.
+
+        :param name: Stage name, e.g. "retrieve"
+        :type name: str
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def server_timing(self) -> str:
+        """
+        :return: Timings as a Server-Timing header value
+        :rtype: str
+        """
+        return ", ".join(f"{name};dur={duration:.2f}" for name, duration in self.timings.items())
+
+def request_profile_path(profile_dir: str, request_id: Optional[str]) -> Path:
+    """
+    Path of the profile of a request inside profile_dir. The request id may come from
+    the client (X-Request-ID), so only letters, digits, "_" and "-" of it are kept.
+
+    :param profile_dir: Directory profiles are saved to
+    :type profile_dir: str
+    :param request_id: Id of the request
+    :type request_id: Optional[str]
+    :return: .prof file in profile_dir
+    :rtype: Path
+    """
+    safe_id = re.sub(r'[^A-Za-z0-9_-]', '', request_id or '')[:64] or uuid.uuid4().hex
+    return Path(profile_dir) / f"request-{safe_id}.prof"
+
+@contextmanager
+def profile_request(output_file: Path) -> Iterator[bool]:
+    """
+    Profiles the enclosed block with cProfile and dumps the stats to output_file.
+    Yields False without profiling when another request is already being profiled.
+
+    cProfile follows the event loop thread, so coroutines of other requests that run
+    in the meantime show up in the profile too.
+
+    :param output_file: .prof file to write, readable with pstats or snakeviz
+    :type output_file: Path
+    """
+    if not _profile_lock.acquire(blocking=False):
+        yield False
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            yield True
+        finally:
+            profiler.disable()
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(output_file)
+    finally:
+        _profile_lock.release()
+
+class StackSampler:
+    """
+    Process-wide sampling profiler. Periodically captures the stack of every thread
+    and aggregates them in the folded format used by flamegraph.pl and speedscope.
+    """
+    def __init__(self, interval: float = 0.005):
+        """
+        :param interval: Seconds between samples
+        :type interval: float
+        """
+        self.interval = interval
+        self.samples: Counter = Counter()
+
+    @staticmethod
+    def _fold(frame) -> str:
+        """ Root-first, semicolon separated stack of a frame. """
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{Path(code.co_filename).name}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def sample(self, skip_thread: Optional[int] = None):
+        """
+        Records the current stack of every thread but skip_thread.
+
+        :param skip_thread: Thread id not to sample, normally the sampler's own
+        :type skip_thread: Optional[int]
+        """
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip_thread:
+                continue
+            self.samples[f"{names.get(thread_id, thread_id)};{self._fold(frame)}"] += 1
+
+    def run(self, seconds: float) -> str:
+        """
+        Samples all threads for the given duration. Blocks, run it in a worker thread.
+
+        :param seconds: Duration of the capture
+        :type seconds: float
+        :return: Folded stacks, one "stack count" line each
+        :rtype: str
+        """
+        own_thread = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            self.sample(skip_thread=own_thread)
+            time.sleep(self.interval)
+        return self.folded()
+
+    def folded(self) -> str:
+        """
+        :return: Folded stacks collected so far, most sampled first
+        :rtype: str
+        """
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
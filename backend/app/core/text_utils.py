@@ -1,5 +1,13 @@
 """Text processing utilities for lyric completion."""
 import re
+from typing import List, Tuple
+
+# Stop sequences of the generation stop modes
+STOP_SEQUENCES = {
+    "line": ["\n"],
+    "stanza": ["\n\n"],
+    "none": [],
+}
 
 def normalize_text(text: str) -> str:
     """
@@ -69,6 +77,30 @@ def remove_overlap(input_text: str, completion: str) -> str:
 
     return completion
 
+def truncate_at_stop(text: str, stop: List[str], start: int = 0) -> Tuple[str, bool]:
+    """
+    Cut text before the first stop sequence found at or after start.
+
+    Example:
+        text: " everything else is the weather\nand the sun"
+        stop: ["\n"]
+        returns: (" everything else is the weather", True)
+
+    :param text: Generated text
+    :type text: str
+    :param stop: Stop sequences
+    :type stop: List[str]
+    :param start: Offset before which stop sequences are ignored
+    :type start: int
+    :return: Text up to the stop sequence, and whether one was found
+    :rtype: Tuple[str, bool]
+    """
+    positions = [position for position in (text.find(sequence, start) for sequence in stop if sequence)
+                 if position >= 0]
+    if not positions:
+        return text, False
+    return text[:min(positions)], True
+
 def clean_completion(input_text: str, raw_completion: str) -> str:
     """
     Clean up raw completion text by:
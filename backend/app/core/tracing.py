@@ -0,0 +1,176 @@
+"""Request traces for offline replay and performance regression testing."""
+import json
+import time
+import queue
+import logging
+import logging.handlers
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from app.core.logging_setup import DeferredQueueHandler
+
+class _TraceFormatter(logging.Formatter):
+    """Serializes the trace entry carried as the record message, one JSON object per line."""
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, ensure_ascii=False)
+
+class TraceRecorder:
+    """
+    Appends one JSON line per request to a rotating trace file. Entries are queued and
+    serialized and written on a listener thread, off the event loop.
+    """
+    def __init__(self, path: str, max_bytes: int = 50_000_000, backup_count: int = 5,
+                 queue_size: int = 10000):
+        """
+        :param path: Trace file, rotated to path.1, path.2, ... when full
+        :type path: str
+        :param max_bytes: Size at which the trace file is rotated
+        :type max_bytes: int
+        :param backup_count: Rotated files kept
+        :type backup_count: int
+        :param queue_size: Entries buffered for the writer thread before dropping
+        :type queue_size: int
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(self.path, maxBytes=max_bytes,
+                                                            backupCount=backup_count, encoding="utf-8")
+        file_handler.setFormatter(_TraceFormatter())
+
+        self._queue_handler = DeferredQueueHandler(queue.Queue(maxsize=queue_size))
+        # Standalone logger, kept out of the logging hierarchy so traces never reach the app log
+        self._logger = logging.Logger(f"trace:{self.path}")
+        self._logger.addHandler(self._queue_handler)
+        self._listener = logging.handlers.QueueListener(self._queue_handler.queue, file_handler)
+        self._listener.start()
+
+    @property
+    def dropped(self) -> int:
+        """ Entries dropped because the writer thread fell behind. """
+        return self._queue_handler.dropped
+
+    def record(self, request_id: Optional[str], text: str, params: dict, chunk_ids: List[str],
+               timings: Dict[str, float], cached: bool = False, status: int = 200,
+               ts: Optional[float] = None):
+        """
+        Records one /complete request.
+
+        :param request_id: Id of the request, resent as X-Request-ID on replay
+        :type request_id: Optional[str]
+        :param text: Input text
+        :type text: str
+        :param params: Generation parameters, e.g. max_tokens and temperature
+        :type params: dict
+        :param chunk_ids: Ids of the retrieved chunks, in rank order
+        :type chunk_ids: List[str]
+        :param timings: Stage timings in milliseconds, including "total"
+        :type timings: Dict[str, float]
+        :param cached: Whether the completion came from the semantic cache
+        :type cached: bool
+        :param status: HTTP status of the response
+        :type status: int
+        :param ts: Unix time the request arrived, defaults to now
+        :type ts: Optional[float]
+        """
+        self._logger.info({
+            "ts": time.time() if ts is None else ts,
+            "request_id": request_id,
+            "text": text,
+            "params": params,
+            "chunk_ids": chunk_ids,
+            "cached": cached,
+            "status": status,
+            "timings_ms": {name: round(duration, 3) for name, duration in timings.items()},
+        })
+
+    def close(self):
+        """ Writes out queued entries and stops the writer thread. """
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
+
+def iter_trace(path: str) -> Iterator[dict]:
+    """
+    Reads a trace, rotated files first so entries come out oldest first.
+
+    :param path: Trace file written by TraceRecorder
+    :type path: str
+    :return: Trace entries
+    :rtype: Iterator[dict]
+    """
+    path = Path(path)
+    backups = [p for p in path.parent.glob(f"{path.name}.*") if p.suffix[1:].isdigit()]
+    backups.sort(key=lambda p: int(p.suffix[1:]), reverse=True)
+    for trace_file in backups + [path]:
+        if not trace_file.exists():
+            continue
+        with open(trace_file, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def latency_percentiles(entries: List[dict], percentiles=(50, 90, 99)) -> Dict[str, Dict[str, float]]:
+    """
+    Latency distribution of every stage over a trace.
+
+    :param entries: Trace entries
+    :type entries: List[dict]
+    :param percentiles: Percentiles to compute
+    :return: Mapping of stage to {"p50": ..., "count": ...}, in milliseconds
+    :rtype: Dict[str, Dict[str, float]]
+    """
+    stages: Dict[str, List[float]] = {}
+    for entry in entries:
+        for name, duration in entry.get("timings_ms", {}).items():
+            stages.setdefault(name, []).append(duration)
+    distribution = {}
+    for name, durations in stages.items():
+        values = np.percentile(durations, percentiles)
+        distribution[name] = {f"p{p}": float(v) for p, v in zip(percentiles, values)}
+        distribution[name]["count"] = len(durations)
+    return distribution
+
+def diff_traces(baseline: List[dict], candidate: List[dict]) -> dict:
+    """
+    Compares the retrieval results and latencies of two traces of the same requests,
+    e.g. a production trace and its replay against a new build.
+
+    :param baseline: Entries of the reference trace
+    :type baseline: List[dict]
+    :param candidate: Entries of the trace to compare
+    :type candidate: List[dict]
+    :return: Retrieval agreement of requests found in both traces (matched by
+        request id, cache hits skipped) and the latency percentiles of each trace
+    :rtype: dict
+    """
+    baseline_by_id = {entry["request_id"]: entry for entry in baseline if entry.get("request_id")}
+    matched = identical = 0
+    overlaps = []
+    for entry in candidate:
+        reference = baseline_by_id.get(entry.get("request_id"))
+        if reference is None:
+            continue
+        matched += 1
+        if entry.get("cached") or reference.get("cached"):
+            continue
+        ids, reference_ids = entry["chunk_ids"], reference["chunk_ids"]
+        identical += ids == reference_ids
+        if ids or reference_ids:
+            overlaps.append(len(set(ids) & set(reference_ids)) / max(len(ids), len(reference_ids)))
+        else:
+            overlaps.append(1.0)
+
+    return {
+        "retrieval": {
+            "matched": matched,
+            "compared": len(overlaps),
+            "identical": identical,
+            "mean_overlap": float(np.mean(overlaps)) if overlaps else None,
+        },
+        "latency": {
+            "baseline": latency_percentiles(baseline),
+            "candidate": latency_percentiles(candidate),
+        },
+    }
@@ -1,35 +1,99 @@
 """FastAPI backend for The Drunken Bot lyric autocomplete."""
-from fastapi import FastAPI, HTTPException
+from contextlib import aclosing, asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import List, Literal, Optional
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, model_validator
+import asyncio
+import json
 import logging
+import time
+import uuid
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+from app.core.config import get_settings
+from app.core.logging_setup import configure_logging, payload_sampled, request_id_var
+from app.core.profiling import StackSampler, StageTimer, profile_request, request_profile_path
+from app.core.tracing import TraceRecorder
+
+settings = get_settings()
+
+configure_logging(
+    level=settings.log_level,
+    json_format=settings.log_json,
+    queue_size=settings.log_queue_size,
+    payload_sample_rate=settings.log_payload_sample_rate
 )
-logger = logging.getLogger(__name__) 
-logger.setLevel(logging.DEBUG)
+logger = logging.getLogger(__name__)
 
-from app.core.config import get_settings
-from app.core.text_utils import clean_completion
+from app.core.text_utils import STOP_SEQUENCES, clean_completion
 from app.services.vllm_client import vllm_client
+from app.services.batch_completion import BatchCompletion, build_prompt
+from app.services.completion_cache import SemanticCompletionCache
 
+from app.services.rag.embedding_cache import CachedEmbedder, EmbeddingCache
+from app.services.rag.index_manager import IndexManager, open_retriever
+from app.services.rag.quantization import QuantizedEmbeddingStore
 from app.services.rag.retriever import Retriever
 from app.services.rag.utils import embedder
 import chromadb
 
-client = chromadb.PersistentClient(path="./chroma")
-collection = client.get_collection("lyric_chunks")
-retriever = Retriever(collection, embedder)
+warmup_embedder = None
+if settings.embedding_cache_path:
+    # build_index.py writes the shared cache, the server only reads it
+    warmup_embedder = CachedEmbedder(embedder, EmbeddingCache(settings.embedding_cache_path, embedder.name,
+                                                              read_only=True))
 
-settings = get_settings()
+index_manager = IndexManager(
+    settings.index_root,
+    lambda version_dir: open_retriever(version_dir, embedder,
+                                       quantization=settings.embedding_quantization,
+                                       rescore_multiplier=settings.rescore_multiplier),
+    warmup_queries=settings.index_warmup_queries,
+    drain_timeout=settings.index_drain_timeout,
+    warmup_embedder=warmup_embedder
+)
+if settings.index_root:
+    index_manager.load()
+else:
+    # Single unversioned index, no hot-swapping
+    client = chromadb.PersistentClient(path=settings.chroma_path)
+    collection = client.get_collection("lyric_chunks")
+    store = None
+    if settings.embedding_quantization:
+        store = QuantizedEmbeddingStore.load(settings.embedding_store_path)
+    index_manager.activate(Retriever(collection, embedder, store=store,
+                                     rescore_multiplier=settings.rescore_multiplier, client=client),
+                           version="static")
+
+completion_cache = None
+if settings.semantic_cache_enabled:
+    completion_cache = SemanticCompletionCache(max_size=settings.semantic_cache_size,
+                                               threshold=settings.semantic_cache_threshold)
+
+trace_recorder = None
+if settings.trace_enabled:
+    trace_recorder = TraceRecorder(settings.trace_path, max_bytes=settings.trace_max_bytes,
+                                   backup_count=settings.trace_backup_count)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Watches for newly published index versions while the app runs."""
+    watcher = None
+    if settings.index_root and settings.index_watch_interval > 0:
+        watcher = asyncio.create_task(index_manager.watch(settings.index_watch_interval))
+    yield
+    if watcher is not None:
+        watcher.cancel()
 
 app = FastAPI(
     title=settings.app_name,
     description="Lyric autocomplete service powered by vLLM",
     version=settings.version,
-    debug=settings.debug
+    debug=settings.debug,
+    lifespan=lifespan
 )
 
 # CORS configuration
@@ -50,18 +114,75 @@ class CompletionRequest(BaseModel):
         le=settings.max_allowed_tokens,
         description="Maximum tokens to generate"
     )
+    min_tokens: int = Field(
+        default=settings.default_min_tokens,
+        ge=0,
+        le=settings.max_allowed_tokens,
+        description="Tokens generated before stop sequences apply"
+    )
+    stop: Literal["line", "stanza", "none"] = Field(
+        default=settings.default_stop,
+        description="End generation at the end of the line, of the stanza, or only at max_tokens"
+    )
     temperature: float = Field(
         default=settings.default_temperature,
         ge=0.0,
         le=2.0,
         description="Sampling temperature"
     )
+    fresh: bool = Field(
+        default=False,
+        description="Always generate, skipping the semantic cache (e.g. to ask for a new suggestion)"
+    )
+
+    @model_validator(mode="after")
+    def check_token_range(self):
+        if self.min_tokens > self.max_tokens:
+            raise ValueError("min_tokens cannot be greater than max_tokens")
+        return self
+
+class BatchCompletionRequest(BaseModel):
+    """Request model for batch lyric completion."""
+    items: List[CompletionRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.batch_max_items,
+        description="Inputs to complete, results are streamed back in this order"
+    )
 
 class CompletionResponse(BaseModel):
     """Response model for lyric completion."""
     completion: str = Field(..., description="Generated completion text")
     raw_completion: str = Field(..., description="Raw model output before cleaning")
 
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    """Tags every log record of a request with its id (taken from X-Request-ID if sent)."""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+class IndexReloadRequest(BaseModel):
+    """Request model for index hot-swapping."""
+    version: Optional[str] = Field(
+        default=None,
+        description="Index version to load, defaults to the published (CURRENT) version"
+    )
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Admin endpoints need the admin token, or debug mode when no token is configured."""
+    if settings.admin_token is None:
+        if settings.debug:
+            return
+    elif x_admin_token == settings.admin_token:
+        return
+    raise HTTPException(status_code=403, detail="Admin access denied")
+
 @app.get("/")
 async def root():
     """Health check endpoint."""
@@ -82,8 +203,68 @@ async def health_check():
         "version": settings.version
     }
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Semantic completion cache metrics."""
+    if completion_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **completion_cache.stats()}
+
+@app.get("/generation/stats")
+async def generation_stats():
+    """Tokens generated by vLLM against tokens returned, since startup."""
+    return vllm_client.metrics.stats()
+
+@app.get("/admin/index", dependencies=[Depends(require_admin)])
+async def index_status():
+    """Serving, published and available index versions."""
+    return {
+        "version": index_manager.version,
+        "published": index_manager.published_version(),
+        "versions": index_manager.versions()
+    }
+
+@app.post("/admin/index/reload", dependencies=[Depends(require_admin)])
+async def reload_index(request: Optional[IndexReloadRequest] = None):
+    """
+    Opens and warms an index version in the background, then swaps it in.
+    Requests keep being served by the previous version until the swap.
+    """
+    previous = index_manager.version
+    try:
+        version = await index_manager.reload(request.version if request else None)
+    except (RuntimeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"version": version, "previous": previous}
+
+def profiling_requested(http_request: Request) -> bool:
+    """Whether the request asked to be profiled, via X-Profile header or ?profile=1."""
+    flag = http_request.headers.get("X-Profile") or http_request.query_params.get("profile")
+    if flag not in ("1", "true"):
+        return False
+    client_host = http_request.client.host if http_request.client else None
+    if not (settings.debug or client_host in settings.profiling_allow_list):
+        raise HTTPException(status_code=403, detail="Profiling not allowed")
+    return True
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def capture_profile(seconds: float = 10.0, interval: float = 0.005):
+    """
+    Samples the stacks of every thread for the given number of seconds. Returns the
+    folded stacks (also saved under profile_dir) for flamegraph.pl or speedscope.
+    """
+    seconds = min(max(seconds, 0.1), settings.profile_max_seconds)
+    sampler = StackSampler(interval=max(interval, 0.001))
+    folded = await asyncio.to_thread(sampler.run, seconds)
+
+    output_file = Path(settings.profile_dir) / f"process-{datetime.now():%Y%m%d-%H%M%S}.folded"
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    output_file.write_text(folded)
+    logger.info("Saved %.1fs process profile to %s", seconds, output_file)
+    return PlainTextResponse(folded, headers={"X-Profile": str(output_file)})
+
 @app.post("/complete", response_model=CompletionResponse)
-async def complete_lyrics(request: CompletionRequest):
+async def complete_lyrics(request: CompletionRequest, http_request: Request, response: Response):
     """
     Generate lyric completions for the given input text.
     
@@ -92,27 +273,100 @@ async def complete_lyrics(request: CompletionRequest):
     2. Cleans the output (removes <think> tags, handles overlap)
     3. Returns the cleaned completion
     
-    Returns a CompletionResponse with both cleaned and raw completions.
+    Returns a CompletionResponse with both cleaned and raw completions. Stage
+    timings are returned in the Server-Timing header. Requests sent with
+    X-Profile: 1 (debug mode or allow-listed clients) are profiled with cProfile,
+    the path of the saved profile is returned in the X-Profile header.
+    When tracing is enabled the request is recorded for scripts/replay_trace.py.
+    """
+    timer = StageTimer()
+    trace = {"chunk_ids": [], "cached": False}
+    received, start = time.time(), time.perf_counter()
+    status = 200
+    try:
+        if profiling_requested(http_request):
+            output_file = request_profile_path(settings.profile_dir, request_id_var.get())
+            with profile_request(output_file) as profiled:
+                result = await generate(request, timer, trace)
+            response.headers["X-Profile"] = str(output_file) if profiled else "busy"
+        else:
+            result = await generate(request, timer, trace)
+    except HTTPException as e:
+        status = e.status_code
+        raise
+    finally:
+        if trace_recorder is not None:
+            trace_recorder.record(
+                request_id_var.get(),
+                request.text,
+                {"max_tokens": request.max_tokens, "min_tokens": request.min_tokens,
+                 "stop": request.stop, "temperature": request.temperature, "fresh": request.fresh},
+                trace["chunk_ids"],
+                {**timer.timings, "total": (time.perf_counter() - start) * 1000},
+                cached=trace["cached"],
+                status=status,
+                ts=received
+            )
+
+    response.headers["Server-Timing"] = timer.server_timing()
+    return result
+
+async def generate(request: CompletionRequest, timer: StageTimer, trace: dict) -> CompletionResponse:
+    """
+    Runs retrieval, generation and cleaning for one completion request. The ids of
+    the retrieved chunks and whether the cache answered are stored in trace.
     """
     try:
-        logger.info(f"Completion request: '{request.text[:50]}...' "
-                   f"(max_tokens={request.max_tokens}, temp={request.temperature})")
+        logger.info("Completion request: '%s...' (max_tokens=%d, temp=%s)",
+                    request.text[:50], request.max_tokens, request.temperature)
         
-        chunks = retriever.retrieve(request.text, top_k=10)
-        chunk_texts = ' '.join([chunk.text for chunk in chunks])
-        prompt = f"{chunk_texts} {request.text}"
-        logger.info(f"Prompt after RAG: \n{prompt}")
+        with index_manager.lease() as retriever:
+            with timer.stage("embed"):
+                query_embedding = retriever.embed(request.text)
+            if completion_cache is not None and not request.fresh:
+                with timer.stage("cache"):
+                    cached = completion_cache.lookup(request.text, query_embedding,
+                                                     request.max_tokens, request.temperature,
+                                                     stop=request.stop, min_tokens=request.min_tokens)
+                if cached is not None:
+                    cleaned_completion, raw_completion = cached
+                    trace["cached"] = True
+                    logger.info("Completion served from semantic cache: '%s...'", cleaned_completion[:50])
+                    return CompletionResponse(
+                        completion=cleaned_completion,
+                        raw_completion=raw_completion
+                    )
+
+            with timer.stage("retrieve"):
+                chunks = retriever.retrieve(request.text, top_k=10, query_embedding=query_embedding)
+        trace["chunk_ids"] = [chunk.id for chunk in chunks]
+        prompt = build_prompt(chunks, request.text)
+        log_payload = payload_sampled()
+        if log_payload:
+            logger.info("Prompt after RAG", extra={"prompt": prompt})
         # Call vLLM service
-        raw_completion = await vllm_client.generate_completion(
-            prompt=prompt,
-            max_tokens=request.max_tokens,
-            temperature=request.temperature
-        )
+        with timer.stage("generate"):
+            raw_completion = await vllm_client.generate_completion(
+                prompt=prompt,
+                max_tokens=request.max_tokens,
+                temperature=request.temperature,
+                stop=STOP_SEQUENCES[request.stop],
+                min_tokens=request.min_tokens
+            )
         
         # Clean the completion using your utilities
-        cleaned_completion = clean_completion(request.text, raw_completion)
+        with timer.stage("clean"):
+            cleaned_completion = clean_completion(request.text, raw_completion)
+        if completion_cache is not None and cleaned_completion.strip():
+            completion_cache.add(request.text, query_embedding, raw_completion,
+                                 request.max_tokens, request.temperature, stop=request.stop,
+                                 min_tokens=request.min_tokens)
         
-        logger.info(f"Completion generated: '{cleaned_completion[:50]}...'")
+        logger.info("Completion generated: '%s...'", cleaned_completion[:50],
+                    extra={"timings_ms": timer.timings})
+        if log_payload:
+            logger.info("Completion payload", extra={"raw_completion": raw_completion,
+                                                     "completion": cleaned_completion})
         
         return CompletionResponse(
             completion=cleaned_completion,
@@ -120,12 +374,48 @@ async def complete_lyrics(request: CompletionRequest):
         )
         
     except Exception as e:
-        logger.error(f"Completion failed: {str(e)}", exc_info=True)
+        logger.error("Completion failed: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Completion generation failed: {str(e)}"
         )
 
+@app.post("/complete/batch")
+async def complete_batch(request: BatchCompletionRequest):
+    """
+    Generate lyric completions for many inputs at once.
+
+    All inputs are embedded in one batch and retrieved with a single query, then
+    prompts are sent to vLLM concurrently (at most batch_concurrency at a time).
+    Results are streamed as NDJSON in input order, one line per input:
+    {"index", "completion", "raw_completion"}, or {"index", "error"} if its
+    generation failed. Stage timings of the batch are in the Server-Timing header.
+    """
+    timer = StageTimer()
+    batch = BatchCompletion(request.items, vllm_client, completion_cache,
+                            concurrency=settings.batch_concurrency)
+    try:
+        with index_manager.lease() as retriever:
+            await batch.prepare(retriever, timer)
+    except Exception as e:
+        logger.error("Batch retrieval failed: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Batch retrieval failed: {str(e)}"
+        )
+    logger.info("Batch of %d inputs, %d served from semantic cache", len(request.items),
+                len(request.items) - len(batch.misses), extra={"timings_ms": timer.timings})
+
+    async def stream_results():
+        # Generation starts with the body, a client gone before then costs no vLLM calls.
+        # Closing the stream (client went away) cancels the generations still running
+        async with aclosing(batch.stream()) as results:
+            async for result in results:
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson",
+                             headers={"Server-Timing": timer.server_timing()})
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -133,6 +423,6 @@ if __name__ == "__main__":
         host=settings.host,
         port=settings.port,
         reload=False,
-        log_level="debug",
+        log_level=settings.log_level.lower(),
         log_config=None
     )
@@ -0,0 +1,111 @@
+"""Batched lyric completion behind /complete/batch."""
+import asyncio
+import logging
+from typing import AsyncIterator, List, Optional
+
+import numpy as np
+
+from app.core.profiling import StageTimer
+from app.core.text_utils import STOP_SEQUENCES, clean_completion
+
+logger = logging.getLogger(__name__)
+
+def build_prompt(chunks, text: str) -> str:
+    """RAG prompt: the retrieved chunks followed by the user input."""
+    chunk_texts = ' '.join([chunk.text for chunk in chunks])
+    return f"{chunk_texts} {text}"
+
+class BatchCompletion:
+    """
+    Completes the inputs of one batch request. prepare() embeds all inputs in one
+    batch, serves what it can from the semantic cache and retrieves the rest with a
+    single query. stream() then generates the remaining inputs concurrently and
+    yields their results in input order.
+    """
+    def __init__(self, items: List, vllm_client, completion_cache=None, concurrency: int = 16,
+                 top_k: int = 10):
+        """
+        :param items: Requests with text, max_tokens, temperature, stop, min_tokens and fresh
+        :type items: List
+        :param vllm_client: Client with an async generate_completion method
+        :param completion_cache: Semantic completion cache, None to always generate
+        :param concurrency: Completions generated at the same time
+        :type concurrency: int
+        :param top_k: Chunks retrieved per input
+        :type top_k: int
+        """
+        self.items = items
+        self.vllm_client = vllm_client
+        self.completion_cache = completion_cache
+        self.concurrency = concurrency
+        self.top_k = top_k
+        self.results: List[Optional[dict]] = [None] * len(items)
+        self.misses: List[int] = []
+        self._embeddings: Optional[np.ndarray] = None
+        self._chunks: list = []
+
+    async def prepare(self, retriever, timer: StageTimer):
+        """
+        Embeds the inputs, looks them up in the cache and retrieves chunks of the misses.
+
+        :param retriever: Retriever leased for the batch
+        :param timer: Records the embed, cache and retrieve stages
+        :type timer: StageTimer
+        """
+        texts = [item.text for item in self.items]
+        with timer.stage("embed"):
+            self._embeddings = np.atleast_2d(await asyncio.to_thread(retriever.embed, texts))
+        if self.completion_cache is not None:
+            with timer.stage("cache"):
+                for i, item in enumerate(self.items):
+                    if item.fresh:
+                        continue
+                    cached = self.completion_cache.lookup(item.text, self._embeddings[i], item.max_tokens,
+                                                          item.temperature, stop=item.stop,
+                                                          min_tokens=item.min_tokens)
+                    if cached is not None:
+                        self.results[i] = {"index": i, "completion": cached[0], "raw_completion": cached[1]}
+        self.misses = [i for i, result in enumerate(self.results) if result is None]
+        with timer.stage("retrieve"):
+            self._chunks = await asyncio.to_thread(retriever.retrieve_batch, [texts[i] for i in self.misses],
+                                                   top_k=self.top_k,
+                                                   query_embeddings=self._embeddings[self.misses])
+
+    async def _complete(self, i: int, chunks, semaphore: asyncio.Semaphore) -> dict:
+        """ Generates the completion of input i, or an error result if generation fails. """
+        item = self.items[i]
+        async with semaphore:
+            try:
+                raw_completion = await self.vllm_client.generate_completion(
+                    prompt=build_prompt(chunks, item.text),
+                    max_tokens=item.max_tokens,
+                    temperature=item.temperature,
+                    stop=STOP_SEQUENCES[item.stop],
+                    min_tokens=item.min_tokens
+                )
+            except Exception as e:
+                logger.error("Batch completion %d failed: %s", i, e)
+                return {"index": i, "error": str(e)}
+        cleaned_completion = clean_completion(item.text, raw_completion)
+        if self.completion_cache is not None and cleaned_completion.strip():
+            self.completion_cache.add(item.text, self._embeddings[i], raw_completion,
+                                      item.max_tokens, item.temperature, stop=item.stop,
+                                      min_tokens=item.min_tokens)
+        return {"index": i, "completion": cleaned_completion, "raw_completion": raw_completion}
+
+    async def stream(self) -> AsyncIterator[dict]:
+        """
+        Generates the cache misses, at most concurrency at a time, starting on the first
+        iteration. Closing the iterator early cancels the generations still running.
+
+        :return: Iterator over one result per input, in input order
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = {i: asyncio.create_task(self._complete(i, chunks, semaphore))
+                 for i, chunks in zip(self.misses, self._chunks)}
+        try:
+            for i in range(len(self.items)):
+                yield await tasks[i] if i in tasks else self.results[i]
+        finally:
+            for task in tasks.values():
+                task.cancel()
@@ -0,0 +1,187 @@
+"""Semantic near-duplicate cache for lyric completions."""
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+from app.core.text_utils import clean_completion, normalize_text
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CachedCompletion:
+    text: str
+    raw_completion: str
+    max_tokens: int
+    temperature: float
+    stop: Optional[str] = None
+    min_tokens: int = 0
+
+class SemanticCompletionCache:
+    """
+    Bounded LRU cache of (prompt, completion) pairs looked up by cosine similarity
+    of the query embedding that retrieval already computes.
+    """
+    def __init__(self, max_size: int = 2048, threshold: float = 0.95):
+        """
+        :param max_size: Maximum number of cached completions before evicting
+        :type max_size: int
+        :param threshold: Minimum cosine similarity for a cached prompt to be reused
+        :type threshold: float
+        """
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        if not (0 <= threshold <= 1):
+            raise ValueError("Threshold must be between 0 and 1")
+
+        self.max_size = max_size
+        self.threshold = threshold
+
+        # Embeddings live in a preallocated matrix, entries map to their row (slot)
+        self._embeddings: Optional[np.ndarray] = None
+        self._occupied = np.zeros(max_size, dtype=bool)
+        self._entries: "OrderedDict[int, CachedCompletion]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.rejections = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+
+    @staticmethod
+    def _is_valid_continuation(text: str, cached: CachedCompletion, completion: str) -> bool:
+        """
+        Checks a cached completion still continues the new text. Either remove_overlap
+        found the end of the new text in the raw completion, or both texts end on the
+        same word so the completion picks up from the same place.
+        """
+        if not completion.strip():
+            return False
+        # Cleaning against empty input only strips think tags, so any difference is overlap
+        if completion != clean_completion('', cached.raw_completion):
+            return True
+
+        text_words = normalize_text(text).split()
+        cached_words = normalize_text(cached.text).split()
+        return bool(text_words) and bool(cached_words) and text_words[-1] == cached_words[-1]
+
+    def lookup(self, text: str, embedding, max_tokens: int, temperature: float,
+               stop: Optional[str] = None, min_tokens: int = 0) -> Optional[Tuple[str, str]]:
+        """
+        Looks up a completion for text from similar previous prompts.
+
+        :param text: User input text
+        :type text: str
+        :param embedding: Query embedding of text
+        :param max_tokens: Maximum tokens of the request
+        :type max_tokens: int
+        :param temperature: Sampling temperature of the request
+        :type temperature: float
+        :param stop: Stop mode of the request, e.g. "line"
+        :type stop: Optional[str]
+        :param min_tokens: Minimum tokens of the request
+        :type min_tokens: int
+        :return: (cleaned completion, raw completion) on a hit, otherwise None
+        :rtype: Optional[Tuple[str, str]]
+        """
+        if not self._entries:
+            self.misses += 1
+            return None
+
+        query = self._normalize(embedding)
+        similarities = self._embeddings @ query
+        similarities[~self._occupied] = -1.0
+
+        # Most similar first, stop at the first entry that still makes sense for text
+        rejected = False
+        for slot in map(int, np.argsort(-similarities)):
+            if similarities[slot] < self.threshold:
+                break
+            cached = self._entries[slot]
+            if ((cached.max_tokens, cached.temperature, cached.stop, cached.min_tokens)
+                    != (max_tokens, temperature, stop, min_tokens)):
+                continue
+
+            completion = clean_completion(text, cached.raw_completion)
+            if not self._is_valid_continuation(text, cached, completion):
+                rejected = True
+                continue
+
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            logger.debug("Semantic cache hit (similarity=%.3f)", similarities[slot])
+            return completion, cached.raw_completion
+
+        if rejected:
+            self.rejections += 1
+        self.misses += 1
+        return None
+
+    def add(self, text: str, embedding, raw_completion: str, max_tokens: int, temperature: float,
+            stop: Optional[str] = None, min_tokens: int = 0):
+        """
+        Caches a generated completion, evicting the least recently used entry when full.
+
+        :param text: User input text
+        :type text: str
+        :param embedding: Query embedding of text
+        :param raw_completion: Raw model output for text
+        :type raw_completion: str
+        :param max_tokens: Maximum tokens of the request
+        :type max_tokens: int
+        :param temperature: Sampling temperature of the request
+        :type temperature: float
+        :param stop: Stop mode of the request, e.g. "line"
+        :type stop: Optional[str]
+        :param min_tokens: Minimum tokens of the request
+        :type min_tokens: int
+        """
+        query = self._normalize(embedding)
+        if self._embeddings is None:
+            self._embeddings = np.zeros((self.max_size, query.shape[0]), dtype=np.float32)
+
+        if len(self._entries) >= self.max_size:
+            slot, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+        else:
+            slot = int(np.flatnonzero(~self._occupied)[0])
+
+        self._embeddings[slot] = query
+        self._occupied[slot] = True
+        self._entries[slot] = CachedCompletion(
+            text=text,
+            raw_completion=raw_completion,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stop=stop,
+            min_tokens=min_tokens
+        )
+
+    def stats(self) -> dict:
+        """
+        Cache metrics since startup.
+
+        :return: Size, hits, misses, rejections, evictions and hit rate
+        :rtype: dict
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejections": self.rejections,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
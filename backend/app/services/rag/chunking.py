@@ -0,0 +1,148 @@
+"""Line and stanza aware chunking of lyrics."""
+import re
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from app.services.rag.corpus import clean_lyrics
+
+SECTION_MARKER = re.compile(r'\[(.*?)\]')
+
+@dataclass
+class LyricChunk:
+    text: str
+    start_index: int
+    end_index: int
+    token_count: int
+    section: Optional[str] = None
+
+@dataclass
+class _Line:
+    start: int
+    end: int
+    stanza: int
+    section: Optional[str]
+
+def _section_name(marker: str) -> str:
+    """ Section name of a marker, e.g. "Verse 1" for "[Verse 1: Tom Waits]". """
+    return marker.split(':')[0].strip()
+
+class LyricChunker:
+    """
+    Chunks lyrics on line and stanza boundaries without overlap. Whole lines are packed
+    into chunks of at most chunk_size tokens, a chunk never spans two stanzas and a line
+    is never split (a single line longer than chunk_size becomes its own chunk).
+
+    Takes raw Genius lyrics so section markers such as [Verse 1] can be kept as chunk
+    metadata; chunk offsets refer to the lyrics after clean_lyrics.
+    """
+    takes_raw_lyrics = True
+
+    def __init__(self, tokenizer: str = "gpt2", chunk_size: int = 32, min_chunk_size: int = 8,
+                 token_counter: Optional[Callable[[List[str]], List[int]]] = None):
+        """
+        :param tokenizer: Hugging Face tokenizer used to count tokens
+        :type tokenizer: str
+        :param chunk_size: Maximum tokens per chunk
+        :type chunk_size: int
+        :param min_chunk_size: Stanzas shorter than this are merged into the next stanza if it fits
+        :type min_chunk_size: int
+        :param token_counter: Counts tokens for a batch of lines, overrides tokenizer
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self.tokenizer = tokenizer
+        self.chunk_size = chunk_size
+        self.min_chunk_size = min_chunk_size
+        self._token_counter = token_counter
+
+    def count_tokens(self, lines: List[str]) -> List[int]:
+        """
+        Counts tokens of many lines with a single batched call to the fast (Rust) tokenizer.
+
+        :param lines: Lines to count
+        :type lines: List[str]
+        :return: Token count per line
+        :rtype: List[int]
+        """
+        if self._token_counter is None:
+            from tokenizers import Tokenizer
+            fast_tokenizer = Tokenizer.from_pretrained(self.tokenizer)
+            self._token_counter = lambda batch: [len(encoding.ids) for encoding
+                                                 in fast_tokenizer.encode_batch(batch, add_special_tokens=False)]
+        if not lines:
+            return []
+        return self._token_counter(lines)
+
+    def _split_lines(self, lyrics: str) -> tuple[str, List[_Line]]:
+        """ Locates every lyric line of raw lyrics in the cleaned lyrics. """
+        cleaned = clean_lyrics(lyrics)
+        lines = []
+        section = None
+        stanza = 0
+        cursor = 0
+        for raw_line in lyrics.split('\n'):
+            markers = SECTION_MARKER.findall(raw_line)
+            if markers:
+                section = _section_name(markers[-1])
+                stanza += 1
+            line = SECTION_MARKER.sub('', raw_line).strip()
+            if not line:
+                if not markers:
+                    stanza += 1
+                continue
+
+            start = cleaned.find(line, cursor)
+            if start < 0:
+                continue
+            cursor = start + len(line)
+            lines.append(_Line(start, cursor, stanza, section))
+        return cleaned, lines
+
+    def chunk(self, lyrics: str) -> List[LyricChunk]:
+        """
+        Chunks the lyrics of one song.
+
+        :param lyrics: Raw lyrics, section markers included
+        :type lyrics: str
+        :return: Chunks with offsets into clean_lyrics(lyrics)
+        :rtype: List[LyricChunk]
+        """
+        return self.chunk_batch([lyrics])[0]
+
+    def chunk_batch(self, lyrics_batch: List[str]) -> List[List[LyricChunk]]:
+        """
+        Chunks the lyrics of many songs, tokenizing all their lines in one batch.
+
+        :param lyrics_batch: Raw lyrics of each song
+        :type lyrics_batch: List[str]
+        :return: Chunks of each song
+        :rtype: List[List[LyricChunk]]
+        """
+        songs = [self._split_lines(lyrics) for lyrics in lyrics_batch]
+        counts = iter(self.count_tokens([cleaned[line.start:line.end]
+                                         for cleaned, lines in songs for line in lines]))
+        return [self._pack(cleaned, lines, [next(counts) for _ in lines]) for cleaned, lines in songs]
+
+    def _pack(self, cleaned: str, lines: List[_Line], counts: List[int]) -> List[LyricChunk]:
+        """ Greedily packs consecutive lines of a stanza into chunks. """
+        groups = []
+        current, current_tokens = [], 0
+        for line, count in zip(lines, counts):
+            new_stanza = current and line.stanza != current[-1].stanza
+            # Short stanzas (e.g. a one line hook) are joined with the following stanza
+            if new_stanza and current_tokens < self.min_chunk_size and current_tokens + count <= self.chunk_size:
+                new_stanza = False
+            if current and (new_stanza or current_tokens + count > self.chunk_size):
+                groups.append((current, current_tokens))
+                current, current_tokens = [], 0
+            current.append(line)
+            current_tokens += count
+        if current:
+            groups.append((current, current_tokens))
+
+        return [LyricChunk(text=cleaned[group[0].start:group[-1].end],
+                           start_index=group[0].start,
+                           end_index=group[-1].end,
+                           token_count=tokens,
+                           section=group[0].section)
+                for group, tokens in groups]
@@ -0,0 +1,386 @@
+"""
+Compact on-disk lyric corpus shared by the scraper output, Indexer and Retriever.
+
+A corpus directory holds flat binary arrays that are appended to while writing
+and memory-mapped while reading:
+
+    manifest.json      counts, embedding dim and model, section names
+    songs.jsonl        one metadata record per song
+    lyrics.bin         cleaned lyrics of all songs, UTF-8, concatenated
+    songs.i64          per song: lyrics byte start, byte end, first chunk, chunk count
+    chunks.i64         per chunk: song index, lyrics byte start, byte end, section (-1 if none)
+    embeddings.f32     per chunk: embedding row
+"""
+import re
+import json
+import logging
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.rag.embedding_cache import CachedEmbedder, EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+CORPUS_VERSION = 2
+SONG_FIELDS = 4
+CHUNK_FIELDS = 4
+# Version 1 corpora have no section column, they are still readable
+CHUNK_FIELDS_V1 = 3
+
+
+def clean_lyrics(lyrics: str) -> str:
+    """
+    Cleans text of lyrics scraped from Genius. Strips section
+    markers, e.g., [Intro], [Verse 1], etc., and removes extra
+    whitespace.
+
+    :param lyrics: Raw lyric string
+    :type lyrics: str
+    :return: Cleaned lyric string
+    :rtype: str
+    """
+    text = re.sub(r'\[.*?\]', '', lyrics)
+    text = re.sub(r'\n\s*\n', '\n', text)
+    return text.strip()
+
+
+def chunk_id(artist_name: str, title: str, i: int) -> str:
+    """
+    Builds the ChromaDB id of the i-th chunk of a song.
+
+    :param artist_name: Name of the artist
+    :type artist_name: str
+    :param title: Title of the song
+    :type title: str
+    :param i: Position of the chunk in the song
+    :type i: int
+    :return: Chunk id
+    :rtype: str
+    """
+    artist_slug = re.sub(r"\s", "-", artist_name)
+    title_slug = re.sub(r"\s", "-", title)
+    return f"{artist_slug}_{title_slug}_{i}"
+
+
+def iter_genius_songs(path: str) -> Iterator[dict]:
+    """
+    Yields songs from a Genius download, either a per-artist JSON file or the
+    per-song JSONL written by the streaming scraper. Every song has artist_name set.
+
+    :param path: Path to .json or .jsonl file
+    :type path: str
+    :return: Iterator over song dictionaries
+    """
+    path = Path(path)
+    if path.suffix == ".jsonl":
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    for song in data['songs']:
+        yield {"artist_name": data['artist_name'], **song}
+
+
+def chunk_songs(chunker, lyrics_batch: List[str]) -> list:
+    """
+    Chunks the lyrics of many songs. Chunkers taking raw lyrics (LyricChunker) chunk
+    them with chunk_batch, which tokenizes the lines of all songs in one call.
+
+    :param chunker: Chunker with a chunk(text) method
+    :param lyrics_batch: Lyrics of each song, raw for chunkers with takes_raw_lyrics set
+    :type lyrics_batch: List[str]
+    :return: Chunks of each song
+    :rtype: list
+    """
+    if getattr(chunker, "takes_raw_lyrics", False) and hasattr(chunker, "chunk_batch"):
+        return chunker.chunk_batch(lyrics_batch)
+    return [chunker.chunk(lyrics) for lyrics in lyrics_batch]
+
+
+class CorpusWriter:
+    """
+    Streams songs, their chunks and chunk embeddings into a corpus directory.
+    Use as a context manager so the manifest is written on exit.
+    """
+    def __init__(self, path: str, embedding_model: Optional[str] = None):
+        """
+        :param path: Corpus directory, created if missing (existing corpora are overwritten)
+        :type path: str
+        :param embedding_model: Name of the model the embeddings were computed with
+        :type embedding_model: Optional[str]
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.embedding_model = embedding_model
+        self.embedding_dim: Optional[int] = None
+        self.num_songs = 0
+        self.num_chunks = 0
+        self._lyrics_bytes = 0
+        self._sections = {}
+
+        self._files = {
+            name: open(self.path / name, 'wb')
+            for name in ("songs.jsonl", "lyrics.bin", "songs.i64", "chunks.i64", "embeddings.f32")
+        }
+
+    def __enter__(self) -> "CorpusWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_song(self, metadata: dict, lyrics: str, spans: List[Tuple[int, int]], embeddings: np.ndarray,
+                 sections: Optional[List[Optional[str]]] = None):
+        """
+        Appends one song to the corpus.
+
+        :param metadata: JSON serializable song metadata (artist, title, album, ...)
+        :type metadata: dict
+        :param lyrics: Cleaned lyrics of the song
+        :type lyrics: str
+        :param spans: (start, end) character offsets of each chunk in lyrics
+        :type spans: List[Tuple[int, int]]
+        :param embeddings: 2D array with one embedding per chunk
+        :type embeddings: np.ndarray
+        :param sections: Section of each chunk, e.g. "Verse 1", None for chunks without one
+        :type sections: Optional[List[Optional[str]]]
+        """
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if spans and len(spans) != len(embeddings):
+            raise ValueError("Number of chunks and embeddings must match")
+        if sections is None:
+            sections = [None] * len(spans)
+        elif len(sections) != len(spans):
+            raise ValueError("Number of chunks and sections must match")
+        if spans:
+            if self.embedding_dim is None:
+                self.embedding_dim = embeddings.shape[1]
+            elif embeddings.shape[1] != self.embedding_dim:
+                raise ValueError(f"Expected embeddings of dim {self.embedding_dim}")
+
+        encoded = lyrics.encode('utf-8')
+        song_start = self._lyrics_bytes
+
+        # Chunk spans are character offsets, the reader slices bytes
+        chunk_rows = []
+        for (start, end), section in zip(spans, sections):
+            byte_start = song_start + len(lyrics[:start].encode('utf-8'))
+            byte_end = byte_start + len(lyrics[start:end].encode('utf-8'))
+            section_index = -1 if section is None else self._sections.setdefault(section, len(self._sections))
+            chunk_rows.append((self.num_songs, byte_start, byte_end, section_index))
+
+        self._files["songs.jsonl"].write((json.dumps(metadata, ensure_ascii=False) + '\n').encode('utf-8'))
+        self._files["lyrics.bin"].write(encoded)
+        self._files["songs.i64"].write(
+            np.array([song_start, song_start + len(encoded), self.num_chunks, len(spans)],
+                     dtype=np.int64).tobytes())
+        if spans:
+            self._files["chunks.i64"].write(np.array(chunk_rows, dtype=np.int64).tobytes())
+            self._files["embeddings.f32"].write(embeddings.tobytes())
+
+        self._lyrics_bytes += len(encoded)
+        self.num_songs += 1
+        self.num_chunks += len(spans)
+
+    def close(self):
+        """ Flushes the arrays and writes the manifest. """
+        for f in self._files.values():
+            if not f.closed:
+                f.close()
+        with open(self.path / "manifest.json", 'w') as f:
+            json.dump({
+                "version": CORPUS_VERSION,
+                "num_songs": self.num_songs,
+                "num_chunks": self.num_chunks,
+                "embedding_dim": self.embedding_dim,
+                "embedding_model": self.embedding_model,
+                "sections": list(self._sections)
+            }, f, indent=2)
+        logger.info(f"Wrote corpus of {self.num_songs} songs and {self.num_chunks} chunks to {self.path}")
+
+
+class CorpusReader:
+    """
+    Memory-maps a corpus directory written by CorpusWriter.
+    """
+    def __init__(self, path: str):
+        """
+        :param path: Corpus directory
+        :type path: str
+        """
+        self.path = Path(path)
+        with open(self.path / "manifest.json", 'r') as f:
+            self.manifest = json.load(f)
+        if self.manifest["version"] not in (1, CORPUS_VERSION):
+            raise ValueError(f"Unsupported corpus version {self.manifest['version']}")
+
+        with open(self.path / "songs.jsonl", 'r', encoding='utf-8') as f:
+            self.songs = [json.loads(line) for line in f]
+
+        self.embedding_model = self.manifest["embedding_model"]
+        self.sections = self.manifest.get("sections", [])
+        chunk_fields = CHUNK_FIELDS_V1 if self.manifest["version"] == 1 else CHUNK_FIELDS
+        self._lyrics = self._memmap("lyrics.bin", np.uint8)
+        self._song_rows = self._memmap("songs.i64", np.int64, (self.manifest["num_songs"], SONG_FIELDS))
+        self._chunk_rows = self._memmap("chunks.i64", np.int64, (self.manifest["num_chunks"], chunk_fields))
+        self.embeddings = self._memmap("embeddings.f32", np.float32,
+                                       (self.manifest["num_chunks"], self.manifest["embedding_dim"] or 0))
+
+    def _memmap(self, name: str, dtype, shape: Optional[tuple] = None) -> np.ndarray:
+        """ Memory-maps an array file, empty files can't be mapped so get an empty array. """
+        file = self.path / name
+        if file.stat().st_size == 0:
+            return np.zeros(shape or (0,), dtype=dtype)
+        return np.memmap(file, dtype=dtype, mode='r', shape=shape)
+
+    def __len__(self) -> int:
+        return self.manifest["num_chunks"]
+
+    def _text(self, start: int, end: int) -> str:
+        return bytes(self._lyrics[start:end]).decode('utf-8')
+
+    def lyrics(self, song: int) -> str:
+        """
+        :param song: Song index
+        :type song: int
+        :return: Cleaned lyrics of the song
+        :rtype: str
+        """
+        start, end, _, _ = self._song_rows[song]
+        return self._text(start, end)
+
+    def chunk_text(self, i: int) -> str:
+        """
+        :param i: Chunk index
+        :type i: int
+        :return: Text of the chunk
+        :rtype: str
+        """
+        _, start, end = self._chunk_rows[i][:CHUNK_FIELDS_V1]
+        return self._text(start, end)
+
+    def chunk_section(self, i: int) -> Optional[str]:
+        """
+        :param i: Chunk index
+        :type i: int
+        :return: Section of the chunk, e.g. "Verse 1", None if it was chunked without sections
+        :rtype: Optional[str]
+        """
+        if self._chunk_rows.shape[1] < CHUNK_FIELDS:
+            return None
+        section = int(self._chunk_rows[i][3])
+        return None if section < 0 else self.sections[section]
+
+    def chunk_metadata(self, i: int) -> dict:
+        """
+        :param i: Chunk index
+        :type i: int
+        :return: ChromaDB metadata of the chunk, its song metadata plus its section if it has one
+        :rtype: dict
+        """
+        section = self.chunk_section(i)
+        if section is None:
+            return self.chunk_song(i)
+        return {**self.chunk_song(i), "section": section}
+
+    def chunk_song(self, i: int) -> dict:
+        """
+        :param i: Chunk index
+        :type i: int
+        :return: Metadata of the song the chunk belongs to
+        :rtype: dict
+        """
+        return self.songs[int(self._chunk_rows[i][0])]
+
+    def chunk_id(self, i: int) -> str:
+        """
+        :param i: Chunk index
+        :type i: int
+        :return: ChromaDB id of the chunk, as used by Indexer
+        :rtype: str
+        """
+        song = int(self._chunk_rows[i][0])
+        position = i - int(self._song_rows[song][2])
+        metadata = self.songs[song]
+        return chunk_id(metadata["artist"], metadata["title"], position)
+
+    def iter_batches(self, batch_size: int = 1024) -> Iterator[Tuple[List[str], List[str], List[dict], np.ndarray]]:
+        """
+        Iterates over chunks in batches ready to add to ChromaDB.
+
+        :param batch_size: Chunks per batch (default=1024)
+        :type batch_size: int
+        :return: Iterator over (ids, texts, metadatas, embeddings) batches
+        """
+        for start in range(0, len(self), batch_size):
+            rows = range(start, min(start + batch_size, len(self)))
+            yield ([self.chunk_id(i) for i in rows],
+                   [self.chunk_text(i) for i in rows],
+                   [self.chunk_metadata(i) for i in rows],
+                   np.asarray(self.embeddings[rows.start:rows.stop]))
+
+
+def convert_genius(json_paths: List[str], writer: CorpusWriter, chunker, embedder,
+                   embedding_cache: Optional[EmbeddingCache] = None) -> int:
+    """
+    Converts Genius JSON/JSONL downloads into a corpus, cleaning, chunking and
+    embedding every song once.
+
+    :param json_paths: Paths of Genius .json or .jsonl files
+    :type json_paths: List[str]
+    :param writer: Corpus to write to
+    :type writer: CorpusWriter
+    :param chunker: Chunker producing chunks with text, start_index and end_index.
+        Chunkers with takes_raw_lyrics set get the lyrics before cleaning and their
+        chunk sections are stored in the corpus.
+    :param embedder: Embedder with an encode(texts) method
+    :param embedding_cache: Cache of the embedder's model, only chunk texts not in it are embedded
+    :type embedding_cache: Optional[EmbeddingCache]
+    :return: Number of songs written
+    :rtype: int
+    """
+    # An empty cache is falsy (it has a length), compare with None
+    if embedding_cache is not None:
+        embedder = CachedEmbedder(embedder, embedding_cache)
+    written = 0
+    for json_path in json_paths:
+        logger.info(f"Converting {json_path}")
+        try:
+            songs = list(iter_genius_songs(json_path))
+        except (KeyError, json.JSONDecodeError) as e:
+            logger.error(f"Failed to parse {json_path}: {e}")
+            continue
+
+        raw = getattr(chunker, "takes_raw_lyrics", False)
+        valid = []
+        for song in songs:
+            try:
+                lyrics = clean_lyrics(song["lyrics"])
+                if not lyrics.strip():
+                    logger.warning(f"Skipping '{song['title']}': empty lyrics after cleaning")
+                    continue
+                metadata = {"artist": song["artist_name"], "title": song["title"]}
+                # ChromaDB rejects None metadata values, streamed songs may lack an album
+                album_name = (song.get("album") or {}).get("name")
+                if album_name is not None:
+                    metadata["album"] = album_name
+                valid.append((metadata, song["lyrics"], lyrics))
+            except KeyError as e:
+                logger.warning(f"Skipping song in {json_path} because of missing key {e}")
+
+        # All songs of a file are chunked together
+        chunked = chunk_songs(chunker, [raw_lyrics if raw else lyrics for _, raw_lyrics, lyrics in valid])
+        for (metadata, _, lyrics), chunks in zip(valid, chunked):
+            embeddings = embedder.encode([chunk.text for chunk in chunks])
+            writer.add_song(metadata, lyrics,
+                            [(chunk.start_index, chunk.end_index) for chunk in chunks],
+                            embeddings,
+                            [chunk.section or "" for chunk in chunks] if raw else None)
+            written += 1
+    return written
@@ -0,0 +1,130 @@
+"""Embedders of the retrieval backends, created by create_embedder."""
+import json
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+
+# Name of the embedding model
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+class SentenceTransformerEmbedder:
+    """
+    Embeds with sentence-transformers on PyTorch, full precision.
+    """
+    def __init__(self, model_name: str = EMBEDDING_MODEL, threads: Optional[int] = None):
+        """
+        :param model_name: Hugging Face name or local path of the model
+        :type model_name: str
+        :param threads: Intra-op threads of PyTorch (process wide), defaults to all cores
+        :type threads: Optional[int]
+        """
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name, device="cpu")
+        # Recorded in corpora and embedding cache keys
+        self.name = model_name
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        :param sentences: A text or a list of texts
+        :param batch_size: Texts per forward pass
+        :type batch_size: int
+        :return: Embedding of a single text, or a 2D array for a list
+        :rtype: np.ndarray
+        """
+        return self.model.encode(sentences, batch_size=batch_size, **kwargs)
+
+class OnnxEmbedder:
+    """
+    Embeds with an ONNX export of the model on onnxruntime, normally dynamically
+    quantized to int8 by scripts/export_onnx_embedder.py. Loads only local files:
+
+        model.onnx       transformer exported to ONNX (int8 weights)
+        tokenizer.json   fast tokenizer of the model
+        embedder.json    model name, max sequence length and pooling
+    """
+    def __init__(self, model_dir: str, threads: Optional[int] = None):
+        """
+        :param model_dir: Directory written by scripts/export_onnx_embedder.py
+        :type model_dir: str
+        :param threads: Intra-op threads of the session, defaults to all cores
+        :type threads: Optional[int]
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        config = json.loads((model_dir / "embedder.json").read_text())
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads or 0
+        # One request is one graph run, don't spawn a second pool for parallel branches
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(model_dir / "model.onnx"), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(config["max_seq_length"])
+        self.tokenizer.enable_padding()
+        self.normalize = config.get("normalize", True)
+        self.name = f"{config['model_name']}:{config.get('quantization', 'fp32')}-onnx"
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        Embeds texts with mean pooling over their tokens, like sentence-transformers.
+
+        :param sentences: A text or a list of texts
+        :param batch_size: Texts per forward pass
+        :type batch_size: int
+        :return: Embedding of a single text, or a 2D array for a list
+        :rtype: np.ndarray
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            inputs = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            token_embeddings = self.session.run(None, {name: value for name, value in inputs.items()
+                                                       if name in self.input_names})[0]
+            mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype(np.float32))
+
+        embeddings = np.concatenate(batches) if batches else np.zeros((0, 0), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+def create_embedder(backend: str = "sentence-transformers", threads: Optional[int] = None,
+                    onnx_model_dir: Optional[str] = None):
+    """
+    Creates the embedder of a backend.
+
+    :param backend: "sentence-transformers" or "onnx"
+    :type backend: str
+    :param threads: Intra-op threads, defaults to all cores
+    :type threads: Optional[int]
+    :param onnx_model_dir: Model directory of the onnx backend
+    :type onnx_model_dir: Optional[str]
+    :return: Embedder with an encode(texts) method and a name
+    """
+    if backend == "sentence-transformers":
+        return SentenceTransformerEmbedder(EMBEDDING_MODEL, threads=threads)
+    if backend == "onnx":
+        if not onnx_model_dir:
+            raise ValueError("The onnx embedder backend needs onnx_model_dir")
+        return OnnxEmbedder(onnx_model_dir, threads=threads)
+    raise ValueError(f"Unknown embedder backend {backend}")
@@ -0,0 +1,229 @@
+"""
+Content-addressed on-disk cache of chunk embeddings, shared by index builds.
+
+Embeddings are keyed by a hash of the embedding model name and the whitespace
+normalized chunk text, so rebuilding an index only embeds chunks whose text is new.
+A cache directory holds two append-only files that stay row aligned:
+
+    cache.json     embedding dim and format version
+    keys.bin       per entry: 16 byte key
+    vectors.f32    per entry: embedding row, memory-mapped while reading
+
+A single process should write to a cache at a time, any number may read it.
+Readers other than the writer open the cache with read_only=True, so they never
+modify its files.
+"""
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+KEY_BYTES = 16
+
+
+def embedding_key(model_name: str, text: str) -> bytes:
+    """
+    Cache key of a text embedded with a model. Runs of whitespace are collapsed
+    so chunks that only differ in spacing share an embedding.
+
+    :param model_name: Name of the embedding model
+    :type model_name: str
+    :param text: Text to embed
+    :type text: str
+    :return: 16 byte key
+    :rtype: bytes
+    """
+    normalized = " ".join(text.split())
+    return hashlib.blake2b(f"{model_name}\0{normalized}".encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+
+class EmbeddingCache:
+    """
+    Append-only store of embeddings looked up by embedding_key. The key index is held
+    in memory, vectors are read from a memory map of vectors.f32.
+    """
+    def __init__(self, path: str, model_name: str, read_only: bool = False):
+        """
+        :param path: Cache directory, created if missing unless read_only
+        :type path: str
+        :param model_name: Name of the embedding model, part of every key
+        :type model_name: str
+        :param read_only: Only look up embeddings, never write to the cache files
+        :type read_only: bool
+        """
+        self.path = Path(path)
+        if not read_only:
+            self.path.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.read_only = read_only
+        self.dim: Optional[int] = None
+        self._index: Dict[bytes, int] = {}
+        self._vectors: Optional[np.ndarray] = None
+
+        self.hits = 0
+        self.misses = 0
+
+        meta_file = self.path / "cache.json"
+        if meta_file.exists():
+            meta = json.loads(meta_file.read_text())
+            if meta["version"] != CACHE_VERSION:
+                raise ValueError(f"Unsupported embedding cache version {meta['version']}")
+            self.dim = meta["dim"]
+            self._load_index()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _load_index(self):
+        """ Reads the keys, dropping entries a crash left without a complete vector. """
+        keys_file, vectors_file = self.path / "keys.bin", self.path / "vectors.f32"
+        keys = keys_file.read_bytes() if keys_file.exists() else b""
+        row_bytes = self.dim * 4
+        vector_rows = vectors_file.stat().st_size // row_bytes if vectors_file.exists() else 0
+        rows = min(len(keys) // KEY_BYTES, vector_rows)
+
+        # A reader may see the writer in the middle of an append, only the writer truncates
+        if not self.read_only and (rows * KEY_BYTES != len(keys) or rows != vector_rows):
+            logger.warning(f"Truncating incomplete entries of embedding cache {self.path}")
+            with open(keys_file, 'ab') as f:
+                f.truncate(rows * KEY_BYTES)
+            with open(vectors_file, 'ab') as f:
+                f.truncate(rows * row_bytes)
+
+        self._index = {keys[i * KEY_BYTES:(i + 1) * KEY_BYTES]: i for i in range(rows)}
+
+    def _mapped_vectors(self) -> np.ndarray:
+        """ Memory map of all vectors, remapped after appends. """
+        if self._vectors is None or len(self._vectors) < len(self._index):
+            self._vectors = np.memmap(self.path / "vectors.f32", dtype=np.float32, mode="r",
+                                      shape=(len(self._index), self.dim))
+        return self._vectors
+
+    def get(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Looks up the embeddings of texts.
+
+        :param texts: Texts to look up
+        :type texts: List[str]
+        :return: Embedding of each text, None where it is not cached
+        :rtype: List[Optional[np.ndarray]]
+        """
+        rows = [self._index.get(embedding_key(self.model_name, text)) for text in texts]
+        found = sum(row is not None for row in rows)
+        self.hits += found
+        self.misses += len(rows) - found
+        if not found:
+            return [None] * len(rows)
+        vectors = self._mapped_vectors()
+        return [None if row is None else np.array(vectors[row]) for row in rows]
+
+    def add(self, texts: List[str], embeddings: np.ndarray):
+        """
+        Appends embeddings of texts not cached yet.
+
+        :param texts: Embedded texts
+        :type texts: List[str]
+        :param embeddings: 2D array with one embedding per text
+        :type embeddings: np.ndarray
+        :raises ValueError: If the cache is read only
+        """
+        if self.read_only:
+            raise ValueError(f"Embedding cache {self.path} is opened read only")
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if len(texts) != len(embeddings):
+            raise ValueError("Number of texts and embeddings must match")
+        if not texts:
+            return
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+            (self.path / "cache.json").write_text(json.dumps({"version": CACHE_VERSION, "dim": self.dim}))
+        elif embeddings.shape[1] != self.dim:
+            raise ValueError(f"Expected embeddings of dim {self.dim}")
+
+        new_keys, new_rows = {}, []
+        for text, embedding in zip(texts, embeddings):
+            key = embedding_key(self.model_name, text)
+            if key in self._index or key in new_keys:
+                continue
+            new_keys[key] = None
+            new_rows.append(embedding)
+        if not new_keys:
+            return
+
+        # Vectors first, so a key on disk always has its vector
+        with open(self.path / "vectors.f32", 'ab') as f:
+            f.write(np.stack(new_rows).tobytes())
+        with open(self.path / "keys.bin", 'ab') as f:
+            f.write(b"".join(new_keys))
+        for key in new_keys:
+            self._index[key] = len(self._index)
+
+    def encode(self, texts: List[str], embedder, **kwargs) -> np.ndarray:
+        """
+        Embeds texts, running the embedder only on texts that are not cached.
+        New embeddings are added to the cache unless it is read only.
+
+        :param texts: Texts to embed
+        :type texts: List[str]
+        :param embedder: Embedder with an encode(texts) method, running model_name
+        :return: 2D array with one embedding per text
+        :rtype: np.ndarray
+        """
+        cached = self.get(texts)
+        missing = list(dict.fromkeys(text for text, embedding in zip(texts, cached) if embedding is None))
+        if missing:
+            computed = np.atleast_2d(np.asarray(embedder.encode(missing, **kwargs), dtype=np.float32))
+            if not self.read_only:
+                self.add(missing, computed)
+            by_text = dict(zip(missing, computed))
+            cached = [by_text[text] if embedding is None else embedding
+                      for text, embedding in zip(texts, cached)]
+        if not cached:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.stack(cached)
+
+    def stats(self) -> dict:
+        """
+        Cache metrics since the cache was opened.
+
+        :return: Entries, size on disk, hits, misses and hit rate
+        :rtype: dict
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._index),
+            "bytes": len(self._index) * ((self.dim or 0) * 4 + KEY_BYTES),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CachedEmbedder:
+    """
+    Drop-in wrapper of an embedder whose encode() goes through an EmbeddingCache.
+    """
+    def __init__(self, embedder, cache: EmbeddingCache):
+        """
+        :param embedder: Embedder with an encode(texts) method
+        :param cache: Cache of the embedder's model
+        :type cache: EmbeddingCache
+        """
+        self.embedder = embedder
+        self.cache = cache
+
+    def encode(self, sentences, **kwargs) -> np.ndarray:
+        """
+        :param sentences: A text or a list of texts
+        :return: Embedding of a single text, or a 2D array for a list
+        :rtype: np.ndarray
+        """
+        if isinstance(sentences, str):
+            return self.cache.encode([sentences], self.embedder, **kwargs)[0]
+        return self.cache.encode(list(sentences), self.embedder, **kwargs)
@@ -0,0 +1,275 @@
+"""Versioned index directories and zero-downtime Retriever hot-swapping."""
+import os
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+
+
+def check_version_name(version: str):
+    """
+    Checks version names a single directory directly under the index root.
+
+    :param version: Name of a version directory
+    :type version: str
+    :raises ValueError: If version is empty, . or .., or contains a path separator
+    """
+    if version in ("", ".", "..") or "/" in version or "\\" in version:
+        raise ValueError(f"Invalid index version name {version!r}")
+
+
+def new_version_dir(index_root: str) -> Path:
+    """
+    Creates an empty, timestamp named version directory under index_root. Names have
+    microsecond precision and sort by creation time.
+
+    :param index_root: Directory holding all index versions
+    :type index_root: str
+    :return: Path of the new version directory
+    :rtype: Path
+    """
+    Path(index_root).mkdir(parents=True, exist_ok=True)
+    while True:
+        version_dir = Path(index_root) / datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        try:
+            version_dir.mkdir()
+            return version_dir
+        except FileExistsError:
+            # Another build started in the same microsecond
+            continue
+
+
+def publish_version(index_root: str, version: str):
+    """
+    Atomically points the CURRENT file of index_root at version.
+
+    :param index_root: Directory holding all index versions
+    :type index_root: str
+    :param version: Name of a version directory under index_root
+    :type version: str
+    :raises ValueError: If version is not a valid, existing version directory
+    """
+    check_version_name(version)
+    index_root = Path(index_root)
+    if not (index_root / version).is_dir():
+        raise ValueError(f"Index version {version} does not exist in {index_root}")
+    tmp_file = index_root / f"{CURRENT_FILE}.tmp"
+    tmp_file.write_text(version)
+    os.replace(tmp_file, index_root / CURRENT_FILE)
+    logger.info(f"Published index version {version}")
+
+
+def open_retriever(version_dir: Path, embedder, quantization: Optional[str] = None,
+                   rescore_multiplier: int = 4, collection_name: str = "lyric_chunks"):
+    """
+    Opens the Retriever of a version directory written by build_index.py --index-root.
+
+    :param version_dir: Version directory with chroma/ and optionally embeddings/
+    :type version_dir: Path
+    :param embedder: Query embedder
+    :param quantization: Load the quantized embedding store if set
+    :type quantization: Optional[str]
+    :param rescore_multiplier: Candidates rescored per result with a quantized store
+    :type rescore_multiplier: int
+    :param collection_name: Name of ChromaDB collection
+    :type collection_name: str
+    :return: Retriever over the version
+    """
+    import chromadb
+    from chromadb.config import Settings
+    from app.services.rag.quantization import QuantizedEmbeddingStore
+    from app.services.rag.retriever import Retriever
+
+    client = chromadb.PersistentClient(path=str(version_dir / "chroma"),
+                                       settings=Settings(anonymized_telemetry=False))
+    collection = client.get_collection(collection_name)
+    store = None
+    if quantization:
+        store = QuantizedEmbeddingStore.load(version_dir / "embeddings")
+    return Retriever(collection, embedder, store=store, rescore_multiplier=rescore_multiplier,
+                     client=client)
+
+
+class _Handle:
+    """ An index version in use, with a count of requests currently reading it. """
+    def __init__(self, version: str, retriever):
+        self.version = version
+        self.retriever = retriever
+        self.readers = 0
+        self.retired = False
+        self.drained = threading.Event()
+
+
+class IndexManager:
+    """
+    Holds the active Retriever. Requests lease it for the duration of a retrieval, and
+    a new index version is opened and warmed in the background before being swapped in.
+    The previous version is released once its last reader is done.
+    """
+    def __init__(self, index_root: Optional[str], opener: Callable[[Path], object],
+                 warmup_queries: Optional[List[str]] = None, drain_timeout: float = 30.0,
+                 warmup_embedder=None):
+        """
+        :param index_root: Directory holding version directories and the CURRENT file
+        :type index_root: Optional[str]
+        :param opener: Opens the Retriever of a version directory
+        :param warmup_queries: Queries run against a new version before it is swapped in
+        :type warmup_queries: Optional[List[str]]
+        :param drain_timeout: Seconds to wait for readers of a retired version
+        :type drain_timeout: float
+        :param warmup_embedder: Embeds warmup queries once for every version, e.g. a
+            CachedEmbedder, instead of each Retriever embedding them again
+        """
+        self.index_root = Path(index_root) if index_root else None
+        self.opener = opener
+        self.warmup_queries = warmup_queries or []
+        self.drain_timeout = drain_timeout
+        self.warmup_embedder = warmup_embedder
+        self._active: Optional[_Handle] = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def version(self) -> Optional[str]:
+        """ Version currently serving requests. """
+        return self._active.version if self._active else None
+
+    def published_version(self) -> Optional[str]:
+        """
+        :return: Version named in the CURRENT file, or None if there is none
+        :rtype: Optional[str]
+        """
+        if self.index_root is None:
+            return None
+        current_file = self.index_root / CURRENT_FILE
+        if not current_file.exists():
+            return None
+        return current_file.read_text().strip() or None
+
+    def versions(self) -> List[str]:
+        """
+        :return: Names of all version directories, oldest first
+        :rtype: List[str]
+        """
+        if self.index_root is None or not self.index_root.exists():
+            return []
+        return sorted(p.name for p in self.index_root.iterdir() if p.is_dir())
+
+    @contextmanager
+    def lease(self) -> Iterator[object]:
+        """
+        Leases the active Retriever. The version it belongs to is not released until
+        every lease on it has ended, even if a newer version is swapped in meanwhile.
+        """
+        with self._lock:
+            handle = self._active
+            if handle is None:
+                raise RuntimeError("No index loaded")
+            handle.readers += 1
+        try:
+            yield handle.retriever
+        finally:
+            with self._lock:
+                handle.readers -= 1
+                if handle.retired and handle.readers == 0:
+                    handle.drained.set()
+
+    def activate(self, retriever, version: str):
+        """
+        Swaps in a Retriever and releases the previous one once its readers drain.
+
+        :param retriever: Retriever of the new version, ready to serve
+        :param version: Name of the version
+        :type version: str
+        """
+        with self._lock:
+            old, self._active = self._active, _Handle(version, retriever)
+            if old is not None:
+                old.retired = True
+                if old.readers == 0:
+                    old.drained.set()
+        logger.info(f"Serving index version {version}")
+
+        if old is not None:
+            threading.Thread(target=self._release, args=(old,), daemon=True).start()
+
+    def _release(self, handle: _Handle):
+        """ Waits for readers of a retired version, then drops and closes it. """
+        if not handle.drained.wait(self.drain_timeout):
+            logger.warning(f"Index version {handle.version} still has {handle.readers} "
+                           f"readers after {self.drain_timeout}s, releasing anyway")
+        handle.retriever.close()
+        handle.retriever = None
+        logger.info(f"Released index version {handle.version}")
+
+    def load(self, version: Optional[str] = None) -> str:
+        """
+        Opens, warms and activates a version. Blocks, use reload() from async code.
+
+        :param version: Version to load, defaults to the published (CURRENT) version
+        :type version: Optional[str]
+        :return: Version now serving requests
+        :rtype: str
+        """
+        if self.index_root is None:
+            raise RuntimeError("Index hot-swapping needs an index root")
+        with self._load_lock:
+            version = version or self.published_version()
+            if version is None:
+                raise ValueError(f"No published index version in {self.index_root}")
+            if version == self.version:
+                return version
+            check_version_name(version)
+            version_dir = self.index_root / version
+            if not version_dir.is_dir():
+                raise ValueError(f"Index version {version} does not exist in {self.index_root}")
+
+            logger.info(f"Opening index version {version}")
+            retriever = self.opener(version_dir)
+            if self.warmup_embedder is not None and self.warmup_queries:
+                embeddings = self.warmup_embedder.encode(self.warmup_queries)
+                for query, query_embedding in zip(self.warmup_queries, embeddings):
+                    retriever.retrieve(query, top_k=10, query_embedding=query_embedding)
+            else:
+                for query in self.warmup_queries:
+                    retriever.retrieve(query, top_k=10)
+            self.activate(retriever, version)
+            return version
+
+    async def reload(self, version: Optional[str] = None) -> str:
+        """
+        Loads a version in a worker thread so requests keep being served meanwhile.
+
+        :param version: Version to load, defaults to the published (CURRENT) version
+        :type version: Optional[str]
+        :return: Version now serving requests
+        :rtype: str
+        """
+        return await asyncio.to_thread(self.load, version)
+
+    async def watch(self, interval: float):
+        """
+        Polls the CURRENT file and loads newly published versions.
+
+        :param interval: Seconds between polls
+        :type interval: float
+        """
+        failed = None
+        while True:
+            await asyncio.sleep(interval)
+            published = self.published_version()
+            if published is None or published in (self.version, failed):
+                continue
+            try:
+                await self.reload(published)
+            except Exception as e:
+                # Don't retry a broken version until another one is published
+                failed = published
+                logger.error(f"Failed to load index version {published}: {e}", exc_info=True)
@@ -1,24 +1,46 @@
-import re
 import json
 import logging
 import os
 from pathlib import Path
+from typing import Optional
 
 import chromadb
 from chromadb.config import Settings
-from app.services.rag.utils import chunker, embedder
+from app.services.rag.corpus import CorpusReader, chunk_id, chunk_songs, clean_lyrics, iter_genius_songs
+from app.services.rag.embedding_cache import CachedEmbedder, EmbeddingCache
+from app.services.rag.quantization import QuantizedEmbeddingStore
+from app.services.rag.utils import chunker, embedder, lyric_chunker
 
 logger = logging.getLogger(__name__)
 
 class Indexer:
-    def __init__(self, collection_name: str = "lyric_chunks", reset: bool = False):
+    def __init__(self, collection_name: str = "lyric_chunks", reset: bool = False,
+                 quantization: Optional[str] = None, store_path: str = "./embeddings",
+                 chunking: str = "token", chroma_path: str = "./chroma",
+                 embedding_cache: Optional[str] = None):
         """
         Creates Indexer by initializing ChromaDB persistent client. Set reset to True to refresh indexing.
+        Set quantization to also write a quantized embedding store for the Retriever.
 
         :param collection_name: Name of collection to retrieve or create
         :param reset: Reset the collection if it exists
+        :param quantization: Quantization mode of the embedding store, "int8" or "float16"
+        :param store_path: Directory the quantized embedding store is saved to
+        :param chunking: "token" for fixed size overlapping chunks, "lyric" for line/stanza chunks
+        :param chroma_path: Directory of the ChromaDB persistent client
+        :param embedding_cache: Directory of an embedding cache, only new chunk texts are embedded
         """
-        self.client = chromadb.PersistentClient(settings=Settings(anonymized_telemetry=False)) 
+        if chunking not in ("token", "lyric"):
+            raise ValueError("chunking must be 'token' or 'lyric'")
+        self.chunker = lyric_chunker if chunking == "lyric" else chunker
+
+        self.embedding_cache = None
+        self.embedder = embedder
+        if embedding_cache:
+            self.embedding_cache = EmbeddingCache(embedding_cache, embedder.name)
+            self.embedder = CachedEmbedder(embedder, self.embedding_cache)
+
+        self.client = chromadb.PersistentClient(path=chroma_path, settings=Settings(anonymized_telemetry=False)) 
 
         if reset:
             try:
@@ -31,6 +53,14 @@ class Indexer:
             metadata={"hsnw:space": "cosine"}
         )
 
+        self.store_path = store_path
+        self.store = None
+        if quantization:
+            if not reset and (Path(store_path) / "store.json").exists():
+                self.store = QuantizedEmbeddingStore.load(store_path)
+            else:
+                self.store = QuantizedEmbeddingStore(mode=quantization)
+
     
     def _clean_lyrics(self, lyrics: str) -> str:
         """
@@ -43,61 +73,103 @@ class Indexer:
         :return: Cleaned lyric string
         :rtype: str
         """
-        text = re.sub(r'\[.*?\]', '', lyrics)
-        text = re.sub(r'\n\s*\n', '\n', text)
-        return text.strip()
+        return clean_lyrics(lyrics)
 
 
 
     def index_from_json(self, json_path: str):
         """
-        Indexes json representing data from Genius downloaded using lyricsgenius library.
+        Indexes json representing data from Genius downloaded using lyricsgenius library,
+        either a per-artist .json file or the per-song .jsonl of the streaming scraper.
         
-        :param json_path: Path to json of Genius data download
+        :param json_path: Path to json or jsonl of Genius data download
         :type json_path: str
         """
         try:
-            with open(json_path, 'r') as f:
-                data = json.load(f)
-            artist_name = data['artist_name']
-            artist_slug = re.sub(r"\s", "-", artist_name)
-            songs  = data['songs']
+            songs = list(iter_genius_songs(json_path))
         except (KeyError, json.JSONDecodeError) as e:
             logger.error(f"Failed to parse {json_path}: {e}")
             return
         
+        # The lyric chunker reads section markers, so it gets the raw lyrics
+        raw = getattr(self.chunker, "takes_raw_lyrics", False)
+        valid = []
         for song in songs:
             try:
+                artist_name = song["artist_name"]
                 title = song["title"]
-                title_slug = re.sub(r"\s", "-", title)
                 lyrics = self._clean_lyrics(song["lyrics"])
-                album_name = song.get("album", {}).get("name")
+                # Streamed songs have album None when it was not fetched
+                album_name = (song.get("album") or {}).get("name")
             
                 if not lyrics.strip():
                     logger.warning(f"Skipping '{title}': empty lyrics after cleaning")
                     continue
-                
-                chunks = chunker.chunk(lyrics)
-                chunked_texts = [chunk.text for chunk in chunks]
-                embeddings = embedder.encode(chunked_texts)
-
-                metadatas = [{"artist": artist_name,
-                              "title": title,
-                              "album": album_name,
-                              }] * len(chunked_texts)
-                
-                ids = [f"{artist_slug}_{title_slug}_{i}" for i in range(len(chunked_texts))]
-                self.collection.add(documents=chunked_texts,
+                valid.append((artist_name, title, album_name, song["lyrics"] if raw else lyrics))
+            except KeyError as e:
+                logger.warning(f"Skipping song in {json_path} because of missing key {e}")
+
+        # All songs of the file are chunked in one batch
+        chunked = chunk_songs(self.chunker, [text for _, _, _, text in valid])
+        for (artist_name, title, album_name, _), chunks in zip(valid, chunked):
+            chunked_texts = [chunk.text for chunk in chunks]
+            embeddings = self.embedder.encode(chunked_texts)
+
+            metadata = {"artist": artist_name, "title": title}
+            # ChromaDB rejects None metadata values
+            if album_name is not None:
+                metadata["album"] = album_name
+            metadatas = [metadata] * len(chunked_texts)
+            if raw:
+                metadatas = [{**metadata, "section": chunk.section or ""}
+                             for metadata, chunk in zip(metadatas, chunks)]
+            
+            ids = [chunk_id(artist_name, title, i) for i in range(len(chunked_texts))]
+            self.collection.add(documents=chunked_texts,
+                            embeddings=embeddings.tolist(),
+                            metadatas=metadatas,
+                            ids=ids)
+            if self.store is not None:
+                self.store.add(ids, embeddings)
+
+    def index_corpus(self, corpus_dir: str, batch_size: int = 1024):
+        """
+        Indexes a corpus written by CorpusWriter. Chunks and embeddings are read from
+        the memory-mapped corpus, nothing is re-cleaned, re-chunked or re-embedded.
+
+        :param corpus_dir: Path to corpus directory
+        :type corpus_dir: str
+        :param batch_size: Chunks added to ChromaDB per call (default=1024)
+        :type batch_size: int
+        :raises ValueError: If the corpus was embedded with another model than the one serving queries
+        """
+        corpus = CorpusReader(corpus_dir)
+        # Query embeddings of another model are meaningless against these vectors
+        if corpus.embedding_model is None:
+            logger.warning(f"Corpus {corpus_dir} does not record its embedding model, "
+                           f"assuming it matches {embedder.name}")
+        elif corpus.embedding_model != embedder.name:
+            raise ValueError(f"Corpus {corpus_dir} was embedded with {corpus.embedding_model}, "
+                             f"but queries are embedded with {embedder.name}")
+        logger.info(f"Indexing corpus {corpus_dir}: {len(corpus.songs)} songs, {len(corpus)} chunks")
+
+        for ids, texts, metadatas, embeddings in corpus.iter_batches(batch_size):
+            self.collection.add(documents=texts,
                                 embeddings=embeddings.tolist(),
                                 metadatas=metadatas,
                                 ids=ids)
+            if self.store is not None:
+                self.store.add(ids, embeddings)
 
-            except KeyError as e:
-                logger.warning(f"Skipping song in {json_path} because of missing key {e}")
+        if self.store is not None:
+            self.store.save(self.store_path)
+
+        logger.info(f"Indexing complete. Total chunks: {self.collection.count()}")
 
     def index_dir(self, json_dir: str, recursive: bool = True):
         """
-        Recursively indexes directory of Genius data that was scraped using lyricsgenius 
+        Recursively indexes directory of Genius data that was scraped using lyricsgenius,
+        .json files of the json save format and .jsonl files of the jsonl save format
 
         :param json_dir: Path to json dir
         :param recursive: Indicates whether to recursively index subdirectories of json dir
@@ -105,15 +177,21 @@ class Indexer:
         """
         json_dir = Path(json_dir)
 
-        if recursive:
-            json_files = json_dir.rglob("*.json")
-        else:
-            json_files = json_dir.glob("*.json")
+        glob = json_dir.rglob if recursive else json_dir.glob
+        json_files = sorted([*glob("*.json"), *glob("*.jsonl")])
         
         for json_file in json_files:
+            if json_file.name == "scrape_metadata.json":
+                continue
             logger.info(f"Indexing json file: {json_file}")
             self.index_from_json(json_file)
         
+        if self.store is not None:
+            self.store.save(self.store_path)
+
+        if self.embedding_cache is not None:
+            logger.info(f"Embedding cache: {self.embedding_cache.stats()}")
+
         logger.info(f"Indexing complete. Total chunks: {self.collection.count()}")
         
 
@@ -0,0 +1,260 @@
+"""Quantized embedding storage with full precision rescoring."""
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ("int8", "float16")
+# Quantized rows converted to float32 at a time during search, bounds the scratch memory
+SEARCH_BLOCK_ROWS = 4096
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    """
+    L2 normalizes embeddings row-wise so dot products are cosine similarities.
+
+    :param embeddings: 2D array of embeddings
+    :type embeddings: np.ndarray
+    :return: Normalized float32 embeddings
+    :rtype: np.ndarray
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def quantize(embeddings: np.ndarray, mode: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Quantizes embeddings to int8 with per-vector scales or to float16.
+
+    :param embeddings: 2D float32 array of embeddings
+    :type embeddings: np.ndarray
+    :param mode: Either "int8" or "float16"
+    :type mode: str
+    :return: Quantized embeddings and per-vector scales (None for float16)
+    :rtype: Tuple[np.ndarray, Optional[np.ndarray]]
+    """
+    if mode == "float16":
+        return embeddings.astype(np.float16), None
+    if mode == "int8":
+        scales = np.abs(embeddings).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.round(embeddings / scales[:, None]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+    raise ValueError(f"Unknown quantization mode: {mode}")
+
+
+class QuantizedEmbeddingStore:
+    """
+    Keeps quantized embeddings in memory for a first-pass search and rescores
+    the best candidates against full precision embeddings memory-mapped from disk.
+    """
+    def __init__(self, mode: str = "int8"):
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Quantization mode must be one of {QUANTIZATION_MODES}")
+        self.mode = mode
+        self.ids: List[str] = []
+        self._id_set: Set[str] = set()
+        self.quantized: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.full: Optional[np.ndarray] = None
+        self._pending: List[np.ndarray] = []
+        self.block_rows = SEARCH_BLOCK_ROWS
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, ids: List[str], embeddings: np.ndarray):
+        """
+        Adds embeddings to the store. Embeddings are normalized before storage.
+        Ids already in the store are skipped, like ChromaDB's add does, so indexing
+        the same songs again doesn't add duplicate rows.
+
+        :param ids: Chunk ids matching the ChromaDB collection
+        :type ids: List[str]
+        :param embeddings: 2D array of embeddings, one row per id
+        :type embeddings: np.ndarray
+        """
+        embeddings = np.atleast_2d(embeddings)
+        if len(ids) != len(embeddings):
+            raise ValueError("Number of ids and embeddings must match")
+        rows = []
+        for row, chunk_id in enumerate(ids):
+            if chunk_id not in self._id_set:
+                self._id_set.add(chunk_id)
+                self.ids.append(chunk_id)
+                rows.append(row)
+        if len(rows) < len(ids):
+            logger.info(f"Skipped {len(ids) - len(rows)} embeddings already in the store")
+        if rows:
+            self._pending.append(_normalize(embeddings[rows]))
+
+    def _consolidate(self):
+        """ Folds embeddings added since the last call into the stored arrays. """
+        if not self._pending:
+            return
+        new_full = np.concatenate(self._pending)
+        new_quantized, new_scales = quantize(new_full, self.mode)
+        self._pending = []
+
+        if self.full is None:
+            self.full, self.quantized, self.scales = new_full, new_quantized, new_scales
+            return
+        self.full = np.concatenate([self.full, new_full])
+        self.quantized = np.concatenate([self.quantized, new_quantized])
+        if new_scales is not None:
+            self.scales = np.concatenate([self.scales, new_scales])
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5,
+               rescore_multiplier: int = 4) -> List[Tuple[str, float]]:
+        """
+        Searches quantized embeddings, then rescores the top candidates with full precision.
+
+        :param query_embedding: 1D query embedding
+        :type query_embedding: np.ndarray
+        :param top_k: Number of results to return (default=5)
+        :type top_k: int
+        :param rescore_multiplier: Candidates rescored per requested result (default=4)
+        :type rescore_multiplier: int
+        :return: (id, cosine similarity) pairs sorted by decreasing similarity
+        :rtype: List[Tuple[str, float]]
+        """
+        self._consolidate()
+        if not self.ids:
+            return []
+
+        query = _normalize(np.atleast_2d(query_embedding))[0]
+        approx = self._approximate_scores(query)
+
+        n_candidates = min(len(self.ids), top_k * max(rescore_multiplier, 1))
+        # Sorted rows keep reads from the memory-mapped full precision array sequential
+        candidates = np.sort(np.argpartition(-approx, n_candidates - 1)[:n_candidates])
+
+        exact = np.asarray(self.full[candidates], dtype=np.float32) @ query
+        order = np.argsort(-exact)[:top_k]
+        return [(self.ids[row], float(score)) for row, score in zip(candidates[order], exact[order])]
+
+    def _approximate_scores(self, query: np.ndarray) -> np.ndarray:
+        """
+        Scores the quantized embeddings against a query in blocks of block_rows, so a
+        search never holds more than one block as float32 next to the quantized array.
+
+        :param query: Normalized 1D query embedding
+        :type query: np.ndarray
+        :return: Approximate cosine similarity of every stored embedding
+        :rtype: np.ndarray
+        """
+        approx = np.empty(len(self.quantized), dtype=np.float32)
+        for start in range(0, len(self.quantized), self.block_rows):
+            end = start + self.block_rows
+            approx[start:end] = self.quantized[start:end].astype(np.float32) @ query
+        if self.scales is not None:
+            approx *= self.scales
+        return approx
+
+    def close(self):
+        """
+        Drops the embeddings so the memory-mapped full precision file is unmapped
+        once no search is using it. The store is empty afterwards.
+        """
+        self.ids = []
+        self._id_set = set()
+        self.full = self.quantized = self.scales = None
+        self._pending = []
+
+    def memory_bytes(self) -> int:
+        """
+        Bytes held in RAM for the first-pass search (full precision vectors stay on disk).
+
+        :return: Size of quantized embeddings and scales in bytes
+        :rtype: int
+        """
+        self._consolidate()
+        if self.quantized is None:
+            return 0
+        size = self.quantized.nbytes
+        if self.scales is not None:
+            size += self.scales.nbytes
+        return size
+
+    def save(self, path: str):
+        """
+        Saves the store to a directory. Full precision embeddings are saved alongside
+        the quantized ones so they can be memory-mapped for rescoring.
+
+        :param path: Output directory
+        :type path: str
+        """
+        self._consolidate()
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        arrays = {"full.npy": self.full, "quantized.npy": self.quantized, "scales.npy": self.scales}
+        for name, array in arrays.items():
+            if array is None:
+                continue
+            # Write then rename, full.npy may be memory-mapped by this or another store
+            tmp_file = path / f"{name}.tmp"
+            with open(tmp_file, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_file, path / name)
+
+        with open(path / "store.json", "w") as f:
+            json.dump({"mode": self.mode, "ids": self.ids}, f)
+        logger.info(f"Saved {len(self.ids)} {self.mode} embeddings to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "QuantizedEmbeddingStore":
+        """
+        Loads a store saved with save(). Full precision embeddings are memory-mapped.
+
+        :param path: Directory written by save()
+        :type path: str
+        :return: Loaded store
+        :rtype: QuantizedEmbeddingStore
+        """
+        path = Path(path)
+        with open(path / "store.json", "r") as f:
+            meta = json.load(f)
+
+        store = cls(mode=meta["mode"])
+        store.ids = meta["ids"]
+        store._id_set = set(store.ids)
+        if store.ids:
+            store.full = np.load(path / "full.npy", mmap_mode="r")
+            store.quantized = np.load(path / "quantized.npy")
+            if store.mode == "int8":
+                store.scales = np.load(path / "scales.npy")
+        return store
+
+
+def recall_at_k(store: QuantizedEmbeddingStore, queries: np.ndarray, top_k: int = 10,
+                rescore_multiplier: int = 4) -> float:
+    """
+    Measures how many of the exact float32 top_k neighbours the quantized search recovers.
+
+    :param store: Store to evaluate
+    :type store: QuantizedEmbeddingStore
+    :param queries: 2D array of query embeddings
+    :type queries: np.ndarray
+    :param top_k: Number of neighbours compared per query (default=10)
+    :type top_k: int
+    :param rescore_multiplier: Candidates rescored per requested result (default=4)
+    :type rescore_multiplier: int
+    :return: Mean recall@k over the queries
+    :rtype: float
+    """
+    store._consolidate()
+    full = np.asarray(store.full, dtype=np.float32)
+    recalls = []
+    for query in _normalize(queries):
+        exact = {store.ids[i] for i in np.argsort(-(full @ query))[:top_k]}
+        found = {chunk_id for chunk_id, _ in store.search(query, top_k, rescore_multiplier)}
+        recalls.append(len(exact & found) / len(exact))
+    return float(np.mean(recalls))
@@ -2,22 +2,65 @@
 from dataclasses import dataclass
 from typing import Optional, List
 import chromadb
+import numpy as np
+
+from app.services.rag.quantization import QuantizedEmbeddingStore
 
 @dataclass
 class RetrievedChunk:
     text: str
     metadata: dict
     similarity_score: float
+    id: Optional[str] = None
 
 class Retriever:
     """
     Retrieves chunks from ChromaDB database based on similarity score to user input.
+    When a quantized embedding store is given, the nearest neighbour search runs on
+    the store and ChromaDB is only used to look up the documents of the results.
     """
-    def __init__(self, collection: chromadb.Collection, embedder):
+    def __init__(self, collection: chromadb.Collection, embedder,
+                 store: Optional[QuantizedEmbeddingStore] = None, rescore_multiplier: int = 4,
+                 client: Optional[chromadb.ClientAPI] = None):
+        """
+        :param collection: ChromaDB collection of lyric chunks
+        :param embedder: Query embedder
+        :param store: Quantized embedding store searched instead of ChromaDB
+        :param rescore_multiplier: Candidates rescored per result with a quantized store
+        :param client: ChromaDB client the collection belongs to, closed by close()
+        """
         self.collection = collection
         self.embedder = embedder
+        self.store = store
+        self.rescore_multiplier = rescore_multiplier
+        self.client = client
+
+    def close(self):
+        """
+        Releases the index: unmaps the quantized store and closes the ChromaDB client,
+        which stops its system once no other client of the same path is open.
+        The Retriever can't be used afterwards.
+        """
+        if self.store is not None:
+            self.store.close()
+        if self.client is not None:
+            self.client.close()
+        self.store = None
+        self.client = None
+        self.collection = None
     
-    def retrieve(self, query: str, threshold: float | None = None, top_k: int = 5)->List[RetrievedChunk]:
+    def embed(self, query: str):
+        """
+        Embeds the user input with the retrieval embedder.
+
+        :param query: User input string
+        :type query: str
+        :return: Query embedding
+        """
+        return self.embedder.encode(query)
+
+    def retrieve(self, query: str, threshold: float | None = None, top_k: int = 5,
+                 query_embedding=None)->List[RetrievedChunk]:
         """
         Retrieves the top_k results filtered by an optional similarity threshold
         
@@ -27,6 +70,7 @@ class Retriever:
         :type threshold: Optional[float]
         :param top_k: Number of top results to return (default=5)
         :type top_k: int
+        :param query_embedding: Precomputed embedding of query, computed if not given
         :return: List of chunks and related data stored in RetrievedChunk objects
         """
         if not query.strip():
@@ -36,20 +80,55 @@ class Retriever:
         if top_k <= 0:
             raise ValueError("top_k must be positive")
 
-        query_embedding = self.embedder.encode(query).tolist()
+        if query_embedding is None:
+            query_embedding = self.embed(query)
+        return self.retrieve_batch([query], threshold, top_k, query_embeddings=[query_embedding])[0]
+
+    def retrieve_batch(self, queries: List[str], threshold: float | None = None, top_k: int = 5,
+                       query_embeddings=None)->List[List[RetrievedChunk]]:
+        """
+        Retrieves the top_k results of many queries, embedding them in one batch and
+        searching them with a single ChromaDB query (or store lookup).
+
+        :param queries: User input strings
+        :type queries: List[str]
+        :param threshold: Minimum similarity score for lyric to be included
+        :type threshold: Optional[float]
+        :param top_k: Number of top results to return per query (default=5)
+        :type top_k: int
+        :param query_embeddings: Precomputed embeddings of queries, computed if not given
+        :return: List of RetrievedChunk objects for each query, in query order
+        """
+        if any(not query.strip() for query in queries):
+            raise ValueError("Query cannot be empty")
+        if threshold is not None and not (0 <= threshold <= 1):
+            raise ValueError("Threshold must be between 0 and 1")
+        if top_k <= 0:
+            raise ValueError("top_k must be positive")
+        if not queries:
+            return []
+
+        if query_embeddings is None:
+            query_embeddings = self.embed(list(queries))
+        query_embeddings = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        if self.store is not None:
+            return self._retrieve_quantized(query_embeddings, threshold, top_k)
+
         results = self.collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=query_embeddings.tolist(),
             n_results=top_k
         )
 
-        # Unwrap results (ChromaDB returns nested lists for batch queries)
-        ids = results['ids'][0]
-        distances = results['distances'][0]
-        metadatas = results['metadatas'][0]
-        documents = results['documents'][0]
+        # ChromaDB returns one list of results per query
+        return [self._to_chunks(results['ids'][i], results['distances'][i],
+                                results['metadatas'][i], results['documents'][i], threshold)
+                for i in range(len(queries))]
 
+    def _to_chunks(self, ids: List[str], distances: List[float], metadatas: List[dict],
+                   documents: List[str], threshold: float | None)->List[RetrievedChunk]:
+        """ Converts the ChromaDB results of one query, stopping below threshold. """
         chunks = []
-        for distance, metadata, text in zip(distances, metadatas, documents):
+        for chunk_id, distance, metadata, text in zip(ids, distances, metadatas, documents):
             similarity = 1 - (distance / 2)
 
             if threshold is not None and similarity < threshold:
@@ -58,7 +137,56 @@ class Retriever:
             chunks.append(RetrievedChunk(
                 text=text,
                 metadata=metadata,
-                similarity_score=similarity
+                similarity_score=similarity,
+                id=chunk_id
             ))
     
-        return chunks
\ No newline at end of file
+        return chunks
+
+    def _retrieve_quantized(self, query_embeddings: np.ndarray, threshold: float | None,
+                            top_k: int)->List[List[RetrievedChunk]]:
+        """
+        Retrieves the top_k results from the quantized store, rescored with full precision.
+        The documents of all queries are fetched from ChromaDB in one call.
+
+        :param query_embeddings: 2D array with the embedding of each user input
+        :type query_embeddings: np.ndarray
+        :param threshold: Minimum similarity score for lyric to be included
+        :type threshold: Optional[float]
+        :param top_k: Number of top results to return
+        :type top_k: int
+        :return: List of RetrievedChunk objects for each query
+        """
+        all_hits = []
+        for query_embedding in query_embeddings:
+            hits = self.store.search(query_embedding, top_k=top_k,
+                                     rescore_multiplier=self.rescore_multiplier)
+            if threshold is not None:
+                hits = [(chunk_id, score) for chunk_id, score in hits if score >= threshold]
+            all_hits.append(hits)
+
+        wanted = list(dict.fromkeys(chunk_id for hits in all_hits for chunk_id, _ in hits))
+        if not wanted:
+            return [[] for _ in all_hits]
+
+        results = self.collection.get(ids=wanted, include=["documents", "metadatas"])
+        # ChromaDB does not guarantee the order of get results
+        found = {chunk_id: (text, metadata) for chunk_id, text, metadata
+                 in zip(results['ids'], results['documents'], results['metadatas'])}
+
+        batch = []
+        for hits in all_hits:
+            chunks = []
+            for chunk_id, score in hits:
+                if chunk_id not in found:
+                    continue
+                text, metadata = found[chunk_id]
+                chunks.append(RetrievedChunk(
+                    text=text,
+                    metadata=metadata,
+                    similarity_score=score,
+                    id=chunk_id
+                ))
+            batch.append(chunks)
+
+        return batch
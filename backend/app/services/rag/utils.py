@@ -1,6 +1,11 @@
 
 from chonkie import TokenChunker
-from sentence_transformers import SentenceTransformer
+
+from app.core.config import get_settings
+from app.services.rag.chunking import LyricChunker
+from app.services.rag.embedders import create_embedder
+
+settings = get_settings()
 
 # Singleton chunker
 chunker = TokenChunker(
@@ -9,4 +14,12 @@ chunker = TokenChunker(
     chunk_overlap=7
 )
 
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
+# Singleton line/stanza aware chunker
+lyric_chunker = LyricChunker(
+    tokenizer="gpt2",
+    chunk_size=32,
+    min_chunk_size=8
+)
+
+# Singleton embedder
+embedder = create_embedder(settings.embedder_backend, settings.embedder_threads, settings.onnx_model_dir)
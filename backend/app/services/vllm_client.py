@@ -1,13 +1,62 @@
 """ vLLM client service for generating completions."""
+import json
 import httpx
 import logging
-from typing import Optional
+from typing import List, Optional
 
 from app.core.config import get_settings
+from app.core.text_utils import truncate_at_stop
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+class GenerationMetrics:
+    """Counts tokens generated by vLLM against tokens handed back to the caller."""
+    def __init__(self):
+        self.requests = 0
+        self.streamed = 0
+        self.early_stops = 0
+        self.tokens_generated = 0
+        self.tokens_returned = 0
+
+    def record(self, generated: int, returned: int, streamed: bool = False, early_stop: bool = False):
+        """
+        Records one completion.
+
+        :param generated: Tokens decoded by vLLM
+        :type generated: int
+        :param returned: Tokens of the text returned, up to the stop sequence
+        :type returned: int
+        :param streamed: Whether the completion was streamed
+        :type streamed: bool
+        :param early_stop: Whether the stream was closed at a stop sequence
+        :type early_stop: bool
+        """
+        self.requests += 1
+        self.streamed += streamed
+        self.early_stops += early_stop
+        self.tokens_generated += generated
+        self.tokens_returned += returned
+
+    def stats(self) -> dict:
+        """
+        Generation metrics since startup.
+
+        :return: Request counts, token totals and the fraction of generated tokens wasted
+        :rtype: dict
+        """
+        wasted = self.tokens_generated - self.tokens_returned
+        return {
+            "requests": self.requests,
+            "streamed": self.streamed,
+            "early_stops": self.early_stops,
+            "tokens_generated": self.tokens_generated,
+            "tokens_returned": self.tokens_returned,
+            "tokens_wasted": wasted,
+            "wasted_ratio": wasted / self.tokens_generated if self.tokens_generated else 0.0,
+            "mean_tokens_generated": self.tokens_generated / self.requests if self.requests else 0.0,
+        }
+
 class VLLMClient:
     """Client for interacting with vLLM completion service."""
 
@@ -23,6 +72,8 @@ class VLLMClient:
         self.base_url = base_url or settings.vllm_url
         self.timeout = timeout or settings.vllm_timeout
         self.model_name = settings.model_name
+        self.stream = settings.vllm_stream
+        self.metrics = GenerationMetrics()
 
     async def generate_completion(
             self,
@@ -30,9 +81,13 @@ class VLLMClient:
             max_tokens: int = 10,
             temperature: float = 1.0,
             top_p: float = 0.95,
+            stop: Optional[List[str]] = None,
+            min_tokens: int = 0,
+            stream: Optional[bool] = None,
     ) -> str:
         """
-        Generate a completion from vLLM.
+        Generate a completion from vLLM. Generation ends at the first stop sequence
+        produced after min_tokens tokens; the stop sequence is not returned.
 
         :param prompt: Input text to complete
         :type prompt: str
@@ -42,32 +97,128 @@ class VLLMClient:
         :type temperature: float
         :param top_p: Nucleus sampling parameter (default=0.95)
         :type top_p: float
+        :param stop: Stop sequences, e.g. ["\\n"] to stop at the end of the line
+        :type stop: Optional[List[str]]
+        :param min_tokens: Tokens generated before stop sequences apply
+        :type min_tokens: int
+        :param stream: Stream the completion and close the stream at the first stop
+            sequence (defaults to config)
+        :type stream: Optional[bool]
         :return: Raw completion text from model
         :rtype: str
         :raises httpx.HTTPError: If vLLM request fails
         :raises KeyError: If response format is unexpected
         """
+        stream = self.stream if stream is None else stream
         payload = {
             "model": self.model_name,
             "prompt": prompt,
             "max_tokens": max_tokens,
             "temperature": temperature,
             "top_p": top_p,
-            "stream": False
+            "stream": stream
         }
+        if stop:
+            payload["stop"] = stop
+        if min_tokens:
+            payload["min_tokens"] = min_tokens
+        if not stream:
+            # Token offsets and the stop sequence let the stop be applied here,
+            # which tells how many generated tokens were returned
+            payload["logprobs"] = 0
+            if stop:
+                payload["include_stop_str_in_output"] = True
+
+        logger.debug("vLLM request payload: %s", payload)
+
+        if stream:
+            completion = await self._stream_completion(payload, stop or [], min_tokens)
+        else:
+            completion = await self._complete(payload, stop or [], min_tokens)
+
+        logger.debug("vLLM raw response: %s", completion)
+
+        return completion
 
-        logger.debug(f"vLLM request payload: {payload}")
+    async def _complete(self, payload: dict, stop: List[str], min_tokens: int) -> str:
+        """
+        Requests a whole completion and cuts it at the first stop sequence after min_tokens.
 
+        :param payload: Completion request with logprobs set
+        :type payload: dict
+        :param stop: Stop sequences
+        :type stop: List[str]
+        :param min_tokens: Tokens generated before stop sequences apply
+        :type min_tokens: int
+        :return: Completion up to the first stop sequence
+        :rtype: str
+        """
         async with httpx.AsyncClient(timeout=self.timeout) as client:
             response = await client.post(self.base_url, json=payload)
             response.raise_for_status()
-        
+
         result = response.json()
-        completion = result["choices"][0]["text"]
+        choice = result["choices"][0]
+        text = choice["text"]
+        generated = result.get("usage", {}).get("completion_tokens", 0)
+        offsets = (choice.get("logprobs") or {}).get("text_offset")
+        if not offsets:
+            # Without token offsets the server has to apply the stop itself
+            self.metrics.record(generated, generated)
+            return text
 
-        logger.debug(f"vLLM raw response: {completion}")
+        token_ends = [offset - offsets[0] for offset in offsets[1:]] + [len(text)]
+        stop_from = token_ends[min(min_tokens, len(token_ends)) - 1] if min_tokens else 0
+        text, _ = truncate_at_stop(text, stop, start=stop_from)
+        returned = sum(1 for end in token_ends if end <= len(text))
+        self.metrics.record(generated or len(token_ends), returned)
+        return text
 
-        return completion
+    async def _stream_completion(self, payload: dict, stop: List[str], min_tokens: int) -> str:
+        """
+        Streams a completion and closes the stream as soon as a stop sequence shows up,
+        which makes vLLM abort the request even if it does not apply the stop itself.
+
+        :param payload: Completion request with stream set
+        :type payload: dict
+        :param stop: Stop sequences
+        :type stop: List[str]
+        :param min_tokens: Tokens generated before stop sequences apply
+        :type min_tokens: int
+        :return: Completion up to the first stop sequence
+        :rtype: str
+        """
+        text = ""
+        token_ends = []  # End offset in text of each streamed token
+        stop_from = 0
+        early_stop = False
+
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with client.stream("POST", self.base_url, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices")
+                    if not choices:
+                        continue
+                    text += choices[0].get("text", "")
+                    token_ends.append(len(text))
+                    if len(token_ends) <= min_tokens:
+                        stop_from = len(text)
+                        continue
+
+                    truncated, early_stop = truncate_at_stop(text, stop, start=stop_from)
+                    if early_stop:
+                        text = truncated
+                        break
+
+        returned = sum(1 for end in token_ends if end <= len(text))
+        self.metrics.record(len(token_ends), returned, streamed=True, early_stop=early_stop)
+        return text
 
 # Singleton instance
 vllm_client = VLLMClient()
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""Tests for batched lyric completion and the resumable batch CLI."""
+
+import json
+import asyncio
+from dataclasses import dataclass
+
+import numpy as np
+import pytest
+from app.core.profiling import StageTimer
+from app.services.batch_completion import BatchCompletion
+from app.services.completion_cache import SemanticCompletionCache
+from scripts.batch_complete import compact_output, load_done
+
+@dataclass
+class Item:
+    text: str
+    max_tokens: int = 10
+    temperature: float = 0.7
+    stop: str = "line"
+    min_tokens: int = 0
+    fresh: bool = False
+
+@dataclass
+class Chunk:
+    text: str
+
+class FakeRetriever:
+    """ Embeds a text as a one-hot vector picked by its length, retrieves one chunk per query. """
+    def __init__(self):
+        self.batches = []
+
+    def embed(self, texts):
+        embeddings = np.zeros((len(texts), 16), dtype=np.float32)
+        embeddings[np.arange(len(texts)), [len(text) % 16 for text in texts]] = 1.0
+        return embeddings
+
+    def retrieve_batch(self, queries, top_k=5, query_embeddings=None):
+        self.batches.append(list(queries))
+        return [[Chunk(f"context of {query}")]
+                for query in queries]
+
+class FakeVLLM:
+    """ Answers with the end of the prompt, later prompts finish first. """
+    def __init__(self, fail_on=None):
+        self.prompts = []
+        self.fail_on = fail_on
+
+    async def generate_completion(self, prompt, max_tokens=10, temperature=0.7, stop=None, min_tokens=0):
+        self.prompts.append(prompt)
+        await asyncio.sleep(0.05 / len(self.prompts))
+        if self.fail_on and self.fail_on in prompt:
+            raise RuntimeError("vLLM unavailable")
+        return f" la la {prompt.split()[-1]}"
+
+def run_batch(items, vllm, cache=None, retriever=None):
+    async def run():
+        batch = BatchCompletion(items, vllm, cache, concurrency=2)
+        await batch.prepare(retriever or FakeRetriever(), StageTimer())
+        return [result async for result in batch.stream()]
+    return asyncio.run(run())
+
+class TestBatchCompletion:
+    """ Tests for BatchCompletion. """
+
+    def test_results_in_input_order_with_cache_hits(self):
+        items = [Item("a"), Item("bb"), Item("ccc"), Item("dddd")]
+        cache = SemanticCompletionCache(threshold=0.99)
+        retriever = FakeRetriever()
+        cache.add("bb", retriever.embed(["bb"])[0], " cached line", 10, 0.7, stop="line")
+        vllm = FakeVLLM()
+
+        results = run_batch(items, vllm, cache, retriever)
+
+        assert [result["index"] for result in results] == [0, 1, 2, 3]
+        assert results[1]["raw_completion"] == " cached line"
+        assert results[3]["raw_completion"] == " la la dddd"
+        assert retriever.batches == [["a", "ccc", "dddd"]]
+        assert len(vllm.prompts) == 3
+
+    def test_fresh_items_skip_the_cache(self):
+        cache = SemanticCompletionCache(threshold=0.99)
+        retriever = FakeRetriever()
+        cache.add("bb", retriever.embed(["bb"])[0], " cached line", 10, 0.7, stop="line")
+
+        results = run_batch([Item("bb", fresh=True)], FakeVLLM(), cache, retriever)
+
+        assert results[0]["raw_completion"] == " la la bb"
+        assert retriever.batches == [["bb"]]
+
+    def test_min_tokens_is_part_of_the_cache_key(self):
+        cache = SemanticCompletionCache(threshold=0.99)
+        retriever = FakeRetriever()
+        cache.add("bb", retriever.embed(["bb"])[0], " cached line", 10, 0.7, stop="line")
+
+        results = run_batch([Item("bb", min_tokens=5)], FakeVLLM(), cache, retriever)
+
+        assert results[0]["raw_completion"] == " la la bb"
+        assert cache.lookup("bb", retriever.embed(["bb"])[0], 10, 0.7, stop="line", min_tokens=5)[1] == " la la bb"
+
+    def test_all_inputs_cached(self):
+        items = [Item("a"), Item("bb")]
+        cache = SemanticCompletionCache(threshold=0.99)
+        retriever = FakeRetriever()
+        for item, embedding in zip(items, retriever.embed(["a", "bb"])):
+            cache.add(item.text, embedding, f" cached {item.text}", 10, 0.7, stop="line")
+        vllm = FakeVLLM()
+
+        results = run_batch(items, vllm, cache, retriever)
+
+        assert [result["raw_completion"] for result in results] == [" cached a", " cached bb"]
+        assert retriever.batches == [[]]
+        assert vllm.prompts == []
+
+    def test_failed_generation_is_an_error_line(self):
+        results = run_batch([Item("a"), Item("bb"), Item("ccc")], FakeVLLM(fail_on="bb"))
+
+        assert results[1] == {"index": 1, "error": "vLLM unavailable"}
+        assert [result["index"] for result in results] == [0, 1, 2]
+        assert "error" not in results[0] and "error" not in results[2]
+
+    def test_generation_starts_with_the_stream_and_stops_when_closed(self):
+        vllm = FakeVLLM()
+
+        async def run():
+            batch = BatchCompletion([Item("a"), Item("bb"), Item("ccc")], vllm, concurrency=1)
+            await batch.prepare(FakeRetriever(), StageTimer())
+            await asyncio.sleep(0.05)
+            assert vllm.prompts == []
+
+            stream = batch.stream()
+            first = await stream.__anext__()
+            await stream.aclose()
+            await asyncio.sleep(0.1)
+            return first
+
+        assert asyncio.run(run())["index"] == 0
+        assert len(vllm.prompts) < 3
+
+class TestLoadDone:
+    """ Tests for load_done of scripts/batch_complete.py. """
+
+    def test_missing_output(self, tmp_path):
+        assert load_done(tmp_path / "out.jsonl") == set()
+
+    def test_truncates_partial_line_and_retries_errors(self, tmp_path):
+        output = tmp_path / "out.jsonl"
+        lines = [{"index": 0, "completion": "x"}, {"index": 3, "error": "vLLM unavailable"},
+                 {"index": 5, "completion": "y"}]
+        output.write_text("".join(json.dumps(line) + "\n" for line in lines) + '{"index": 7, "compl')
+
+        assert load_done(output) == {0, 5}
+        assert output.read_text().endswith('"y"}\n')
+        assert load_done(output) == {0, 5}
+
+class TestCompactOutput:
+    """ Tests for compact_output of scripts/batch_complete.py. """
+
+    def test_keeps_last_result_per_index_sorted(self, tmp_path):
+        output = tmp_path / "out.jsonl"
+        lines = [{"index": 2, "completion": "x"}, {"index": 0, "error": "vLLM unavailable"},
+                 {"index": 1, "completion": "y"}, {"index": 0, "completion": "z"}]
+        output.write_text("".join(json.dumps(line) + "\n" for line in lines))
+
+        assert compact_output(output) == 3
+        assert [json.loads(line) for line in output.read_text().splitlines()] == [
+            {"index": 0, "completion": "z"}, {"index": 1, "completion": "y"}, {"index": 2, "completion": "x"}]
+        assert load_done(output) == {0, 1, 2}
@@ -0,0 +1,62 @@
+"""Tests for line and stanza aware lyric chunking."""
+
+import pytest
+from app.services.rag.chunking import LyricChunker
+from app.services.rag.corpus import clean_lyrics
+
+LYRICS = """[Verse 1: Tom Waits]
+Well the smart money's on Harlow
+And the moon is in the street
+
+[Chorus]
+Midnight
+And I'm walking home alone tonight with you
+
+[Verse 2]
+Now the phone is ringing off the hook
+"""
+
+def word_counter(lines):
+    return [len(line.split()) for line in lines]
+
+@pytest.fixture
+def chunker():
+    return LyricChunker(chunk_size=14, min_chunk_size=3, token_counter=word_counter)
+
+class TestLyricChunker:
+    """ Tests for LyricChunker. """
+
+    def test_chunks_on_stanzas_with_sections(self, chunker):
+        chunks = chunker.chunk(LYRICS)
+        assert [chunk.text for chunk in chunks] == [
+            "Well the smart money's on Harlow\nAnd the moon is in the street",
+            "Midnight\nAnd I'm walking home alone tonight with you",
+            "Now the phone is ringing off the hook",
+        ]
+        assert [chunk.section for chunk in chunks] == ["Verse 1", "Chorus", "Verse 2"]
+
+    def test_offsets_refer_to_cleaned_lyrics(self, chunker):
+        cleaned = clean_lyrics(LYRICS)
+        for chunk in chunker.chunk(LYRICS):
+            assert cleaned[chunk.start_index:chunk.end_index] == chunk.text
+
+    def test_no_overlap_and_no_split_lines(self, chunker):
+        chunks = LyricChunker(chunk_size=6, min_chunk_size=0, token_counter=word_counter).chunk(LYRICS)
+        for previous, chunk in zip(chunks, chunks[1:]):
+            assert previous.end_index < chunk.start_index
+        lines = {line for line in clean_lyrics(LYRICS).split('\n')}
+        assert all(line in lines for chunk in chunks for line in chunk.text.split('\n'))
+
+    def test_long_line_is_own_chunk(self):
+        chunker = LyricChunker(chunk_size=3, token_counter=word_counter)
+        chunks = chunker.chunk("one two three four five\nsix")
+        assert [chunk.text for chunk in chunks] == ["one two three four five", "six"]
+        assert chunks[0].token_count == 5
+
+    def test_batch_matches_single(self, chunker):
+        batch = chunker.chunk_batch([LYRICS, "just one line"])
+        assert batch[0] == chunker.chunk(LYRICS)
+        assert [chunk.text for chunk in batch[1]] == ["just one line"]
+
+    def test_empty_lyrics(self, chunker):
+        assert chunker.chunk("[Instrumental]") == []
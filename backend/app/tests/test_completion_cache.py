@@ -0,0 +1,74 @@
+"""Tests for the semantic completion cache."""
+
+import numpy as np
+import pytest
+from app.services.completion_cache import SemanticCompletionCache
+
+def embedding(*values):
+    vector = np.zeros(8, dtype=np.float32)
+    vector[:len(values)] = values
+    return vector
+
+class TestSemanticCompletionCache:
+    """ Tests for SemanticCompletionCache. """
+
+    def test_near_duplicate_hit(self):
+        """ Test that a similar prompt with different punctuation reuses the completion. """
+        cache = SemanticCompletionCache(threshold=0.9)
+        cache.add("My mind is the sky", embedding(1, 0.1), "My mind is the sky, everything else is the weather", 20, 0.7)
+
+        result = cache.lookup("my mind is the sky!", embedding(1, 0.12), 20, 0.7)
+        assert result is not None
+        completion, raw = result
+        assert completion == ", everything else is the weather"
+        assert cache.stats()["hits"] == 1
+
+    def test_dissimilar_prompt_misses(self):
+        cache = SemanticCompletionCache(threshold=0.9)
+        cache.add("My mind is the sky", embedding(1, 0), " everything else is the weather", 20, 0.7)
+
+        assert cache.lookup("Something else entirely", embedding(0, 1), 20, 0.7) is None
+        assert cache.stats()["misses"] == 1
+
+    def test_rejects_completion_that_does_not_continue_text(self):
+        """ Test that a similar prompt ending on a different word is not served. """
+        cache = SemanticCompletionCache(threshold=0.9)
+        cache.add("My mind is the sky", embedding(1, 0), " everything else is the weather", 20, 0.7)
+
+        assert cache.lookup("My mind is the sea", embedding(1, 0.05), 20, 0.7) is None
+        stats = cache.stats()
+        assert stats["rejections"] == 1
+        assert stats["misses"] == 1
+
+    def test_same_last_word_without_overlap_hits(self):
+        cache = SemanticCompletionCache(threshold=0.9)
+        cache.add("My mind is the sky", embedding(1, 0), " everything else is the weather", 20, 0.7)
+
+        result = cache.lookup("My mind's the sky", embedding(1, 0.05), 20, 0.7)
+        assert result == ("everything else is the weather", " everything else is the weather")
+
+    def test_different_parameters_miss(self):
+        cache = SemanticCompletionCache(threshold=0.9)
+        cache.add("My mind is the sky", embedding(1, 0), " everything else", 20, 0.7)
+
+        assert cache.lookup("My mind is the sky", embedding(1, 0), 50, 0.7) is None
+        assert cache.lookup("My mind is the sky", embedding(1, 0), 20, 0.7, stop="stanza") is None
+        assert cache.lookup("My mind is the sky", embedding(1, 0), 20, 0.7, min_tokens=5) is None
+
+    def test_evicts_least_recently_used(self):
+        cache = SemanticCompletionCache(max_size=2, threshold=0.99)
+        cache.add("first line here", embedding(1, 0, 0), " one", 20, 0.7)
+        cache.add("second line here", embedding(0, 1, 0), " two", 20, 0.7)
+
+        # Touch the first entry so the second is evicted
+        assert cache.lookup("first line here", embedding(1, 0, 0), 20, 0.7) is not None
+        cache.add("third line here", embedding(0, 0, 1), " three", 20, 0.7)
+
+        assert len(cache) == 2
+        assert cache.stats()["evictions"] == 1
+        assert cache.lookup("second line here", embedding(0, 1, 0), 20, 0.7) is None
+        assert cache.lookup("third line here", embedding(0, 0, 1), 20, 0.7) is not None
+
+    def test_invalid_threshold_raises(self):
+        with pytest.raises(ValueError):
+            SemanticCompletionCache(threshold=1.5)
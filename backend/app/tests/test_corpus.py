@@ -0,0 +1,171 @@
+"""Tests for the on-disk lyric corpus format."""
+
+import json
+from dataclasses import dataclass
+
+import numpy as np
+import pytest
+from app.services.rag.chunking import LyricChunker
+from app.services.rag.corpus import (
+    CorpusReader,
+    CorpusWriter,
+    clean_lyrics,
+    convert_genius
+)
+from app.services.rag.embedding_cache import EmbeddingCache
+
+@dataclass
+class FakeChunk:
+    text: str
+    start_index: int
+    end_index: int
+
+class LineChunker:
+    """ Chunks one line per chunk. """
+    def chunk(self, text):
+        chunks, start = [], 0
+        for line in text.split('\n'):
+            chunks.append(FakeChunk(line, start, start + len(line)))
+            start += len(line) + 1
+        return chunks
+
+class FakeEmbedder:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return np.array([[len(text), text.count(' '), 1.0] for text in texts], dtype=np.float32)
+
+class TestCorpus:
+    """ Tests for CorpusWriter and CorpusReader. """
+
+    def test_round_trip(self, tmp_path):
+        lyrics = "Naïve café line\nSecond line"
+        with CorpusWriter(tmp_path, embedding_model="fake") as writer:
+            writer.add_song({"artist": "Tom Waits", "title": "Ol' 55", "album": None},
+                            lyrics, [(0, 15), (16, 27)], np.ones((2, 3)))
+            writer.add_song({"artist": "IDLES", "title": "Grace", "album": "TANGK"},
+                            "Love is the fing", [(0, 16)], np.zeros((1, 3)))
+
+        corpus = CorpusReader(tmp_path)
+        assert len(corpus) == 3
+        assert corpus.lyrics(0) == lyrics
+        assert corpus.chunk_text(0) == "Naïve café line"
+        assert corpus.chunk_text(1) == "Second line"
+        assert corpus.chunk_text(2) == "Love is the fing"
+        assert corpus.chunk_id(1) == "Tom-Waits_Ol'-55_1"
+        assert corpus.chunk_id(2) == "IDLES_Grace_0"
+        assert corpus.chunk_song(2)["album"] == "TANGK"
+        assert isinstance(corpus.embeddings, np.memmap)
+        assert corpus.embeddings.shape == (3, 3)
+
+    def test_batches(self, tmp_path):
+        with CorpusWriter(tmp_path) as writer:
+            for i in range(5):
+                writer.add_song({"artist": "A", "title": f"T{i}"}, "a\nb", [(0, 1), (2, 3)], np.full((2, 2), i))
+
+        batches = list(CorpusReader(tmp_path).iter_batches(batch_size=4))
+        assert [len(ids) for ids, _, _, _ in batches] == [4, 4, 2]
+        ids, texts, metadatas, embeddings = batches[-1]
+        assert ids == ["A_T4_0", "A_T4_1"]
+        assert texts == ["a", "b"]
+        assert embeddings.tolist() == [[4, 4], [4, 4]]
+
+    def test_mismatched_embeddings_raise(self, tmp_path):
+        with CorpusWriter(tmp_path) as writer:
+            with pytest.raises(ValueError):
+                writer.add_song({}, "a\nb", [(0, 1), (2, 3)], np.zeros((1, 2)))
+
+    def test_convert_genius_json_and_jsonl(self, tmp_path):
+        json_file = tmp_path / "fugazi.json"
+        json_file.write_text(json.dumps({
+            "artist_name": "Fugazi",
+            "songs": [{"title": "Waiting Room", "lyrics": "[Verse 1]\nI am a patient boy\n\nI wait, I wait",
+                       "album": {"name": "13 Songs"}},
+                      {"title": "Empty", "lyrics": "[Instrumental]"}]
+        }))
+        jsonl_file = tmp_path / "idles.jsonl"
+        jsonl_file.write_text(json.dumps({"artist_name": "IDLES", "title": "Grace",
+                                          "lyrics": "Love is the thing", "album": None}) + "\n")
+
+        with CorpusWriter(tmp_path / "corpus") as writer:
+            written = convert_genius([json_file, jsonl_file], writer, LineChunker(), FakeEmbedder())
+
+        corpus = CorpusReader(tmp_path / "corpus")
+        assert written == 2
+        assert corpus.lyrics(0) == clean_lyrics("[Verse 1]\nI am a patient boy\n\nI wait, I wait")
+        assert [corpus.chunk_text(i) for i in range(len(corpus))] == [
+            "I am a patient boy", "I wait, I wait", "Love is the thing"]
+        assert corpus.chunk_song(0)["album"] == "13 Songs"
+        assert corpus.manifest["embedding_dim"] == 3
+
+    def test_convert_genius_keeps_lyric_chunk_sections(self, tmp_path):
+        json_file = tmp_path / "waits.json"
+        json_file.write_text(json.dumps({
+            "artist_name": "Tom Waits",
+            "songs": [{"title": "Ol' 55", "lyrics": "[Verse 1]\nWell my time went so quickly\n\n"
+                                                    "[Chorus]\nAnd now the sun's coming up",
+                       "album": None},
+                      {"title": "Martha", "lyrics": "Operator, number please"}]
+        }))
+        batches = []
+        def word_counter(lines):
+            batches.append(lines)
+            return [len(line.split()) for line in lines]
+
+        with CorpusWriter(tmp_path / "corpus") as writer:
+            convert_genius([json_file], writer, LyricChunker(chunk_size=8, min_chunk_size=0,
+                                                             token_counter=word_counter), FakeEmbedder())
+
+        # Lines of all songs in the file are tokenized together
+        assert len(batches) == 1
+        corpus = CorpusReader(tmp_path / "corpus")
+        assert [corpus.chunk_section(i) for i in range(len(corpus))] == ["Verse 1", "Chorus", ""]
+        _, texts, metadatas, _ = next(corpus.iter_batches())
+        assert texts[1] == "And now the sun's coming up"
+        assert metadatas[1] == {"artist": "Tom Waits", "title": "Ol' 55", "section": "Chorus"}
+        assert metadatas[2]["section"] == ""
+
+    def test_token_chunks_have_no_section(self, tmp_path):
+        with CorpusWriter(tmp_path) as writer:
+            writer.add_song({"artist": "A", "title": "T"}, "a\nb", [(0, 1), (2, 3)], np.ones((2, 2)))
+
+        corpus = CorpusReader(tmp_path)
+        assert corpus.chunk_section(0) is None
+        assert "section" not in next(corpus.iter_batches())[2][0]
+
+    def test_reads_version_1_corpus(self, tmp_path):
+        with CorpusWriter(tmp_path) as writer:
+            writer.add_song({"artist": "A", "title": "T"}, "a\nb", [(0, 1), (2, 3)], np.ones((2, 2)))
+        # Rewrite the chunk rows without the section column
+        rows = np.fromfile(tmp_path / "chunks.i64", dtype=np.int64).reshape(2, 4)[:, :3]
+        rows.tofile(tmp_path / "chunks.i64")
+        manifest = json.loads((tmp_path / "manifest.json").read_text())
+        del manifest["sections"]
+        (tmp_path / "manifest.json").write_text(json.dumps({**manifest, "version": 1}))
+
+        corpus = CorpusReader(tmp_path)
+        assert corpus.chunk_text(1) == "b"
+        assert corpus.chunk_section(1) is None
+
+    def test_convert_genius_fills_and_reuses_embedding_cache(self, tmp_path):
+        jsonl_file = tmp_path / "idles.jsonl"
+        jsonl_file.write_text(json.dumps({"artist_name": "IDLES", "title": "Grace",
+                                          "lyrics": "Love is the thing\nNo God, no king"}) + "\n")
+
+        first_embedder = FakeEmbedder()
+        cache = EmbeddingCache(tmp_path / "cache", "fake")
+        with CorpusWriter(tmp_path / "first") as writer:
+            convert_genius([jsonl_file], writer, LineChunker(), first_embedder, embedding_cache=cache)
+        assert first_embedder.encoded == ["Love is the thing", "No God, no king"]
+        assert len(cache) == 2
+
+        second_embedder = FakeEmbedder()
+        cache = EmbeddingCache(tmp_path / "cache", "fake")
+        with CorpusWriter(tmp_path / "second") as writer:
+            convert_genius([jsonl_file], writer, LineChunker(), second_embedder, embedding_cache=cache)
+        assert second_embedder.encoded == []
+        assert cache.stats()["hits"] == 2
+        assert np.array_equal(CorpusReader(tmp_path / "second").embeddings,
+                              CorpusReader(tmp_path / "first").embeddings)
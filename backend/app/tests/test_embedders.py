@@ -0,0 +1,83 @@
+"""Tests for the embedder backends."""
+
+import json
+
+import numpy as np
+import pytest
+from app.services.rag.embedders import OnnxEmbedder, create_embedder
+
+# Token embeddings of the tiny model, padding gets a large row so unmasked pooling shows
+VOCAB = {"[PAD]": 0, "[UNK]": 1, "a": 2, "b": 3, "c": 4}
+TABLE = np.array([[100, 100], [0, 0], [1, 0], [0, 1], [3, 3]], dtype=np.float32)
+
+def write_model_dir(path, normalize):
+    """ Writes a model directory like export_onnx_embedder.py with a lookup table model. """
+    onnx = pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    tokenizers = pytest.importorskip("tokenizers")
+    from onnx import TensorProto, helper, numpy_helper
+
+    graph = helper.make_graph(
+        [helper.make_node("Gather", ["table", "input_ids"], ["token_embeddings"])],
+        "tiny",
+        [helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["batch", "sequence"])],
+        [helper.make_tensor_value_info("token_embeddings", TensorProto.FLOAT, ["batch", "sequence", 2])],
+        [numpy_helper.from_array(TABLE, "table")]
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    onnx.save(model, str(path / "model.onnx"))
+
+    tokenizer = tokenizers.Tokenizer(tokenizers.models.WordLevel(VOCAB, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    tokenizer.save(str(path / "tokenizer.json"))
+
+    (path / "embedder.json").write_text(json.dumps({
+        "model_name": "tiny", "max_seq_length": 8, "pooling": "mean",
+        "normalize": normalize, "quantization": "int8"
+    }))
+    return path
+
+class TestOnnxEmbedder:
+    """ Tests for OnnxEmbedder. """
+
+    def test_mean_pooling_ignores_padding(self, tmp_path):
+        embedder = OnnxEmbedder(str(write_model_dir(tmp_path, normalize=False)))
+        embeddings = embedder.encode(["a b", "c", "a a c"])
+        assert embeddings.dtype == np.float32
+        np.testing.assert_allclose(embeddings, [[0.5, 0.5], [3, 3], [5 / 3, 1]], rtol=1e-6)
+
+    def test_single_text_returns_one_embedding(self, tmp_path):
+        embedder = OnnxEmbedder(str(write_model_dir(tmp_path, normalize=False)))
+        single = embedder.encode("a b")
+        assert single.shape == (2,)
+        np.testing.assert_allclose(single, embedder.encode(["a b"])[0])
+
+    def test_batches_match_a_single_pass(self, tmp_path):
+        embedder = OnnxEmbedder(str(write_model_dir(tmp_path, normalize=False)))
+        texts = ["a", "b c a", "c", "a b"]
+        np.testing.assert_allclose(embedder.encode(texts, batch_size=1), embedder.encode(texts), rtol=1e-6)
+
+    def test_normalizes_embeddings(self, tmp_path):
+        embedder = OnnxEmbedder(str(write_model_dir(tmp_path, normalize=True)))
+        embeddings = embedder.encode(["a b", "c", "a"])
+        np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1.0, rtol=1e-6)
+        np.testing.assert_allclose(embeddings[0], [2 ** -0.5, 2 ** -0.5], rtol=1e-6)
+
+    def test_name_records_model_and_quantization(self, tmp_path):
+        assert OnnxEmbedder(str(write_model_dir(tmp_path, normalize=True))).name == "tiny:int8-onnx"
+
+class TestCreateEmbedder:
+    """ Tests for create_embedder. """
+
+    def test_unknown_backend_raises(self):
+        with pytest.raises(ValueError):
+            create_embedder("tensorflow")
+
+    def test_onnx_needs_model_dir(self):
+        with pytest.raises(ValueError):
+            create_embedder("onnx")
+
+    def test_onnx_backend(self, tmp_path):
+        embedder = create_embedder("onnx", threads=1, onnx_model_dir=str(write_model_dir(tmp_path, normalize=True)))
+        assert isinstance(embedder, OnnxEmbedder)
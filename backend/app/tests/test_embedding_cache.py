@@ -0,0 +1,89 @@
+"""Tests for the persistent embedding cache."""
+
+import numpy as np
+import pytest
+from app.services.rag.embedding_cache import CachedEmbedder, EmbeddingCache, embedding_key
+
+class CountingEmbedder:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        return np.array([[len(text), text.count(" "), 1.0] for text in texts], dtype=np.float32)
+
+class TestEmbeddingCache:
+    """ Tests for EmbeddingCache. """
+
+    def test_key_depends_on_model_and_normalized_text(self):
+        assert embedding_key("model", "my mind  is\nthe sky") == embedding_key("model", "my mind is the sky")
+        assert embedding_key("model", "my mind is the sky") != embedding_key("other", "my mind is the sky")
+        assert embedding_key("model", "my mind is the sky") != embedding_key("model", "My mind is the sky")
+
+    def test_only_new_texts_are_embedded(self, tmp_path):
+        embedder = CountingEmbedder()
+        cache = EmbeddingCache(tmp_path, "model")
+
+        first = cache.encode(["my mind is the sky", "everything else"], embedder)
+        second = cache.encode(["everything else", "is the weather", "is the weather"], embedder)
+
+        assert embedder.encoded == ["my mind is the sky", "everything else", "is the weather"]
+        np.testing.assert_array_equal(second[0], first[1])
+        assert second.shape == (3, 3)
+        stats = cache.stats()
+        assert stats["entries"] == 3
+        assert stats["hits"] == 1
+        assert stats["misses"] == 4
+
+    def test_reopened_cache_reuses_embeddings(self, tmp_path):
+        EmbeddingCache(tmp_path, "model").encode(["my mind is the sky"], CountingEmbedder())
+
+        embedder = CountingEmbedder()
+        cache = EmbeddingCache(tmp_path, "model")
+        embedding = CachedEmbedder(embedder, cache).encode("my mind is the sky")
+        assert embedder.encoded == []
+        np.testing.assert_array_equal(embedding, [18, 4, 1])
+
+        # Another model misses
+        EmbeddingCache(tmp_path, "other").encode(["my mind is the sky"], embedder)
+        assert embedder.encoded == ["my mind is the sky"]
+
+    def test_incomplete_entry_is_dropped(self, tmp_path):
+        cache = EmbeddingCache(tmp_path, "model")
+        cache.encode(["one", "two"], CountingEmbedder())
+        # A crash between writing a vector and its key
+        with open(tmp_path / "vectors.f32", "ab") as f:
+            f.write(np.ones(3, dtype=np.float32).tobytes())
+
+        reopened = EmbeddingCache(tmp_path, "model")
+        assert len(reopened) == 2
+        assert (tmp_path / "vectors.f32").stat().st_size == 2 * 3 * 4
+
+    def test_dimension_mismatch_raises(self, tmp_path):
+        cache = EmbeddingCache(tmp_path, "model")
+        cache.add(["one"], np.ones((1, 3)))
+        with pytest.raises(ValueError):
+            cache.add(["two"], np.ones((1, 4)))
+
+    def test_read_only_cache_never_writes(self, tmp_path):
+        EmbeddingCache(tmp_path, "model").encode(["one", "two"], CountingEmbedder())
+        # A writer in the middle of an append
+        with open(tmp_path / "vectors.f32", "ab") as f:
+            f.write(np.ones(3, dtype=np.float32).tobytes())
+        before = {name: (tmp_path / name).read_bytes() for name in ("keys.bin", "vectors.f32")}
+
+        embedder = CountingEmbedder()
+        cache = EmbeddingCache(tmp_path, "model", read_only=True)
+        embeddings = CachedEmbedder(embedder, cache).encode(["one", "three"])
+
+        assert embedder.encoded == ["three"]
+        assert embeddings.shape == (2, 3)
+        assert len(cache) == 2
+        assert {name: (tmp_path / name).read_bytes() for name in before} == before
+        with pytest.raises(ValueError):
+            cache.add(["three"], np.ones((1, 3)))
+
+    def test_read_only_missing_cache_is_empty(self, tmp_path):
+        cache = EmbeddingCache(tmp_path / "missing", "model", read_only=True)
+        assert cache.encode(["one"], CountingEmbedder()).shape == (1, 3)
+        assert not (tmp_path / "missing").exists()
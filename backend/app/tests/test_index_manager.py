@@ -0,0 +1,122 @@
+"""Tests for versioned index hot-swapping."""
+
+import time
+import asyncio
+import pytest
+from app.services.rag.index_manager import (
+    IndexManager,
+    new_version_dir,
+    publish_version
+)
+
+class FakeRetriever:
+    def __init__(self, version_dir):
+        self.version = version_dir.name
+        self.queries = []
+        self.embeddings = []
+        self.closed = False
+
+    def retrieve(self, query, top_k=5, query_embedding=None):
+        self.queries.append(query)
+        self.embeddings.append(query_embedding)
+        return []
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def index_root(tmp_path):
+    for version in ("v1", "v2"):
+        (tmp_path / version).mkdir()
+    publish_version(tmp_path, "v1")
+    return tmp_path
+
+class TestIndexManager:
+    """ Tests for IndexManager. """
+
+    def test_loads_published_version_and_warms_it(self, index_root):
+        manager = IndexManager(index_root, FakeRetriever, warmup_queries=["warm me up"])
+        assert manager.load() == "v1"
+        with manager.lease() as retriever:
+            assert retriever.version == "v1"
+            assert retriever.queries == ["warm me up"]
+        assert manager.versions() == ["v1", "v2"]
+
+    def test_warmup_embedder_embeds_queries_once(self, index_root):
+        class ListEmbedder:
+            calls = 0
+            def encode(self, texts):
+                ListEmbedder.calls += 1
+                return [[float(len(text))] for text in texts]
+
+        manager = IndexManager(index_root, FakeRetriever, warmup_queries=["warm", "me up"],
+                               warmup_embedder=ListEmbedder())
+        manager.load()
+        with manager.lease() as retriever:
+            assert retriever.queries == ["warm", "me up"]
+            assert retriever.embeddings == [[4.0], [5.0]]
+        assert ListEmbedder.calls == 1
+
+    def test_old_version_released_after_readers_drain(self, index_root):
+        manager = IndexManager(index_root, FakeRetriever, drain_timeout=5)
+        manager.load()
+
+        with manager.lease() as old:
+            manager.load("v2")
+            # In-flight reader keeps the old version open, new readers get the new one
+            with manager.lease() as new:
+                assert new.version == "v2"
+            assert not old.closed
+        for _ in range(100):
+            if old.closed:
+                break
+            time.sleep(0.01)
+        assert old.closed
+        assert manager.version == "v2"
+
+    def test_unknown_version_raises_and_keeps_serving(self, index_root):
+        manager = IndexManager(index_root, FakeRetriever)
+        manager.load()
+        with pytest.raises(ValueError):
+            manager.load("v3")
+        assert manager.version == "v1"
+
+    def test_lease_without_index_raises(self, index_root):
+        with pytest.raises(RuntimeError):
+            with IndexManager(index_root, FakeRetriever).lease():
+                pass
+
+    def test_watch_picks_up_published_version(self, index_root):
+        manager = IndexManager(index_root, FakeRetriever)
+        manager.load()
+
+        async def publish_and_watch():
+            watcher = asyncio.create_task(manager.watch(0.01))
+            publish_version(index_root, "v2")
+            for _ in range(200):
+                if manager.version == "v2":
+                    break
+                await asyncio.sleep(0.01)
+            watcher.cancel()
+
+        asyncio.run(publish_and_watch())
+        assert manager.version == "v2"
+
+    def test_new_version_dir_is_unpublished(self, tmp_path):
+        version_dir = new_version_dir(tmp_path)
+        assert version_dir.is_dir()
+        assert IndexManager(tmp_path, FakeRetriever).published_version() is None
+
+    def test_new_version_dirs_are_unique_and_ordered(self, tmp_path):
+        version_dirs = [new_version_dir(tmp_path) for _ in range(20)]
+        assert len(set(version_dirs)) == 20
+        assert IndexManager(tmp_path, FakeRetriever).versions() == [p.name for p in version_dirs]
+
+    @pytest.mark.parametrize("version", ["..", "v1/../v2", "../v1", "v1\\..", ""])
+    def test_rejects_version_names_that_are_paths(self, index_root, version):
+        manager = IndexManager(index_root, FakeRetriever)
+        with pytest.raises(ValueError):
+            manager.load(version or ".")
+        with pytest.raises(ValueError):
+            publish_version(index_root, version)
+        assert manager.published_version() == "v1"
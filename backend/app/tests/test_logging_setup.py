@@ -0,0 +1,67 @@
+"""Tests for queue based structured logging."""
+
+import json
+import queue
+import logging
+import threading
+
+import pytest
+from app.core.logging_setup import (
+    DeferredQueueHandler,
+    JsonFormatter,
+    RequestIdFilter,
+    request_id_var
+)
+
+class ThreadRecordingArg:
+    """ Records which thread turned it into a string. """
+    def __init__(self):
+        self.thread = None
+
+    def __str__(self):
+        self.thread = threading.current_thread()
+        return "arg"
+
+@pytest.fixture
+def queue_logger():
+    log_queue = queue.Queue(maxsize=2)
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(RequestIdFilter())
+    logger = logging.getLogger("test_logging_setup")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    yield logger, handler, log_queue
+    logger.removeHandler(handler)
+
+class TestLoggingSetup:
+    """ Tests for DeferredQueueHandler and JsonFormatter. """
+
+    def test_formatting_is_deferred(self, queue_logger):
+        logger, _, log_queue = queue_logger
+        arg = ThreadRecordingArg()
+        logger.info("lazy %s", arg)
+        record = log_queue.get_nowait()
+        assert arg.thread is None
+        assert record.getMessage() == "lazy arg"
+
+    def test_request_id_and_extra_fields_in_json(self, queue_logger):
+        logger, _, log_queue = queue_logger
+        token = request_id_var.set("abc123")
+        try:
+            logger.info("Prompt after RAG", extra={"prompt": "my mind is the sky"})
+        finally:
+            request_id_var.reset(token)
+
+        entry = json.loads(JsonFormatter().format(log_queue.get_nowait()))
+        assert entry["request_id"] == "abc123"
+        assert entry["prompt"] == "my mind is the sky"
+        assert entry["message"] == "Prompt after RAG"
+        assert entry["level"] == "INFO"
+
+    def test_full_queue_drops_instead_of_blocking(self, queue_logger):
+        logger, handler, log_queue = queue_logger
+        for i in range(5):
+            logger.info("record %d", i)
+        assert log_queue.qsize() == 2
+        assert handler.dropped == 3
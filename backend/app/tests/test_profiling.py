@@ -0,0 +1,74 @@
+"""Tests for stage timings and profiling."""
+
+import time
+import pstats
+import threading
+
+from app.core.profiling import StackSampler, StageTimer, profile_request, request_profile_path
+
+def busy_wait_for_sampler(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+class TestStageTimer:
+    """ Tests for StageTimer. """
+
+    def test_records_stages(self):
+        timer = StageTimer()
+        with timer.stage("retrieve"):
+            time.sleep(0.01)
+        with timer.stage("clean"):
+            pass
+        assert timer.timings["retrieve"] >= 10
+        assert list(timer.timings) == ["retrieve", "clean"]
+        assert timer.server_timing().startswith("retrieve;dur=")
+
+class TestProfiling:
+    """ Tests for profile_request and StackSampler. """
+
+    def test_profile_request_writes_stats(self, tmp_path):
+        output_file = tmp_path / "request.prof"
+        with profile_request(output_file) as profiled:
+            sorted(range(10000), key=lambda x: -x)
+        assert profiled
+        functions = {name for _, _, name in pstats.Stats(str(output_file)).stats}
+        assert "<lambda>" in functions
+
+    def test_only_one_request_profiled_at_a_time(self, tmp_path):
+        with profile_request(tmp_path / "first.prof") as first:
+            with profile_request(tmp_path / "second.prof") as second:
+                pass
+        assert first and not second
+        assert not (tmp_path / "second.prof").exists()
+
+    def test_sampler_folds_stacks_of_other_threads(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_wait_for_sampler, args=(stop,), name="worker")
+        worker.start()
+        try:
+            folded = StackSampler(interval=0.001).run(0.05)
+        finally:
+            stop.set()
+            worker.join()
+
+        worker_lines = [line for line in folded.splitlines() if line.startswith("worker;")]
+        assert worker_lines
+        stack, count = worker_lines[0].rsplit(" ", 1)
+        assert "test_profiling.py:busy_wait_for_sampler" in stack
+        assert int(count) > 0
+
+class TestRequestProfilePath:
+    """ Tests for request_profile_path. """
+
+    def test_keeps_plain_ids(self, tmp_path):
+        assert request_profile_path(str(tmp_path), "abc_12-3") == tmp_path / "request-abc_12-3.prof"
+
+    def test_path_characters_are_dropped(self, tmp_path):
+        path = request_profile_path(str(tmp_path), "../../../tmp/x")
+        assert path.parent == tmp_path
+        assert path.name == "request-tmpx.prof"
+
+    def test_unusable_id_gets_a_generated_name(self, tmp_path):
+        path = request_profile_path(str(tmp_path), "../..")
+        assert path.parent == tmp_path
+        assert len(path.stem) == len("request-") + 32
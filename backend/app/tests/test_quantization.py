@@ -0,0 +1,113 @@
+"""Tests for quantized embedding storage."""
+
+import tracemalloc
+
+import numpy as np
+import pytest
+from app.services.rag.quantization import (
+    QuantizedEmbeddingStore,
+    quantize,
+    recall_at_k
+)
+
+@pytest.fixture
+def embeddings():
+    rng = np.random.default_rng(42)
+    return rng.normal(size=(500, 384)).astype(np.float32)
+
+class TestQuantize:
+    """ Tests for quantize function. """
+
+    def test_int8_round_trip_is_close(self, embeddings):
+        quantized, scales = quantize(embeddings, "int8")
+        assert quantized.dtype == np.int8
+        restored = quantized.astype(np.float32) * scales[:, None]
+        assert np.abs(restored - embeddings).max() <= scales.max() / 2 + 1e-6
+
+    def test_float16_has_no_scales(self, embeddings):
+        quantized, scales = quantize(embeddings, "float16")
+        assert quantized.dtype == np.float16
+        assert scales is None
+
+    def test_unknown_mode_raises(self, embeddings):
+        with pytest.raises(ValueError):
+            quantize(embeddings, "int4")
+
+class TestQuantizedEmbeddingStore:
+    """ Tests for QuantizedEmbeddingStore. """
+
+    def test_search_returns_exact_match_first(self, embeddings):
+        store = QuantizedEmbeddingStore(mode="int8")
+        store.add([f"chunk_{i}" for i in range(len(embeddings))], embeddings)
+        results = store.search(embeddings[17], top_k=3)
+        assert results[0][0] == "chunk_17"
+        assert results[0][1] == pytest.approx(1.0, abs=1e-5)
+        assert len(results) == 3
+
+    def test_int8_uses_a_quarter_of_float32_memory(self, embeddings):
+        store = QuantizedEmbeddingStore(mode="int8")
+        store.add([f"chunk_{i}" for i in range(len(embeddings))], embeddings)
+        assert store.memory_bytes() < embeddings.nbytes / 3.9
+
+    def test_search_peak_memory_stays_below_the_quantized_index(self):
+        embeddings = np.random.default_rng(1).normal(size=(20000, 384)).astype(np.float32)
+        store = QuantizedEmbeddingStore(mode="int8")
+        store.add([f"chunk_{i}" for i in range(len(embeddings))], embeddings)
+        store.block_rows = 1024
+        store.memory_bytes()
+        del embeddings
+
+        tracemalloc.start()
+        try:
+            store.search(np.ones(384, dtype=np.float32), top_k=5)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        # A float32 copy of the index would be four times the quantized size
+        assert peak < store.quantized.nbytes / 2
+
+    def test_blocked_scores_match_unblocked(self, embeddings):
+        store = QuantizedEmbeddingStore(mode="int8")
+        store.add([f"chunk_{i}" for i in range(len(embeddings))], embeddings)
+        blocked = store.search(embeddings[5], top_k=10)
+        store.block_rows = len(embeddings)
+        assert store.search(embeddings[5], top_k=10) == blocked
+
+    def test_recall_with_rescoring(self, embeddings):
+        store = QuantizedEmbeddingStore(mode="int8")
+        store.add([f"chunk_{i}" for i in range(len(embeddings))], embeddings)
+        queries = embeddings[:20] + np.random.default_rng(0).normal(size=(20, 384)) * 0.5
+        assert recall_at_k(store, queries, top_k=10, rescore_multiplier=4) >= 0.95
+
+    def test_save_and_load(self, embeddings, tmp_path):
+        store = QuantizedEmbeddingStore(mode="float16")
+        store.add([f"chunk_{i}" for i in range(len(embeddings))], embeddings)
+        store.save(tmp_path)
+
+        loaded = QuantizedEmbeddingStore.load(tmp_path)
+        assert isinstance(loaded.full, np.memmap)
+        assert loaded.search(embeddings[3], top_k=1)[0][0] == "chunk_3"
+
+        # Saving over a memory-mapped store must not corrupt it
+        loaded.add(["extra"], embeddings[:1] * -1)
+        loaded.save(tmp_path)
+        assert len(QuantizedEmbeddingStore.load(tmp_path)) == len(embeddings) + 1
+
+    def test_ids_already_in_store_are_skipped(self, embeddings, tmp_path):
+        store = QuantizedEmbeddingStore(mode="int8")
+        store.add([f"chunk_{i}" for i in range(10)], embeddings[:10])
+        store.save(tmp_path)
+
+        # A second non-reset index run adds the same songs again
+        loaded = QuantizedEmbeddingStore.load(tmp_path)
+        loaded.add([f"chunk_{i}" for i in range(5, 15)], embeddings[5:15])
+        assert len(loaded) == 15
+        assert loaded.memory_bytes() == 15 * (384 + 4)
+        results = loaded.search(embeddings[7], top_k=2)
+        assert results[0][0] == "chunk_7"
+        assert results[1][0] != "chunk_7"
+
+    def test_mismatched_ids_raise(self, embeddings):
+        store = QuantizedEmbeddingStore()
+        with pytest.raises(ValueError):
+            store.add(["only_one"], embeddings[:2])
@@ -0,0 +1,114 @@
+"""Tests for the Retriever against a real ChromaDB collection."""
+
+import gc
+import time
+import weakref
+
+import numpy as np
+import pytest
+
+chromadb = pytest.importorskip("chromadb")
+
+from chromadb.api.shared_system_client import SharedSystemClient
+from chromadb.config import Settings
+from app.services.rag.index_manager import IndexManager, open_retriever, publish_version
+from app.services.rag.quantization import QuantizedEmbeddingStore
+
+DIM = 8
+
+class FakeEmbedder:
+    """ Embeds a text as a one-hot vector picked by its first word. """
+    def encode(self, texts):
+        def one_hot(text):
+            vector = np.zeros(DIM, dtype=np.float32)
+            vector[len(text.split()[0]) % DIM] = 1.0
+            return vector
+        if isinstance(texts, str):
+            return one_hot(texts)
+        return np.stack([one_hot(text) for text in texts])
+
+def build_version(version_dir, texts, quantization="int8"):
+    """ Writes a ChromaDB collection and a quantized store like build_index.py --index-root. """
+    embeddings = FakeEmbedder().encode(texts)
+    ids = [f"chunk_{i}" for i in range(len(texts))]
+    client = chromadb.PersistentClient(path=str(version_dir / "chroma"),
+                                       settings=Settings(anonymized_telemetry=False))
+    collection = client.get_or_create_collection("lyric_chunks")
+    collection.add(ids=ids, documents=texts, embeddings=embeddings.tolist(),
+                   metadatas=[{"artist": "A", "title": f"T{i}"} for i in range(len(texts))])
+    client.close()
+
+    store = QuantizedEmbeddingStore(mode=quantization)
+    store.add(ids, embeddings)
+    store.save(version_dir / "embeddings")
+
+def system_open(version_dir) -> bool:
+    return str(version_dir / "chroma") in SharedSystemClient._identifier_to_system
+
+TEXTS = ["a small song", "the longest line", "ab cd", "abcd efg"]
+QUERIES = ["abcd", "a", "the", "ab"]
+EXPECTED = ["abcd efg", "a small song", "the longest line", "ab cd"]
+
+class TestRetrieveBatch:
+    """ Tests for Retriever.retrieve_batch. """
+
+    @pytest.mark.parametrize("quantization", [None, "int8"])
+    def test_results_per_query_in_order(self, tmp_path, quantization):
+        build_version(tmp_path, TEXTS)
+        retriever = open_retriever(tmp_path, FakeEmbedder(), quantization=quantization)
+        try:
+            batch = retriever.retrieve_batch(QUERIES, top_k=2)
+            assert [chunks[0].text for chunks in batch] == EXPECTED
+            assert [chunks[0].id for chunks in batch] == [f"chunk_{TEXTS.index(text)}" for text in EXPECTED]
+            assert all(len(chunks) == 2 for chunks in batch)
+            # Same results as one query at a time
+            for query, chunks in zip(QUERIES, batch):
+                assert [chunk.id for chunk in retriever.retrieve(query, top_k=2)] == [chunk.id for chunk in chunks]
+        finally:
+            retriever.close()
+
+    @pytest.mark.parametrize("quantization", [None, "int8"])
+    def test_threshold_and_empty_batch(self, tmp_path, quantization):
+        build_version(tmp_path, TEXTS)
+        retriever = open_retriever(tmp_path, FakeEmbedder(), quantization=quantization)
+        try:
+            batch = retriever.retrieve_batch(QUERIES, threshold=0.9, top_k=3)
+            assert [[chunk.text for chunk in chunks] for chunks in batch] == [[text] for text in EXPECTED]
+            assert retriever.retrieve_batch([], top_k=3) == []
+            with pytest.raises(ValueError):
+                retriever.retrieve_batch(["ok", " "])
+        finally:
+            retriever.close()
+
+class TestRetrieverClose:
+    """ Tests for Retriever.close. """
+
+    def test_close_releases_store_and_chroma_system(self, tmp_path):
+        build_version(tmp_path, TEXTS)
+        retriever = open_retriever(tmp_path, FakeEmbedder(), quantization="int8")
+        assert retriever.retrieve("abcd", top_k=1)[0].text == "abcd efg"
+        full = weakref.ref(retriever.store.full)
+        assert system_open(tmp_path)
+
+        retriever.close()
+        gc.collect()
+        assert full() is None
+        assert not system_open(tmp_path)
+
+    def test_swap_releases_retired_version(self, tmp_path):
+        for version in ("v1", "v2"):
+            build_version(tmp_path / version, TEXTS)
+        publish_version(tmp_path, "v1")
+        manager = IndexManager(tmp_path, lambda version_dir: open_retriever(version_dir, FakeEmbedder(), "int8"),
+                               drain_timeout=5)
+        manager.load()
+        assert system_open(tmp_path / "v1")
+
+        manager.load("v2")
+        for _ in range(100):
+            if not system_open(tmp_path / "v1"):
+                break
+            time.sleep(0.01)
+        assert not system_open(tmp_path / "v1")
+        with manager.lease() as retriever:
+            assert retriever.retrieve("ab", top_k=1)[0].text == "ab cd"
@@ -4,7 +4,8 @@ import pytest
 from app.core.text_utils import(
     normalize_text,
     remove_overlap,
-    clean_completion
+    clean_completion,
+    truncate_at_stop
 )
 
 class TestNormalizeText:
@@ -144,4 +145,20 @@ class TestCleanCompletion:
         raw = "<think></think><think></think>hello world"
         result = clean_completion(input_text, raw)
         assert result == " world"  # Leading space from overlap removal
-        assert "<think>" not in result
\ No newline at end of file
+        assert "<think>" not in result
+
+class TestTruncateAtStop:
+    """ Tests for truncate_at_stop function. """
+
+    def test_cuts_at_first_stop_sequence(self):
+        text = " everything else is the weather\nand the sun\n\nnext verse"
+        assert truncate_at_stop(text, ["\n"]) == (" everything else is the weather", True)
+        assert truncate_at_stop(text, ["\n\n"]) == (" everything else is the weather\nand the sun", True)
+
+    def test_no_stop_sequence_keeps_text(self):
+        assert truncate_at_stop("and I fly so high", ["\n"]) == ("and I fly so high", False)
+        assert truncate_at_stop("and I fly\nso high", []) == ("and I fly\nso high", False)
+
+    def test_ignores_stop_sequences_before_start(self):
+        """ Test that a leading newline does not end the completion before it starts. """
+        assert truncate_at_stop("\nand I fly\nso high", ["\n"], start=1) == ("\nand I fly", True)
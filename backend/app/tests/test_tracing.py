@@ -0,0 +1,55 @@
+"""Tests for request trace recording and comparison."""
+
+import pytest
+from app.core.tracing import TraceRecorder, diff_traces, iter_trace, latency_percentiles
+
+def entry(request_id, chunk_ids, total, cached=False):
+    return {"request_id": request_id, "chunk_ids": chunk_ids, "cached": cached,
+            "timings_ms": {"retrieve": total / 2, "total": total}}
+
+class TestTraceRecorder:
+    """ Tests for TraceRecorder and iter_trace. """
+
+    def test_records_requests(self, tmp_path):
+        recorder = TraceRecorder(tmp_path / "trace.jsonl")
+        recorder.record("r1", "my mind is the sky", {"max_tokens": 20, "temperature": 0.7},
+                        ["a_0", "a_1"], {"retrieve": 1.23456, "total": 5.0}, ts=100.0)
+        recorder.record("r2", "and the night", {"max_tokens": 20, "temperature": 0.7},
+                        [], {"total": 1.0}, cached=True)
+        recorder.close()
+
+        entries = list(iter_trace(tmp_path / "trace.jsonl"))
+        assert [e["request_id"] for e in entries] == ["r1", "r2"]
+        assert entries[0]["ts"] == 100.0
+        assert entries[0]["chunk_ids"] == ["a_0", "a_1"]
+        assert entries[0]["timings_ms"]["retrieve"] == 1.235
+        assert entries[1]["cached"]
+
+    def test_reads_rotated_files_oldest_first(self, tmp_path):
+        recorder = TraceRecorder(tmp_path / "trace.jsonl", max_bytes=200, backup_count=20)
+        for i in range(10):
+            recorder.record(f"r{i}", "the sky is falling", {}, ["a_0"], {"total": 1.0})
+        recorder.close()
+
+        assert list(tmp_path.glob("trace.jsonl.*"))
+        assert [e["request_id"] for e in iter_trace(tmp_path / "trace.jsonl")] == [f"r{i}" for i in range(10)]
+
+class TestDiffTraces:
+    """ Tests for diff_traces and latency_percentiles. """
+
+    def test_latency_percentiles(self):
+        distribution = latency_percentiles([entry(str(i), [], float(i)) for i in range(1, 101)])
+        assert distribution["total"]["p50"] == pytest.approx(50.5)
+        assert distribution["total"]["count"] == 100
+        assert distribution["retrieve"]["p99"] == pytest.approx(49.505)
+
+    def test_compares_retrieval_by_request_id(self):
+        baseline = [entry("r1", ["a", "b"], 10), entry("r2", ["a", "b"], 10),
+                    entry("r3", ["a"], 10, cached=True), entry("r4", ["a"], 10)]
+        candidate = [entry("r2", ["a", "c"], 20), entry("r1", ["a", "b"], 20),
+                     entry("r3", ["b"], 20), entry("r5", ["a"], 20)]
+
+        diff = diff_traces(baseline, candidate)
+        assert diff["retrieval"] == {"matched": 3, "compared": 2, "identical": 1, "mean_overlap": 0.75}
+        assert diff["latency"]["baseline"]["total"]["p50"] == 10
+        assert diff["latency"]["candidate"]["total"]["p50"] == 20
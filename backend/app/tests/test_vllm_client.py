@@ -0,0 +1,99 @@
+"""Tests for the vLLM client."""
+
+import json
+import asyncio
+import httpx
+import pytest
+from app.services import vllm_client as vllm_client_module
+from app.services.vllm_client import VLLMClient
+
+def stream_body(tokens):
+    events = [f"data: {json.dumps({'choices': [{'text': token}]})}\n\n" for token in tokens]
+    return "".join(events) + "data: [DONE]\n\n"
+
+@pytest.fixture
+def fake_vllm(monkeypatch):
+    """ Routes the client to a fake vLLM and collects the payloads it receives. """
+    payloads = []
+    responses = {}
+
+    def handler(request):
+        payload = json.loads(request.content)
+        payloads.append(payload)
+        if payload["stream"]:
+            return httpx.Response(200, text=stream_body(responses["tokens"]))
+        choice = {"text": responses["text"]}
+        if "offsets" in responses:
+            choice["logprobs"] = {"text_offset": responses["offsets"]}
+        return httpx.Response(200, json={"choices": [choice],
+                                         "usage": {"completion_tokens": responses["usage"]}})
+
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(vllm_client_module.httpx, "AsyncClient",
+                        lambda **kwargs: real_client(transport=httpx.MockTransport(handler), **kwargs))
+    return payloads, responses
+
+class TestVLLMClient:
+    """ Tests for VLLMClient. """
+
+    def test_sends_stop_sequences_and_records_usage(self, fake_vllm):
+        payloads, responses = fake_vllm
+        responses.update(text=" and I fly so high", usage=6)
+        client = VLLMClient(base_url="http://vllm/v1/completions")
+
+        completion = asyncio.run(client.generate_completion("My mind is the sky", max_tokens=20,
+                                                            stop=["\n"], min_tokens=2, stream=False))
+        assert completion == " and I fly so high"
+        assert payloads[0]["stop"] == ["\n"]
+        assert payloads[0]["min_tokens"] == 2
+        assert client.metrics.stats()["tokens_generated"] == 6
+
+    def test_applies_stop_with_token_offsets(self, fake_vllm):
+        payloads, responses = fake_vllm
+        # " and| I| fly|\n|so|\n" with the stop string kept in the output
+        responses.update(text=" and I fly\nso\n", usage=6, offsets=[0, 4, 6, 10, 11, 13])
+        client = VLLMClient(base_url="http://vllm/v1/completions")
+
+        completion = asyncio.run(client.generate_completion("My mind is the sky", stop=["\n"], stream=False))
+        assert completion == " and I fly"
+        assert payloads[0]["logprobs"] == 0
+        assert payloads[0]["include_stop_str_in_output"] is True
+        stats = client.metrics.stats()
+        assert stats["tokens_generated"] == 6
+        assert stats["tokens_returned"] == 3
+
+        completion = asyncio.run(client.generate_completion("My mind is the sky", stop=["\n"],
+                                                            min_tokens=4, stream=False))
+        assert completion == " and I fly\nso"
+
+    def test_stream_stops_at_line_boundary(self, fake_vllm):
+        _, responses = fake_vllm
+        responses["tokens"] = [" and", " I", " fly", "\n", "so", " high", "\n"]
+        client = VLLMClient(base_url="http://vllm/v1/completions")
+
+        completion = asyncio.run(client.generate_completion("My mind is the sky", stop=["\n"], stream=True))
+        assert completion == " and I fly"
+        stats = client.metrics.stats()
+        assert stats["early_stops"] == 1
+        assert stats["tokens_generated"] == 4
+        assert stats["tokens_returned"] == 3
+
+    def test_stream_ignores_stop_before_min_tokens(self, fake_vllm):
+        _, responses = fake_vllm
+        responses["tokens"] = ["\n", " and", " I", " fly", "\n", "so"]
+        client = VLLMClient(base_url="http://vllm/v1/completions")
+
+        completion = asyncio.run(client.generate_completion("My mind is the sky", stop=["\n"],
+                                                            min_tokens=1, stream=True))
+        assert completion == "\n and I fly"
+
+    def test_stream_without_stop_returns_everything(self, fake_vllm):
+        _, responses = fake_vllm
+        responses["tokens"] = [" and", " I", "\n", "fly"]
+        client = VLLMClient(base_url="http://vllm/v1/completions")
+
+        completion = asyncio.run(client.generate_completion("My mind is the sky", stream=True))
+        assert completion == " and I\nfly"
+        stats = client.metrics.stats()
+        assert stats["early_stops"] == 0
+        assert stats["tokens_wasted"] == 0
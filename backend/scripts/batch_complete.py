@@ -0,0 +1,137 @@
+import os
+import json
+import argparse
+from pathlib import Path
+
+import httpx
+
+def load_done(output_path: Path) -> set:
+    """
+    Indices already completed in an earlier run. A partial last line left by an
+    interrupted run is cut off, failed inputs are not counted so they are retried.
+    """
+    if not output_path.exists():
+        return set()
+
+    with open(output_path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+            data = data[:data.rfind(b'\n') + 1]
+
+    done = set()
+    for line in data.decode('utf-8').splitlines():
+        if line.strip():
+            result = json.loads(line)
+            if "error" not in result:
+                done.add(result["index"])
+    return done
+
+def compact_output(output_path: Path) -> int:
+    """
+    Rewrites the output with one line per input, sorted by index. A retried input
+    keeps its last result, which replaces the error line of the earlier run.
+    """
+    if not output_path.exists():
+        return 0
+
+    results = {}
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                result = json.loads(line)
+                results[result["index"]] = line if line.endswith("\n") else line + "\n"
+
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.writelines(results[index] for index in sorted(results))
+    os.replace(tmp_path, output_path)
+    return len(results)
+
+def read_inputs(input_path: Path) -> list:
+    """(line index, request) of every input, lines are JSON objects with at least "text"."""
+    inputs = []
+    with open(input_path, encoding='utf-8') as f:
+        for index, line in enumerate(f):
+            if line.strip():
+                inputs.append((index, json.loads(line)))
+    return inputs
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Complete a JSONL file of inputs with the /complete/batch endpoint"
+    )
+
+    parser.add_argument(
+        "--input",
+        type=str,
+        required=True,
+        help="JSONL file, one request per line, e.g. {\"text\": \"my mind is the sky\", \"max_tokens\": 20}"
+    )
+
+    parser.add_argument(
+        "--output",
+        type=str,
+        required=True,
+        help="JSONL file of results, inputs already completed in it are skipped. "
+             "It is rewritten sorted by index with one line per input at the end"
+    )
+
+    parser.add_argument(
+        "--url",
+        type=str,
+        default="http://localhost:8001",
+        help="Base URL of the API (default: http://localhost:8001)"
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=256,
+        help="Inputs sent per /complete/batch request (default: 256)"
+    )
+
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=600.0,
+        help="Seconds to wait for a batch (default: 600)"
+    )
+
+    args = parser.parse_args()
+
+    output_path = Path(args.output)
+    done = load_done(output_path)
+    pending = [(index, item) for index, item in read_inputs(Path(args.input)) if index not in done]
+    print(f"{len(done)} inputs already completed, {len(pending)} to go")
+
+    completed = failed = 0
+    with httpx.Client(base_url=args.url, timeout=args.timeout) as client, \
+            open(output_path, 'a', encoding='utf-8') as out:
+        for start in range(0, len(pending), args.batch_size):
+            batch = pending[start:start + args.batch_size]
+            with client.stream("POST", "/complete/batch", json={"items": [item for _, item in batch]}) as response:
+                if response.status_code != 200:
+                    response.read()
+                    raise SystemExit(f"Batch starting at input {batch[0][0]} failed "
+                                     f"({response.status_code}): {response.text}")
+                for line in response.iter_lines():
+                    if not line.strip():
+                        continue
+                    result = json.loads(line)
+                    index, item = batch[result["index"]]
+                    out.write(json.dumps({**result, "index": index, "text": item["text"]},
+                                         ensure_ascii=False) + "\n")
+                    if "error" in result:
+                        failed += 1
+                    else:
+                        completed += 1
+            # Every finished batch survives an interruption
+            out.flush()
+            print(f"{start + len(batch)}/{len(pending)} inputs processed")
+
+    compact_output(output_path)
+    print(f"Completed {completed} inputs, {failed} failed (rerun to retry them)")
+
+if __name__ == "__main__":
+    main()
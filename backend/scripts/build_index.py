@@ -5,6 +5,7 @@ from pathlib import Path
 # Add parent directory to path so we can import from app
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from app.services.rag.index_manager import new_version_dir, publish_version
 from app.services.rag.indexer import Indexer
 import logging
 
@@ -17,12 +18,19 @@ logging.basicConfig(
 def main():
     parser = argparse.ArgumentParser(description="Build ChromaDB index from Genius lyrics")
     
-    parser.add_argument(
+    source = parser.add_mutually_exclusive_group(required=True)
+
+    source.add_argument(
         "--lyrics-dir",
         type=str,
-        required=True,
         help="Path to directory containing Genius JSON files"
     )
+
+    source.add_argument(
+        "--corpus",
+        type=str,
+        help="Path to corpus directory written by convert_corpus.py (no re-embedding)"
+    )
     
     parser.add_argument(
         "--collection-name",
@@ -37,17 +45,84 @@ def main():
         help="Reset collection before indexing (deletes existing data)"
     )
     
+    parser.add_argument(
+        "--chunker",
+        type=str,
+        choices=["token", "lyric"],
+        default="token",
+        help="Fixed size token chunks or line/stanza aware lyric chunks (default: token)"
+    )
+
     parser.add_argument(
         "--no-recursive",
         action="store_true",
         help="Don't recursively search subdirectories"
     )
     
+    parser.add_argument(
+        "--quantization",
+        type=str,
+        choices=["int8", "float16"],
+        default=None,
+        help="Also write a quantized embedding store for retrieval (default: none)"
+    )
+
+    parser.add_argument(
+        "--store-path",
+        type=str,
+        default="./embeddings",
+        help="Directory of the quantized embedding store (default: ./embeddings)"
+    )
+    
+    parser.add_argument(
+        "--embedding-cache",
+        type=str,
+        default="./embedding_cache",
+        help="Embedding cache directory, only chunk texts not seen before are embedded "
+             "(default: ./embedding_cache)"
+    )
+
+    parser.add_argument(
+        "--no-embedding-cache",
+        action="store_true",
+        help="Embed every chunk without reading or writing the embedding cache"
+    )
+
+    parser.add_argument(
+        "--index-root",
+        type=str,
+        default=None,
+        help="Build into a new version directory under this root for hot-swapping "
+             "(ignores --store-path and --reset)"
+    )
+
+    parser.add_argument(
+        "--no-publish",
+        action="store_true",
+        help="With --index-root, don't point CURRENT at the new version"
+    )
+    
     args = parser.parse_args()
+
+    chroma_path, store_path, reset = "./chroma", args.store_path, args.reset
+    if args.index_root:
+        version_dir = new_version_dir(args.index_root)
+        chroma_path, store_path, reset = str(version_dir / "chroma"), str(version_dir / "embeddings"), True
     
-    indexer = Indexer(collection_name=args.collection_name, reset=args.reset)
-    indexer.index_dir(args.lyrics_dir, recursive=not args.no_recursive)
+    indexer = Indexer(collection_name=args.collection_name, reset=reset,
+                      quantization=args.quantization, store_path=store_path,
+                      chunking=args.chunker, chroma_path=chroma_path,
+                      embedding_cache=None if args.no_embedding_cache else args.embedding_cache)
+    if args.corpus:
+        indexer.index_corpus(args.corpus)
+    else:
+        indexer.index_dir(args.lyrics_dir, recursive=not args.no_recursive)
     
+    if args.index_root:
+        if not args.no_publish:
+            publish_version(args.index_root, version_dir.name)
+        print(f"Built index version {version_dir.name}")
+
     print("Indexing complete!")
 
 if __name__ == "__main__":
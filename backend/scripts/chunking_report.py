@@ -0,0 +1,93 @@
+import sys
+import random
+import argparse
+from pathlib import Path
+
+# Add parent directory to path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from app.services.rag.corpus import clean_lyrics, iter_genius_songs
+from app.services.rag.utils import chunker, embedder, lyric_chunker
+
+def evaluate(name, songs, chunk_fn, count_tokens, queries, top_k):
+    """
+    Chunks and embeds every song, then retrieves the top_k chunks for each query.
+
+    A query is the first half of a lyric line. A hit means a retrieved chunk is from the
+    same song, and a complete hit means that chunk also contains the whole line.
+    """
+    texts, song_ids = [], []
+    for song_id, song in enumerate(songs):
+        for chunk in chunk_fn(song):
+            texts.append(chunk.text)
+            song_ids.append(song_id)
+    song_ids = np.array(song_ids)
+
+    chunk_tokens = count_tokens(texts)
+    embeddings = embedder.encode(texts, normalize_embeddings=True)
+    query_embeddings = embedder.encode([query for query, _, _ in queries], normalize_embeddings=True)
+
+    hits = complete_hits = prompt_tokens = 0
+    for query_embedding, (_, song_id, line) in zip(query_embeddings, queries):
+        top = np.argsort(-(embeddings @ query_embedding))[:top_k]
+        same_song = [i for i in top if song_ids[i] == song_id]
+        hits += bool(same_song)
+        complete_hits += any(line in texts[i] for i in same_song)
+        prompt_tokens += sum(chunk_tokens[i] for i in top)
+
+    index_bytes = embeddings.shape[0] * embeddings.shape[1] * 4 + sum(len(t.encode('utf-8')) for t in texts)
+    print(f"{name:<8} {len(texts):>8} {sum(chunk_tokens):>12} {index_bytes / 2**20:>10.2f} "
+          f"{prompt_tokens / len(queries):>13.1f} {hits / len(queries):>8.3f} {complete_hits / len(queries):>10.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the token chunker and the lyric chunker on a Genius download"
+    )
+
+    parser.add_argument(
+        "--lyrics-dir",
+        type=str,
+        required=True,
+        help="Path to directory containing Genius JSON or JSONL files"
+    )
+
+    parser.add_argument(
+        "--num-queries",
+        type=int,
+        default=300,
+        help="Number of lyric lines sampled as queries (default: 300)"
+    )
+
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=10,
+        help="Chunks retrieved per query, as in /complete (default: 10)"
+    )
+
+    args = parser.parse_args()
+
+    lyrics_dir = Path(args.lyrics_dir)
+    songs = []
+    for path in sorted([*lyrics_dir.rglob("*.json"), *lyrics_dir.rglob("*.jsonl")]):
+        if path.name == "scrape_metadata.json":
+            continue
+        songs.extend(song["lyrics"] for song in iter_genius_songs(path) if clean_lyrics(song["lyrics"]))
+
+    random.seed(0)
+    lines = [(song_id, line) for song_id, song in enumerate(songs)
+             for line in clean_lyrics(song).split('\n') if len(line.split()) >= 6]
+    queries = [(' '.join(line.split()[:len(line.split()) // 2]), song_id, line)
+               for song_id, line in random.sample(lines, min(args.num_queries, len(lines)))]
+
+    count_tokens = lyric_chunker.count_tokens
+    print(f"Songs: {len(songs)}  queries: {len(queries)}  top_k: {args.top_k}")
+    print(f"{'chunker':<8} {'chunks':>8} {'tokens':>12} {'index (MB)':>10} "
+          f"{'prompt tokens':>13} {'hit@k':>8} {'line hit@k':>10}")
+    evaluate("token", songs, lambda song: chunker.chunk(clean_lyrics(song)), count_tokens, queries, args.top_k)
+    evaluate("lyric", songs, lyric_chunker.chunk, count_tokens, queries, args.top_k)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import sys
+import argparse
+from pathlib import Path
+
+# Add parent directory to path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.rag.corpus import CorpusWriter, convert_genius
+from app.services.rag.embedding_cache import EmbeddingCache
+from app.services.rag.utils import chunker, embedder, lyric_chunker
+import logging
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert Genius JSON/JSONL lyrics into a compact memory-mappable corpus"
+    )
+
+    parser.add_argument(
+        "--lyrics-dir",
+        type=str,
+        required=True,
+        help="Path to directory containing Genius JSON or JSONL files"
+    )
+
+    parser.add_argument(
+        "--output",
+        type=str,
+        required=True,
+        help="Corpus directory to write (overwritten if it exists)"
+    )
+
+    parser.add_argument(
+        "--chunker",
+        type=str,
+        choices=["token", "lyric"],
+        default="token",
+        help="Fixed size token chunks or line/stanza aware lyric chunks (default: token)"
+    )
+
+    parser.add_argument(
+        "--no-recursive",
+        action="store_true",
+        help="Don't recursively search subdirectories"
+    )
+
+    parser.add_argument(
+        "--embedding-cache",
+        type=str,
+        default="./embedding_cache",
+        help="Embedding cache directory, only chunk texts not seen before are embedded "
+             "(default: ./embedding_cache)"
+    )
+
+    parser.add_argument(
+        "--no-embedding-cache",
+        action="store_true",
+        help="Embed every chunk without reading or writing the embedding cache"
+    )
+
+    args = parser.parse_args()
+
+    lyrics_dir = Path(args.lyrics_dir)
+    glob = lyrics_dir.glob if args.no_recursive else lyrics_dir.rglob
+    json_paths = sorted([*glob("*.json"), *glob("*.jsonl")])
+    json_paths = [path for path in json_paths if path.name != "scrape_metadata.json"]
+
+    cache = None
+    if not args.no_embedding_cache:
+        cache = EmbeddingCache(args.embedding_cache, embedder.name)
+
+    with CorpusWriter(args.output, embedding_model=embedder.name) as writer:
+        songs = convert_genius(json_paths, writer,
+                               lyric_chunker if args.chunker == "lyric" else chunker,
+                               embedder, embedding_cache=cache)
+
+    print(f"Converted {songs} songs into {args.output}")
+    if cache is not None:
+        print(f"Embedding cache: {cache.stats()}")
+
+if __name__ == "__main__":
+    main()
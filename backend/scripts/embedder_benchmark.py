@@ -0,0 +1,160 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Add parent directory to path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from app.services.rag.embedders import OnnxEmbedder, SentenceTransformerEmbedder
+
+def load_texts(args) -> list:
+    """Chunk texts from a text file (one per line) or a ChromaDB collection."""
+    if args.texts_file:
+        with open(args.texts_file, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+        return texts[:args.num_texts]
+
+    import chromadb
+    from chromadb.config import Settings
+
+    client = chromadb.PersistentClient(path=args.chroma_path,
+                                       settings=Settings(anonymized_telemetry=False))
+    collection = client.get_collection(args.collection_name)
+    return collection.get(limit=args.num_texts, include=["documents"])["documents"]
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    return embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+
+def top_k(queries: np.ndarray, corpus: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k nearest corpus rows of every query, by cosine similarity."""
+    return np.argsort(-(normalize(queries) @ normalize(corpus).T), axis=1)[:, :k]
+
+def overlap(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean fraction of shared results between two top-k index arrays."""
+    return float(np.mean([len(set(x) & set(y)) / len(x) for x, y in zip(a, b)]))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare latency, throughput and retrieval agreement of the embedder backends"
+    )
+
+    parser.add_argument(
+        "--onnx-model-dir",
+        type=str,
+        default="./onnx_embedder",
+        help="Model directory written by export_onnx_embedder.py (default: ./onnx_embedder)"
+    )
+
+    parser.add_argument(
+        "--threads",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4],
+        help="Intra-op thread counts to benchmark, one report row each (default: 1 2 4)"
+    )
+
+    parser.add_argument(
+        "--chroma-path",
+        type=str,
+        default="./chroma",
+        help="Path to ChromaDB directory the texts are sampled from (default: ./chroma)"
+    )
+
+    parser.add_argument(
+        "--collection-name",
+        type=str,
+        default="lyric_chunks",
+        help="Name of ChromaDB collection (default: lyric_chunks)"
+    )
+
+    parser.add_argument(
+        "--texts-file",
+        type=str,
+        default=None,
+        help="Read texts from this file, one per line, instead of ChromaDB"
+    )
+
+    parser.add_argument(
+        "--num-texts",
+        type=int,
+        default=2000,
+        help="Texts embedded for the throughput and retrieval measurements (default: 2000)"
+    )
+
+    parser.add_argument(
+        "--num-queries",
+        type=int,
+        default=200,
+        help="Single queries embedded for the latency measurement (default: 200)"
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=32,
+        help="Batch size of the throughput measurement (default: 32)"
+    )
+
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=10,
+        help="k used for retrieval agreement (default: 10)"
+    )
+
+    args = parser.parse_args()
+
+    texts = load_texts(args)
+    # Queries mimic partial user input: the first half of a sampled chunk
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(texts), size=min(args.num_queries, len(texts)), replace=False)
+    queries = []
+    for i in sample:
+        words = texts[i].split()
+        queries.append(' '.join(words[:max(1, len(words) // 2)]))
+    print(f"Texts: {len(texts)}  queries: {len(queries)}  batch size: {args.batch_size}")
+
+    backends = {
+        "torch-fp32": lambda threads: SentenceTransformerEmbedder(threads=threads),
+        "onnx": lambda threads: OnnxEmbedder(args.onnx_model_dir, threads=threads),
+    }
+
+    results = {}
+    print(f"{'backend':<11} {'threads':>7} {'p50 (ms)':>9} {'p95 (ms)':>9} {'texts/s':>9}")
+    for name, create in backends.items():
+        for threads in args.threads:
+            embedder = create(threads)
+            embedder.encode(queries[:8])  # Warm up
+
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                embedder.encode(query)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            corpus = embedder.encode(texts, batch_size=args.batch_size)
+            throughput = len(texts) / (time.perf_counter() - start)
+
+            p50, p95 = np.percentile(latencies, [50, 95])
+            print(f"{name:<11} {threads:>7} {p50:>9.2f} {p95:>9.2f} {throughput:>9.1f}")
+            results[name] = (np.asarray(embedder.encode(queries)), np.asarray(corpus))
+
+    reference_queries, reference_corpus = results["torch-fp32"]
+    onnx_queries, onnx_corpus = results["onnx"]
+    cosine = (normalize(reference_corpus) * normalize(onnx_corpus)).sum(axis=1)
+    reference_hits = top_k(reference_queries, reference_corpus, args.top_k)
+
+    print("\nAgreement of onnx with torch-fp32")
+    print(f"  Embedding cosine:            min {cosine.min():.4f}  mean {cosine.mean():.4f}")
+    print(f"  Overlap@{args.top_k}, onnx index:       "
+          f"{overlap(top_k(onnx_queries, onnx_corpus, args.top_k), reference_hits):.4f}")
+    # Queries embedded with onnx against an index built with torch
+    print(f"  Overlap@{args.top_k}, torch index:      "
+          f"{overlap(top_k(onnx_queries, reference_corpus, args.top_k), reference_hits):.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import sys
+import json
+import argparse
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+from sentence_transformers.models import Normalize, Pooling
+
+from app.services.rag.embedders import EMBEDDING_MODEL, OnnxEmbedder
+
+class TokenEmbeddings(torch.nn.Module):
+    """Transformer returning only the token embeddings, pooling runs outside the graph."""
+    def __init__(self, transformer):
+        super().__init__()
+        self.transformer = transformer
+
+    def forward(self, input_ids, attention_mask, token_type_ids=None):
+        return self.transformer(input_ids=input_ids, attention_mask=attention_mask,
+                                token_type_ids=token_type_ids).last_hidden_state
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the embedding model to ONNX with int8 dynamic quantization for the onnx embedder backend"
+    )
+
+    parser.add_argument(
+        "--model",
+        type=str,
+        default=EMBEDDING_MODEL,
+        help=f"sentence-transformers model name or local path (default: {EMBEDDING_MODEL})"
+    )
+
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="./onnx_embedder",
+        help="Model directory to write (default: ./onnx_embedder)"
+    )
+
+    parser.add_argument(
+        "--no-quantize",
+        action="store_true",
+        help="Keep fp32 weights instead of quantizing them to int8"
+    )
+
+    parser.add_argument(
+        "--opset",
+        type=int,
+        default=17,
+        help="ONNX opset version (default: 17)"
+    )
+
+    args = parser.parse_args()
+
+    model = SentenceTransformer(args.model, device="cpu")
+    modules = list(model)
+    pooling = next((module for module in modules if isinstance(module, Pooling)), None)
+    if pooling is None or not pooling.pooling_mode_mean_tokens:
+        raise SystemExit("Only models with mean pooling are supported")
+
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+
+    wrapper = TokenEmbeddings(modules[0].auto_model).eval()
+    sample = model.tokenizer(["my mind is the sky"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fp32_path = Path(tmp_dir) / "model_fp32.onnx"
+        with torch.no_grad():
+            torch.onnx.export(wrapper, tuple(sample[name] for name in input_names), str(fp32_path),
+                              input_names=input_names, output_names=["token_embeddings"],
+                              dynamic_axes=dynamic_axes, opset_version=args.opset, dynamo=False)
+
+        if args.no_quantize:
+            fp32_path.replace(output / "model.onnx")
+        else:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(str(fp32_path), str(output / "model.onnx"), weight_type=QuantType.QInt8)
+
+    model.tokenizer.backend_tokenizer.save(str(output / "tokenizer.json"))
+    config = {
+        "model_name": Path(args.model).name,
+        "max_seq_length": model.max_seq_length,
+        "pooling": "mean",
+        "normalize": any(isinstance(module, Normalize) for module in modules),
+        "quantization": "fp32" if args.no_quantize else "int8",
+    }
+    (output / "embedder.json").write_text(json.dumps(config, indent=2))
+
+    # Sanity check against the PyTorch model
+    texts = ["my mind is the sky", "and everything else is the weather", "the night is young"]
+    reference = model.encode(texts, normalize_embeddings=True)
+    exported = OnnxEmbedder(str(output)).encode(texts)
+    exported /= np.linalg.norm(exported, axis=1, keepdims=True)
+    cosine = (reference * exported).sum(axis=1)
+    print(f"Exported {args.model} to {output} ({config['quantization']}), "
+          f"cosine to PyTorch: min {cosine.min():.4f}, mean {cosine.mean():.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import sys
+import argparse
+import tracemalloc
+from pathlib import Path
+
+# Add parent directory to path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import chromadb
+from chromadb.config import Settings
+
+from app.services.rag.quantization import QuantizedEmbeddingStore, recall_at_k
+from app.services.rag.utils import embedder
+
+def search_peak_bytes(store: QuantizedEmbeddingStore, query: np.ndarray, top_k: int) -> int:
+    """Peak memory allocated by one search on top of the loaded store."""
+    store.search(query, top_k)  # Consolidates pending embeddings outside the measurement
+    tracemalloc.start()
+    try:
+        store.search(query, top_k)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Report recall@k and memory of quantized embeddings against float32"
+    )
+
+    parser.add_argument(
+        "--chroma-path",
+        type=str,
+        default="./chroma",
+        help="Path to ChromaDB directory (default: ./chroma)"
+    )
+
+    parser.add_argument(
+        "--collection-name",
+        type=str,
+        default="lyric_chunks",
+        help="Name of ChromaDB collection (default: lyric_chunks)"
+    )
+
+    parser.add_argument(
+        "--num-queries",
+        type=int,
+        default=200,
+        help="Number of chunks sampled to build queries (default: 200)"
+    )
+
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=10,
+        help="k used for recall@k (default: 10)"
+    )
+
+    parser.add_argument(
+        "--rescore-multiplier",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4],
+        help="Candidates rescored per result, one report row each (default: 1 2 4)"
+    )
+
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=args.chroma_path,
+                                       settings=Settings(anonymized_telemetry=False))
+    collection = client.get_collection(args.collection_name)
+    data = collection.get(include=["embeddings", "documents"])
+    ids = data["ids"]
+    embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+
+    # Queries mimic partial user input: the first half of a sampled chunk
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(ids), size=min(args.num_queries, len(ids)), replace=False)
+    query_texts = []
+    for i in sample:
+        words = data["documents"][i].split()
+        query_texts.append(' '.join(words[:max(1, len(words) // 2)]))
+    queries = embedder.encode(query_texts)
+
+    baseline_bytes = embeddings.nbytes
+    print(f"Chunks: {len(ids)}  dim: {embeddings.shape[1]}  queries: {len(query_texts)}")
+    print(f"{'mode':<8} {'rescore':>7} {'recall@' + str(args.top_k):>10} {'RAM (MB)':>10} {'reduction':>10} "
+          f"{'search peak (MB)':>17}")
+    print(f"{'float32':<8} {'-':>7} {1.0:>10.4f} {baseline_bytes / 2**20:>10.2f} {1.0:>9.2f}x {'-':>17}")
+
+    for mode in ("float16", "int8"):
+        store = QuantizedEmbeddingStore(mode=mode)
+        store.add(ids, embeddings)
+        memory = store.memory_bytes()
+        peak = search_peak_bytes(store, queries[0], args.top_k)
+        for multiplier in args.rescore_multiplier:
+            recall = recall_at_k(store, queries, top_k=args.top_k, rescore_multiplier=multiplier)
+            print(f"{mode:<8} {multiplier:>7} {recall:>10.4f} {memory / 2**20:>10.2f} "
+                  f"{baseline_bytes / memory:>9.2f}x {peak / 2**20:>17.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import sys
+import json
+import random
+import asyncio
+import argparse
+from pathlib import Path
+
+# Add parent directory to path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.text_utils import truncate_at_stop
+from app.core.tracing import TraceRecorder, diff_traces, iter_trace
+
+class StubVLLMClient:
+    """Offline stand-in for vLLM, answers after a fixed latency with words of the prompt."""
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def generate_completion(self, prompt: str, max_tokens: int = 10, stop=None, **kwargs) -> str:
+        await asyncio.sleep(self.latency)
+        # Seeded with the prompt so every build gets the same completion for the same prompt
+        words = prompt.split() or ["la"]
+        rng = random.Random(prompt)
+        completion = " ".join(rng.choice(words) for _ in range(min(max_tokens, 8))) + "\n"
+        return truncate_at_stop(completion, stop or [])[0]
+
+async def replay(entries, speed: float, vllm_latency: float, use_cache: bool):
+    """
+    Sends the requests of a trace to the app in-process, keeping their original spacing
+    divided by speed, and prints the count of each response status.
+    """
+    import httpx
+    from app import main
+
+    main.vllm_client.generate_completion = StubVLLMClient(vllm_latency).generate_completion
+    if not use_cache:
+        main.completion_cache = None
+
+    statuses = {}
+    start_ts = min(entry["ts"] for entry in entries)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app),
+                                 base_url="http://replay") as client:
+        async def send(entry):
+            await asyncio.sleep((entry["ts"] - start_ts) / speed)
+            headers = {"X-Request-ID": entry["request_id"]} if entry.get("request_id") else {}
+            response = await client.post("/complete", json={"text": entry["text"], **entry["params"]},
+                                         headers=headers)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(send(entry) for entry in entries))
+        elapsed = loop.time() - started
+
+    print(f"Replayed {len(entries)} requests in {elapsed:.1f}s, statuses: {statuses}")
+
+def print_diff(diff: dict):
+    """Prints the output of diff_traces as tables."""
+    retrieval = diff["retrieval"]
+    print("\nRetrieval")
+    print(f"  Requests in both traces: {retrieval['matched']}")
+    print(f"  Compared (no cache hit): {retrieval['compared']}")
+    if retrieval["compared"]:
+        print(f"  Identical rankings:      {retrieval['identical']} "
+              f"({retrieval['identical'] / retrieval['compared']:.1%})")
+        print(f"  Mean top-k overlap:      {retrieval['mean_overlap']:.3f}")
+
+    baseline, candidate = diff["latency"]["baseline"], diff["latency"]["candidate"]
+    print("\nLatency (ms)")
+    print(f"  {'stage':<10}{'':>4}{'p50':>10}{'p90':>10}{'p99':>10}{'count':>8}")
+    for stage in sorted(set(baseline) | set(candidate)):
+        for label, distribution in (("base", baseline), ("new", candidate)):
+            row = distribution.get(stage)
+            if row is None:
+                print(f"  {stage:<10}{label:>4}{'-':>10}{'-':>10}{'-':>10}{0:>8}")
+                continue
+            print(f"  {stage:<10}{label:>4}{row['p50']:>10.2f}{row['p90']:>10.2f}"
+                  f"{row['p99']:>10.2f}{row['count']:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay /complete traces offline and compare builds"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    replay_parser = subparsers.add_parser(
+        "replay",
+        help="Re-run a trace against the app with a stub vLLM, recording a new trace"
+    )
+
+    replay_parser.add_argument(
+        "trace",
+        type=str,
+        help="Trace file recorded with TRACE_ENABLED=true"
+    )
+
+    replay_parser.add_argument(
+        "--output",
+        type=str,
+        required=True,
+        help="Trace file written by the replay"
+    )
+
+    replay_parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Replay rate relative to the original traffic, e.g. 2 for twice as fast (default: 1.0)"
+    )
+
+    replay_parser.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="Replay only the first N requests"
+    )
+
+    replay_parser.add_argument(
+        "--vllm-latency",
+        type=float,
+        default=0.05,
+        help="Seconds the stub vLLM takes per completion (default: 0.05)"
+    )
+
+    replay_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable the semantic completion cache during the replay"
+    )
+
+    replay_parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Diff the replay against the input trace when done"
+    )
+
+    diff_parser = subparsers.add_parser(
+        "diff",
+        help="Compare retrieval results and latencies of two traces"
+    )
+
+    diff_parser.add_argument(
+        "baseline",
+        type=str,
+        help="Reference trace"
+    )
+
+    diff_parser.add_argument(
+        "candidate",
+        type=str,
+        help="Trace to compare against the reference"
+    )
+
+    diff_parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the diff as JSON"
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "replay":
+        if args.speed <= 0:
+            parser.error("--speed must be positive")
+        if Path(args.output).exists():
+            parser.error(f"{args.output} already exists")
+        # Entries are written as requests finish, replay them in arrival order
+        entries = sorted(iter_trace(args.trace), key=lambda entry: entry["ts"])[:args.limit]
+        if not entries:
+            print(f"No requests in {args.trace}")
+            return
+
+        from app import main as app_main
+        app_main.trace_recorder = TraceRecorder(args.output)
+        try:
+            asyncio.run(replay(entries, args.speed, args.vllm_latency, not args.no_cache))
+        finally:
+            app_main.trace_recorder.close()
+        print(f"Replay trace written to {args.output}")
+
+        if args.compare:
+            print_diff(diff_traces(entries, list(iter_trace(args.output))))
+    else:
+        diff = diff_traces(list(iter_trace(args.baseline)), list(iter_trace(args.candidate)))
+        if args.json:
+            print(json.dumps(diff, indent=2))
+        else:
+            print_diff(diff)
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,12 @@ Genius Lyrics Scraper
 Scrapes lyrics from Genius.com using the lyricsgenius library.
 Designed to be extended with CSV-based artist/album/song specification.
 
+With save_format: jsonl artists are scraped concurrently by a pool of workers
+sharing one rate limiter, and every song is appended to the artist's JSONL file
+as soon as it is fetched. Rerunning skips songs already in those files.
+The json save format scrapes one artist at a time, its requests are only paced
+by the client's sleep_time.
+
 Usage:
     create .env with GENIUS_ACCESS_TOKEN="your_token_here"
     python scrape.py
@@ -16,10 +22,13 @@ Requirements:
 import os
 import sys
 import json
+import time
 import logging
+import threading
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Set
 
 try:
     import yaml
@@ -34,27 +43,77 @@ except ImportError as e:
 load_dotenv()
 
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('genius_scraper.log')
-    ]
-)
 logger = logging.getLogger(__name__)
 
 
+def _safe_name(name: str) -> str:
+    """Make a name safe to use as a file or directory name."""
+    return "".join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in name)
+
+
+def _artist_names(artists: Optional[List]) -> List[str]:
+    """Names of featured/writer artists given as API dicts or lyricsgenius objects."""
+    if not artists:
+        return []
+    return [a['name'] if isinstance(a, dict) else a.name for a in artists]
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter shared by all scraper workers."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: Tokens (requests) added per second
+            capacity: Maximum burst size, defaults to one second worth of tokens
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
 class GeniusScraper:
     """Scraper for Genius lyrics with configuration management."""
     
-    def __init__(self, config_path: str = "config.yaml"):
-        """Initialize scraper with configuration."""
+    def __init__(self, config_path: str = "config.yaml", genius: Optional[Genius] = None):
+        """
+        Initialize scraper with configuration.
+
+        Args:
+            config_path: Path to the YAML config, relative to this file
+            genius: Client shared by all workers, e.g. a stub for tests.
+                By default every worker creates its own Genius client.
+        """
         self.config = self._load_config(config_path)
-        self.genius = self._init_genius_client()
+        self._shared_client = genius is not None
+        self.genius = genius or self._init_genius_client()
         self.output_dir = Path(__file__).parent / self.config['output_dir']
         self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        # Concurrent scraping state
+        self.limiter = TokenBucket(
+            self.config.get('requests_per_second', 2.0),
+            self.config.get('burst')
+        )
+        self._local = threading.local()
+        self._lock = threading.Lock()
         
         # Metadata tracking
         self.scrape_metadata = {
@@ -77,8 +136,13 @@ class GeniusScraper:
         logger.info(f"Loaded configuration from {config_file}")
         return config
     
-    def _init_genius_client(self) -> Genius:
-        """Initialize Genius API client."""
+    def _init_genius_client(self, sleep_time: Optional[float] = None) -> Genius:
+        """
+        Initialize Genius API client.
+
+        Args:
+            sleep_time: Seconds slept after each request, defaults to config
+        """
         # Try to get token from config, then environment variable
         api_token = self.config.get('api_token') or os.getenv('GENIUS_ACCESS_TOKEN')
         
@@ -90,7 +154,7 @@ class GeniusScraper:
         
         genius = Genius(
             api_token,
-            sleep_time=self.config.get('sleep_time', 0.5),
+            sleep_time=self.config.get('sleep_time', 0.5) if sleep_time is None else sleep_time,
             timeout=self.config.get('timeout', 15),
             verbose=True,
             remove_section_headers=self.config.get('remove_section_headers', False),
@@ -155,17 +219,178 @@ class GeniusScraper:
                 artist_data['songs'].append(song_data)
             
             # Update metadata
-            self.scrape_metadata['artists_scraped'].append(artist_name)
-            self.scrape_metadata['total_songs'] += len(artist.songs)
+            with self._lock:
+                self.scrape_metadata['artists_scraped'].append(artist_name)
+                self.scrape_metadata['total_songs'] += len(artist.songs)
             
             return artist_data
             
         except Exception as e:
             logger.error(f"Error scraping {artist_name}: {e}", exc_info=True)
-            self.scrape_metadata['errors'].append({
-                'artist': artist_name,
-                'error': str(e)
-            })
+            with self._lock:
+                self.scrape_metadata['errors'].append({
+                    'artist': artist_name,
+                    'error': str(e)
+                })
+            return None
+
+    def _client(self) -> Genius:
+        """
+        Genius client for the calling worker thread. Worker clients don't sleep
+        between requests, the shared token bucket rate limits them instead.
+        """
+        if self._shared_client:
+            return self.genius
+        client = getattr(self._local, 'genius', None)
+        if client is None:
+            client = self._local.genius = self._init_genius_client(sleep_time=0)
+        return client
+
+    def _request(self, method: str, *args, **kwargs):
+        """Call a single-request Genius client method once the rate limiter allows it."""
+        self.limiter.acquire()
+        return getattr(self._client(), method)(*args, **kwargs)
+
+    def _find_artist(self, artist_name: str) -> Optional[Dict]:
+        """
+        Find an artist by name, preferring an exact (case-insensitive) match.
+
+        Returns:
+            Artist result dictionary from the Genius API, or None if not found
+        """
+        response = self._request('search_artists', artist_name, per_page=5)
+        hits = [hit['result'] for section in response.get('sections', [])
+                if section.get('type') == 'artist' for hit in section.get('hits', [])]
+        if not hits:
+            return None
+        for hit in hits:
+            if hit['name'].lower() == artist_name.lower():
+                return hit
+        return hits[0]
+
+    def _is_lyrics(self, song_info: Dict) -> bool:
+        """Check an artist_songs result is an actual song with lyrics."""
+        return song_info.get('lyrics_state') == 'complete' and not song_info.get('instrumental')
+
+    def _fetch_song(self, artist_info: Dict, song_info: Dict) -> Dict:
+        """Fetch lyrics (and full info if configured) for one song."""
+        lyrics = ''
+        if song_info.get('lyrics_state') == 'complete':
+            lyrics = self._request('lyrics', song_url=song_info['url']) or ''
+        if self.config.get('get_full_info', True):
+            song_info = {**song_info, **self._request('song', song_info['id'])['song']}
+
+        return {
+            'artist_name': artist_info['name'],
+            'artist_id': artist_info['id'],
+            'title': song_info['title'],
+            'song_id': song_info['id'],
+            'url': song_info.get('url'),
+            'lyrics': lyrics,
+            'album': song_info.get('album'),
+            'year': (song_info.get('release_date_components') or {}).get('year'),
+            'featured_artists': _artist_names(song_info.get('featured_artists')),
+            'writer_artists': _artist_names(song_info.get('writer_artists')),
+        }
+
+    def _load_checkpoint(self, output_file: Path) -> Set:
+        """
+        Read the song ids already saved in an artist's JSONL file. A partially
+        written last line from an interrupted run is truncated away.
+
+        Returns:
+            Set of song ids already scraped
+        """
+        done = set()
+        if not output_file.exists():
+            return done
+
+        valid_bytes = 0
+        with open(output_file, 'r+b') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    done.add(json.loads(line)['song_id'])
+                except (json.JSONDecodeError, KeyError):
+                    break
+                valid_bytes += len(line)
+            f.truncate(valid_bytes)
+        return done
+
+    def scrape_artist_streaming(self, artist_name: str) -> Optional[int]:
+        """
+        Scrape an artist song by song, appending each song to the artist's JSONL
+        file as soon as it is fetched. Songs already in the file are skipped.
+
+        Args:
+            artist_name: Name of the artist to scrape
+
+        Returns:
+            Number of new songs written, or None if failed
+        """
+        logger.info(f"Starting scrape for artist: {artist_name}")
+
+        try:
+            artist_info = self._find_artist(artist_name)
+            if not artist_info:
+                logger.warning(f"Artist not found: {artist_name}")
+                with self._lock:
+                    self.scrape_metadata['errors'].append({
+                        'artist': artist_name,
+                        'error': 'Artist not found'
+                    })
+                return None
+
+            safe_name = _safe_name(artist_info['name'])
+            artist_dir = self.output_dir / safe_name
+            artist_dir.mkdir(exist_ok=True)
+            output_file = artist_dir / f"{safe_name}.jsonl"
+
+            done = self._load_checkpoint(output_file)
+            if done:
+                logger.info(f"Resuming {artist_info['name']}: {len(done)} songs already saved")
+
+            max_songs = self.config.get('max_songs_per_artist')
+            skip_non_songs = self.config.get('skip_non_songs', True)
+            written = 0
+            page = 1
+            with open(output_file, 'a', encoding='utf-8') as f:
+                while page and (max_songs is None or len(done) < max_songs):
+                    response = self._request('artist_songs', artist_info['id'],
+                                             per_page=50, page=page, sort='popularity')
+                    for song_info in response['songs']:
+                        if max_songs is not None and len(done) >= max_songs:
+                            break
+                        if song_info['id'] in done:
+                            continue
+                        # artist_songs also lists features, keep the artist's own songs
+                        if song_info.get('primary_artist', {}).get('id', artist_info['id']) != artist_info['id']:
+                            continue
+                        if skip_non_songs and not self._is_lyrics(song_info):
+                            continue
+
+                        song_data = self._fetch_song(artist_info, song_info)
+                        f.write(json.dumps(song_data, ensure_ascii=False) + '\n')
+                        f.flush()
+                        done.add(song_info['id'])
+                        written += 1
+                    page = response.get('next_page')
+
+            logger.info(f"Saved {written} new songs ({len(done)} total) to {output_file}")
+
+            with self._lock:
+                self.scrape_metadata['artists_scraped'].append(artist_name)
+                self.scrape_metadata['total_songs'] += written
+            return written
+
+        except Exception as e:
+            logger.error(f"Error scraping {artist_name}: {e}", exc_info=True)
+            with self._lock:
+                self.scrape_metadata['errors'].append({
+                    'artist': artist_name,
+                    'error': str(e)
+                })
             return None
     
     def save_artist_data(self, artist_data: Dict):
@@ -175,7 +400,7 @@ class GeniusScraper:
         
         # Create artist-specific directory
         artist_name = artist_data['artist_name']
-        safe_name = "".join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in artist_name)
+        safe_name = _safe_name(artist_name)
         artist_dir = self.output_dir / safe_name
         artist_dir.mkdir(exist_ok=True)
         
@@ -189,7 +414,7 @@ class GeniusScraper:
         # Optionally save individual song files
         if self.config.get('save_individual_songs', False):
             for song in artist_data['songs']:
-                safe_song_name = "".join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in song['title'])
+                safe_song_name = _safe_name(song['title'])
                 song_file = artist_dir / f"{safe_song_name}.json"
                 with open(song_file, 'w', encoding='utf-8') as f:
                     json.dump(song, f, indent=2, ensure_ascii=False)
@@ -202,6 +427,16 @@ class GeniusScraper:
         
         logger.info(f"Saved scrape metadata to {metadata_file}")
     
+    def _process_artist(self, artist_name: str):
+        """Scrape and save one artist in the configured save format."""
+        if self.config.get('save_format', 'json') == 'jsonl':
+            self.scrape_artist_streaming(artist_name)
+            return
+
+        artist_data = self.scrape_artist(artist_name)
+        if artist_data:
+            self.save_artist_data(artist_data)
+
     def run(self):
         """Run the complete scraping workflow."""
         logger.info("=" * 60)
@@ -213,14 +448,19 @@ class GeniusScraper:
             logger.error("No artists specified in configuration")
             return
         
-        logger.info(f"Will scrape {len(artists)} artists")
+        workers = self.config.get('workers', 1)
+        if self.config.get('save_format', 'json') != 'jsonl' and workers > 1:
+            # search_artist bypasses the shared rate limiter and shares one client
+            logger.warning("Ignoring workers for save_format json, scraping one artist at a time")
+            workers = 1
+        logger.info(f"Will scrape {len(artists)} artists with {workers} workers")
         
-        for i, artist_name in enumerate(artists, 1):
-            logger.info(f"\n[{i}/{len(artists)}] Processing: {artist_name}")
-            
-            artist_data = self.scrape_artist(artist_name)
-            if artist_data:
-                self.save_artist_data(artist_data)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(self._process_artist, artist_name): artist_name
+                       for artist_name in artists}
+            for i, future in enumerate(as_completed(futures), 1):
+                future.result()
+                logger.info(f"[{i}/{len(artists)}] Finished: {futures[future]}")
         
         # Save final metadata
         self.save_metadata()
@@ -236,6 +476,15 @@ class GeniusScraper:
 
 def main():
     """Main entry point."""
+    # Configured here rather than on import, so importing the module writes no log file
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler('genius_scraper.log')
+        ]
+    )
     try:
         scraper = GeniusScraper()
         scraper.run()
@@ -0,0 +1,151 @@
+"""Tests for the concurrent Genius scraper against a local stub of the Genius API."""
+
+import json
+import sys
+import time
+import threading
+from pathlib import Path
+
+import pytest
+import yaml
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from scrape import GeniusScraper, TokenBucket
+
+
+class StubGenius:
+    """In-process stand-in for the Genius API methods the scraper calls."""
+
+    def __init__(self, artists, fail_on_lyrics_call=None):
+        """
+        Args:
+            artists: Mapping of artist name to number of songs
+            fail_on_lyrics_call: Raise on this (1-based) lyrics call to simulate a crash
+        """
+        self.artists = {name: (artist_id, n_songs)
+                        for artist_id, (name, n_songs) in enumerate(artists.items(), 1)}
+        self.fail_on_lyrics_call = fail_on_lyrics_call
+        self.lyrics_calls = 0
+        self.search_threads = set()
+        self._lock = threading.Lock()
+
+    def search_artists(self, search_term, per_page=None, page=None):
+        hits = [{'result': {'id': artist_id, 'name': name}}
+                for name, (artist_id, _) in self.artists.items() if name.lower() == search_term.lower()]
+        return {'sections': [{'type': 'artist', 'hits': hits}]}
+
+    def artist_songs(self, artist_id, per_page=None, page=None, sort='title'):
+        n_songs = next(n for a_id, n in self.artists.values() if a_id == artist_id)
+        start = (page - 1) * per_page
+        songs = [{
+            'id': artist_id * 1000 + i,
+            'title': f"Song {i}",
+            'url': f"https://genius.test/{artist_id}/{i}",
+            'lyrics_state': 'complete',
+            'primary_artist': {'id': artist_id},
+        } for i in range(start, min(start + per_page, n_songs))]
+        next_page = page + 1 if start + per_page < n_songs else None
+        return {'songs': songs, 'next_page': next_page}
+
+    def lyrics(self, song_id=None, song_url=None):
+        with self._lock:
+            self.lyrics_calls += 1
+            if self.lyrics_calls == self.fail_on_lyrics_call:
+                raise ConnectionError("stub failure")
+        return f"[Verse 1]\nLyrics of {song_url}"
+
+    def song(self, song_id):
+        return {'song': {'album': {'name': 'Stub Album'}, 'writer_artists': [{'name': 'Writer'}]}}
+
+    def search_artist(self, artist_name, max_songs=None, sort=None):
+        with self._lock:
+            self.search_threads.add(threading.get_ident())
+        return None
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    config = {
+        'artists': ['Fugazi', 'IDLES', 'Tom Waits'],
+        'max_songs_per_artist': 60,
+        'requests_per_second': 1000,
+        'workers': 3,
+        'output_dir': str(tmp_path / 'out'),
+        'save_format': 'jsonl',
+    }
+    path = tmp_path / 'config.yaml'
+    path.write_text(yaml.safe_dump(config))
+    return path
+
+
+def read_songs(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+class TestTokenBucket:
+
+    def test_limits_rate_after_burst(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+        start = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        assert time.monotonic() - start >= 5 / 50 * 0.9
+
+    def test_invalid_rate_raises(self):
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0)
+
+
+class TestConcurrentScrape:
+
+    def test_streams_all_artists_to_jsonl(self, config_path, tmp_path):
+        stub = StubGenius({'Fugazi': 70, 'IDLES': 10, 'Tom Waits': 0})
+        scraper = GeniusScraper(config_path, genius=stub)
+        scraper.run()
+
+        fugazi = read_songs(tmp_path / 'out' / 'Fugazi' / 'Fugazi.jsonl')
+        assert len(fugazi) == 60
+        assert fugazi[0]['album'] == {'name': 'Stub Album'}
+        assert fugazi[0]['writer_artists'] == ['Writer']
+        assert len(read_songs(tmp_path / 'out' / 'IDLES' / 'IDLES.jsonl')) == 10
+        assert scraper.scrape_metadata['total_songs'] == 70
+        assert not scraper.scrape_metadata['errors']
+
+    def test_resume_skips_saved_songs(self, config_path, tmp_path):
+        stub = StubGenius({'Fugazi': 30}, fail_on_lyrics_call=12)
+        scraper = GeniusScraper(config_path, genius=stub)
+        scraper.scrape_artist_streaming('Fugazi')
+
+        output_file = tmp_path / 'out' / 'Fugazi' / 'Fugazi.jsonl'
+        assert len(read_songs(output_file)) == 11
+
+        # Simulate a crash mid-write
+        with open(output_file, 'a', encoding='utf-8') as f:
+            f.write('{"title": "half writ')
+
+        stub.lyrics_calls = 0
+        stub.fail_on_lyrics_call = None
+        written = GeniusScraper(config_path, genius=stub).scrape_artist_streaming('Fugazi')
+
+        songs = read_songs(output_file)
+        assert written == 19
+        assert stub.lyrics_calls == 19
+        assert len({song['song_id'] for song in songs}) == len(songs) == 30
+
+    def test_unknown_artist_is_recorded_as_error(self, config_path):
+        scraper = GeniusScraper(config_path, genius=StubGenius({}))
+        assert scraper.scrape_artist_streaming('Nobody') is None
+        assert scraper.scrape_metadata['errors'][0]['artist'] == 'Nobody'
+
+    def test_json_format_scrapes_one_artist_at_a_time(self, config_path):
+        config = yaml.safe_load(config_path.read_text())
+        config['save_format'] = 'json'
+        config_path.write_text(yaml.safe_dump(config))
+
+        stub = StubGenius({})
+        scraper = GeniusScraper(config_path, genius=stub)
+        scraper.run()
+        assert len(stub.search_threads) == 1
+        assert len(scraper.scrape_metadata['errors']) == 3
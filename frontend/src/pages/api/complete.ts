@@ -7,6 +7,8 @@ export const POST: APIRoute = async ({ request }) => {
     const body = await request.json();
     const partialLyric  = body.partialLyric;
     const useRAG = body.use_rag ?? false;
+    // Asks the backend to generate instead of reusing a cached completion
+    const fresh = body.fresh ?? false;
 
     if (!partialLyric || typeof partialLyric !== 'string') {
       return new Response(
@@ -25,6 +27,7 @@ export const POST: APIRoute = async ({ request }) => {
       body: JSON.stringify({ 
         text: partialLyric, 
         use_rag: useRAG,
+        fresh,
         max_tokens: 10, 
         temperature: 1.0 }),
     });
@@ -14,9 +14,62 @@ if (!editor || !suggestionEl || !statusEl) {
 
 let debounceTimer = null;
 let currentSuggestion = '';
+let suggestionBase = '';  // Editor value the current suggestion continues
 let isLoading = false;
 let useRAG = false;
 
+// Recent suggestions by input text, oldest first (Map keeps insertion order)
+const SUGGESTION_CACHE_SIZE = 100;
+const suggestionCache = new Map();
+
+// Requests sent to /api/complete and requests avoided
+const stats = { requests: 0, cacheHits: 0, prefixReuses: 0 };
+window.autocompleteStats = stats;
+
+function cacheKey(text) {
+  return (useRAG ? 'rag:' : 'plain:') + text;
+}
+
+function getCachedSuggestion(text) {
+  const key = cacheKey(text);
+  if (!suggestionCache.has(key)) return null;
+  const suggestion = suggestionCache.get(key);
+  // Move to the end so it is evicted last
+  suggestionCache.delete(key);
+  suggestionCache.set(key, suggestion);
+  return suggestion;
+}
+
+function cacheSuggestion(text, suggestion) {
+  const key = cacheKey(text);
+  suggestionCache.delete(key);
+  suggestionCache.set(key, suggestion);
+  if (suggestionCache.size > SUGGESTION_CACHE_SIZE) {
+    suggestionCache.delete(suggestionCache.keys().next().value);
+  }
+}
+
+function countSaved(kind) {
+  stats[kind] += 1;
+  const saved = stats.cacheHits + stats.prefixReuses;
+  console.log(`Request saved (${kind}): ${saved} saved, ${stats.requests} sent`);
+}
+
+// Keeps the rest of the suggestion when the user typed its first characters
+function reuseSuggestionPrefix(value) {
+  if (!currentSuggestion || !value.startsWith(suggestionBase)) return false;
+  const typed = value.slice(suggestionBase.length);
+  if (!typed || !currentSuggestion.startsWith(typed)) return false;
+  const rest = currentSuggestion.slice(typed.length);
+  if (!rest.trim()) return false;
+
+  showSuggestion(rest);
+  // Cached suggestions continue the trimmed text, keep the trailing whitespace
+  cacheSuggestion(value.trim(), value.slice(value.trimEnd().length) + rest);
+  countSaved('prefixReuses');
+  return true;
+}
+
 // RAG toggle button
 ragToggle.addEventListener('click', () => {
   useRAG = !useRAG;
@@ -35,6 +88,11 @@ editor.addEventListener('input', () => {
     clearTimeout(debounceTimer);
   }
 
+  if (reuseSuggestionPrefix(editor.value)) {
+    setStatus('');
+    return;
+  }
+
   clearSuggestion();
 
   const text = editor.value.trim();
@@ -44,6 +102,14 @@ editor.addEventListener('input', () => {
     return;
   }
 
+  const cached = getCachedSuggestion(text);
+  if (cached !== null) {
+    showSuggestion(cached);
+    setStatus('');
+    countSaved('cacheHits');
+    return;
+  }
+
   setStatus('Waiting...', 'loading');
 
   debounceTimer = setTimeout(async () => {
@@ -52,7 +118,8 @@ editor.addEventListener('input', () => {
   }, 500);
 });
 
-async function fetchSuggestion(partialLyric) {
+// fresh asks the server to skip its completion cache and generate a new one
+async function fetchSuggestion(partialLyric, fresh = false) {
   if (isLoading) return;
   
   isLoading = true;
@@ -61,13 +128,15 @@ async function fetchSuggestion(partialLyric) {
   try {
     console.log('Fetching suggestion for:', partialLyric);
     console.log('Using RAG:', useRAG); 
+    stats.requests += 1;
 
     const response = await fetch('/api/complete', {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({ 
         partialLyric,
-        use_rag: useRAG }),
+        use_rag: useRAG,
+        fresh }),
     });
 
     console.log('Response status:', response.status);
@@ -80,8 +149,11 @@ async function fetchSuggestion(partialLyric) {
       throw new Error(data.error || 'Failed to get suggestion');
     }
 
-    currentSuggestion = data.completion;
-    displaySuggestion();
+    cacheSuggestion(partialLyric, data.completion);
+    // The user may have typed more while waiting
+    if (editor.value.trim() === partialLyric) {
+      showSuggestion(data.completion);
+    }
     setStatus('');
 
   } catch (err) {
@@ -92,6 +164,12 @@ async function fetchSuggestion(partialLyric) {
   }
 }
 
+function showSuggestion(suggestion) {
+  currentSuggestion = suggestion;
+  suggestionBase = editor.value;
+  displaySuggestion();
+}
+
 function displaySuggestion() {
   if (!currentSuggestion) return;
   const currentText = editor.value;
@@ -122,9 +200,20 @@ async function requestNewSuggestion() {
     setTimeout(() => setStatus(''), 2000);
     return;
   }
+
+  // After Escape or a click the text is unchanged, bring back the dismissed
+  // suggestion. Asking again while one is shown generates a different one,
+  // bypassing the server completion cache.
+  const shown = currentSuggestion !== '';
+  const cached = shown ? null : getCachedSuggestion(text);
+  if (cached !== null) {
+    showSuggestion(cached);
+    countSaved('cacheHits');
+    return;
+  }
   
   clearSuggestion();
-  await fetchSuggestion(text);
+  await fetchSuggestion(text, shown);
 }
 
 function setStatus(message, type = '') {